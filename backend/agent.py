@@ -4,8 +4,17 @@ import ssl
 import requests
 import warnings
 import hashlib  # Added for generating unique Doc IDs
+from ingest_manifest import chunk_id, EXTRACT, VECTOR
+from executors import run_io
+from micro_batcher import MicroBatcher
+from graph_writer import write_graph_documents, schema_elements, CORE_LABELS
+from embedding_cache import CachedEmbeddings, embedding_cache
+from chunk_dedup import chunk_dedup, CHUNK_DEDUP_ENABLED
+from schema_cache import schema_cache
+from chat_vocabulary import chat_vocabulary
+from cypher_cache import cypher_cache, schema_fingerprint, CYPHER_CACHE_ENABLED
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
-from langchain_experimental.text_splitter import SemanticChunker
+from semantic_chunker import VectorizedSemanticChunker
 from langchain_text_splitters import TokenTextSplitter # <--- NEW IMPORT
 import logging
 logger = logging.getLogger("uvicorn")
@@ -33,6 +42,8 @@ else:
     ssl._create_default_https_context = _create_unverified_https_context
 
 import uuid
+import time
+import asyncio
 from typing import TypedDict, List, Optional, Any
 import httpx
 from dotenv import load_dotenv
@@ -48,7 +59,8 @@ from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 
 # *** NEW IMPORT FOR HYBRID RAG ***
-from langchain_neo4j import GraphCypherQAChain
+from langchain_neo4j.chains.graph_qa.cypher import extract_cypher
+from neo4j import AsyncGraphDatabase, RoutingControl
 load_dotenv()
 # --- 1. CONFIGURATION ---
 
@@ -77,16 +89,36 @@ llm = ChatOpenAI(
     http_async_client=http_async_client
 )
 
-# Embedding Model
-embeddings = OpenAIEmbeddings(
-    base_url="https://genailab.tcs.in",
-    model="azure/genailab-maas-text-embedding-3-large",
-    api_key=api_key,
-    http_client=http_client
+# Embedding Model (behind the persistent embedding cache, so ingest and chat share vectors)
+embeddings = CachedEmbeddings(
+    OpenAIEmbeddings(
+        base_url="https://genailab.tcs.in",
+        model="azure/genailab-maas-text-embedding-3-large",
+        api_key=api_key,
+        http_client=http_client,
+        http_async_client=http_async_client
+    ),
+    embedding_cache
 )
 
 # Database Connections
 graph = Neo4jGraph(url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD)
+# Async driver for the chat path, so graph reads never block the event loop
+async_driver = AsyncGraphDatabase.driver(NEO4J_URI, auth=(NEO4J_USERNAME, NEO4J_PASSWORD))
+
+# Initialize Neo4j Vector (shares the graph's driver; index checked on first write)
+# text-embedding-3-large vectors are 3072-d; passing it skips the probe embedding
+EMBEDDING_DIMENSION = int(os.getenv("EMBEDDING_DIMENSION", "3072"))
+NEO4J_VECTOR_BATCH_SIZE = int(os.getenv("NEO4J_VECTOR_BATCH_SIZE", "500"))
+
+vector_store_neo4j = Neo4jVector(
+    embedding=embeddings,
+    graph=graph,
+    index_name="factory_vector_index",
+    node_label="DocumentChunk",
+    embedding_node_property="embedding",
+    embedding_dimension=EMBEDDING_DIMENSION
+)
 
 # Initialize Chroma (Persisted)
 vector_store_chroma = Chroma(
@@ -99,6 +131,13 @@ vector_store_chroma = Chroma(
 class GraphState(TypedDict):
     documents: List[Any]      # Raw input strings
     error_log: Optional[str]
+    chunks_extracted: int     # Token-split chunks that made it into the KG
+    vectors_written: int      # Chunk vectors written across Neo4j + Chroma
+    chunks_deduplicated: int  # Semantic chunks linked to a stored near-duplicate instead of embedded
+    known_chunk_ids: List[str]     # Chunks already stored for this manual (skipped, see ingest_manifest)
+    extract_chunk_ids: List[str]   # IDs of every token-split chunk now in the KG
+    vector_chunk_ids: List[str]    # IDs of every semantic chunk now in the vector stores
+    ingest_complete: bool          # False if extraction or a vector write failed
 
 # --- 4. TRIPLE INGESTION NODE (Entities + Neo4j Chunks + Chroma Chunks) ---
 # --- 4. TRIPLE INGESTION NODE (Entities + Neo4j Chunks + Chroma Chunks) ---
@@ -130,6 +169,8 @@ def add_machine_to_graph(machine_data: dict):
     
     try:
         graph.query(query, params)
+        schema_cache.invalidate()
+        chat_vocabulary.add_machines([machine_data['name']])
         logger.info(f" > Added Machinery: {machine_data['name']}")
         return True
     except Exception as e:
@@ -137,9 +178,123 @@ def add_machine_to_graph(machine_data: dict):
         return False
 
     
+# Entity extraction: one transformer shared by every ingest, and one concurrency
+# budget shared by every chunk of every ingest running on this worker.
+EXTRACTION_CONCURRENCY = int(os.getenv("EXTRACTION_CONCURRENCY", "8"))
+EXTRACTION_RETRIES = int(os.getenv("EXTRACTION_RETRIES", "2"))
+
+graph_transformer = LLMGraphTransformer(
+    llm=llm,
+    # allowed_nodes=["Machinery", "Part", "Issue", "Action", "Technician"], # Uncomment if errors persist
+    # allowed_relationships=["PART_OF", "CAUSES", "REQUIRES", "LOCATED_AT"]
+)
+extraction_semaphore = asyncio.Semaphore(EXTRACTION_CONCURRENCY)
+
+async def _extract_chunk(doc: Document):
+    """
+    Extracts one token-split chunk, retrying with backoff.
+    Returns None on final failure so one bad chunk doesn't sink the others.
+    """
+    for attempt in range(EXTRACTION_RETRIES + 1):
+        try:
+            async with extraction_semaphore:
+                return await graph_transformer.aprocess_response(doc)
+        except Exception as e:
+            if attempt == EXTRACTION_RETRIES:
+                logger.info(f"   > Extraction failed for chunk {doc.metadata.get('id')}: {e}")
+                return None
+            await asyncio.sleep(2 ** attempt)
+
+# Chunk embeddings: each semantic chunk is embedded once and the same vector is
+# written to both Neo4j and Chroma. 2048 inputs is the provider's per-request maximum.
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "2048"))
+
+def embed_chunks(texts: List[str]) -> List[List[float]]:
+    return embeddings.embed_documents(texts, chunk_size=EMBEDDING_BATCH_SIZE)
+
+# Cross-document pooling: page windows of every manual being ingested (e.g. a bulk
+# upload) share full-size embedding requests and large graph write transactions
+GRAPH_WRITE_POOL_CHUNKS = int(os.getenv("GRAPH_WRITE_POOL_CHUNKS", "100"))
+
+def _write_graph_batch(graph_docs: List[Any]) -> List[bool]:
+    write_graph_documents(graph, graph_docs)
+    return [True] * len(graph_docs)
+
+embedding_batcher = MicroBatcher(embed_chunks, max_batch=EMBEDDING_BATCH_SIZE, max_wait=0.1, name="embeddings")
+graph_write_batcher = MicroBatcher(_write_graph_batch, max_batch=GRAPH_WRITE_POOL_CHUNKS, max_wait=0.5, name="graph_writes")
+
+LINK_QUERY = """
+UNWIND $links AS link
+MATCH (d:DocumentChunk) WHERE d.id IN link.chunk_ids
+MERGE (m:Machinery {name: link.machine_name})
+MERGE (d)-[:MANUAL_FOR]->(m)
+"""
+
+def link_chunks_to_machinery(links: List[dict]):
+    """links: [{"chunk_ids", "machine_name"}], linked in a single UNWIND statement."""
+    graph.query(LINK_QUERY, {"links": links})
+
+# Near-duplicates of a stored chunk keep only their provenance, pointing at the canonical chunk
+LINK_DUPLICATES_QUERY = """
+UNWIND $duplicates AS dup
+MATCH (c:DocumentChunk {id: dup.canonical_id})
+MERGE (d:DuplicateChunk {id: dup.id})
+SET d.doc_id = dup.doc_id, d.machinery = dup.machinery, d.manual_type = dup.manual_type
+MERGE (d)-[r:DUPLICATE_OF]->(c)
+SET r.similarity = dup.similarity
+"""
+
+def link_duplicate_chunks(duplicates: List[dict]):
+    """duplicates: [{"id", "canonical_id", "similarity", "doc_id", "machinery", "manual_type"}]"""
+    graph.query(LINK_DUPLICATES_QUERY, {"duplicates": duplicates})
+
+# Semantic chunking for the vector stores: NumPy breakpoints, capped chunk size,
+# sentence windows embedded in the same provider-sized batches
+semantic_splitter = VectorizedSemanticChunker(embeddings, batch_size=EMBEDDING_BATCH_SIZE)
+
+_neo4j_vector_index_ready = False
+
+def ensure_neo4j_vector_index():
+    """Creates factory_vector_index on first use, or checks it matches EMBEDDING_DIMENSION."""
+    global _neo4j_vector_index_ready
+    if _neo4j_vector_index_ready:
+        return
+    existing = vector_store_neo4j.retrieve_existing_index()
+    if not existing:
+        vector_store_neo4j.create_new_index()
+    elif existing[0] and existing[0] != EMBEDDING_DIMENSION:
+        raise ValueError(f"factory_vector_index is {existing[0]}-d but EMBEDDING_DIMENSION is {EMBEDDING_DIMENSION}")
+    _neo4j_vector_index_ready = True
+
+# Chunks whose text was stored under an older ID scheme, so replacing them keeps the
+# HNSW index free of duplicates
+REPLACE_CHUNKS_QUERY = """
+UNWIND $rows AS row
+MATCH (c:DocumentChunk {doc_id: row.doc_id})
+WHERE c.text = row.text AND c.id <> row.id
+DETACH DELETE c
+"""
+
+def write_neo4j_vectors(texts: List[str], vectors: List[List[float]], metadatas: List[dict], ids: List[str]):
+    """Upserts precomputed chunk vectors into factory_vector_index in NEO4J_VECTOR_BATCH_SIZE batches."""
+    ensure_neo4j_vector_index()
+    for start in range(0, len(ids), NEO4J_VECTOR_BATCH_SIZE):
+        end = start + NEO4J_VECTOR_BATCH_SIZE
+        graph.query(REPLACE_CHUNKS_QUERY, {"rows": [
+            {"id": cid, "doc_id": meta.get("doc_id"), "text": text}
+            for cid, meta, text in zip(ids[start:end], metadatas[start:end], texts[start:end])
+        ]})
+        # MERGEs on DocumentChunk.id, so a re-written chunk replaces its node
+        vector_store_neo4j.add_embeddings(texts[start:end], vectors[start:end], metadatas=metadatas[start:end], ids=ids[start:end])
+
+def write_chroma_vectors(texts: List[str], vectors: List[List[float]], metadatas: List[dict], ids: List[str]):
+    """Writes precomputed chunk vectors to the factory_knowledge collection."""
+    # langchain_chroma only exposes add paths that embed again, so go to the collection directly
+    vector_store_chroma._collection.upsert(ids=ids, embeddings=vectors, metadatas=metadatas, documents=texts)
+
 # In agent.py
 
-def ingest_node(state: GraphState):
+async def ingest_node(state: GraphState):
     logger.info("\n--- AGENT: STARTING SEMANTIC INGESTION ---")
     docs_to_process = []
     
@@ -207,77 +362,207 @@ def ingest_node(state: GraphState):
     safe_graph_docs = text_splitter.split_documents(docs_to_process)
     logger.info(f"   > Split {len(docs_to_process)} raw docs into {len(safe_graph_docs)} safe processing chunks.")
 
+    # Content-derived chunk IDs: chunks already stored for this manual are skipped
+    known_chunk_ids = set(state.get("known_chunk_ids") or [])
+    for d in safe_graph_docs:
+        d.metadata["id"] = chunk_id(d.metadata["doc_id"], d.page_content, EXTRACT)
+    extract_chunk_ids = [d.metadata["id"] for d in safe_graph_docs]
+    safe_graph_docs = [d for d in safe_graph_docs if d.metadata["id"] not in known_chunk_ids]
+
+    chunks_extracted = 0
+    vectors_written = 0
+    chunks_deduplicated = 0
+    ingest_complete = True
+
     # 3. EXTRACT ENTITIES
-    logger.info("   > Extracting Entities...")
-    try:
-        # Optional: Define allowed nodes/rels to further stabilize the LLM
-        # allowed_nodes = ["Machinery", "Part", "Issue", "Action", "Technician"]
-        # allowed_rels = ["PART_OF", "CAUSES", "REQUIRES", "LOCATED_AT"]
-        
-        transformer = LLMGraphTransformer(
-            llm=llm,
-            # allowed_nodes=allowed_nodes, # Uncomment if errors persist
-            # allowed_relationships=allowed_rels
-        )
-        
-        graph_documents = transformer.convert_to_graph_documents(safe_graph_docs)
-        
-        # Post-process: attach metadata to nodes
-        for graph_doc in graph_documents:
-            if hasattr(graph_doc, 'source') and hasattr(graph_doc.source, 'metadata'):
-                source_meta = graph_doc.source.metadata
-                for node in graph_doc.nodes:
-                    node.properties.update(source_meta)
-                    
-        graph.add_graph_documents(graph_documents)
-        logger.info(f"   > Successfully extracted Knowledge Graph from {len(graph_documents)} chunks.")
-        
-    except Exception as e:
-        # We catch the error so the Vector Indexing (below) still happens even if Graph fails
-        logger.info(f"   > KG Extraction Skipped due to LLM Validation Error: {e}")
+    # Chunks are extracted concurrently (bounded by extraction_semaphore) and each one is
+    # handed to the graph write batcher as soon as it completes, so writes overlap the
+    # remaining extractions; the batcher merges them (with other ingests) into UNWIND writes.
+    logger.info(f"   > Extracting Entities from {len(safe_graph_docs)} chunks...")
+    extracted_ids = set()
+    writes = []
+    for next_done in asyncio.as_completed([_extract_chunk(doc) for doc in safe_graph_docs]):
+        graph_doc = await next_done
+        if graph_doc is not None:
+            # Provenance stays on each chunk's Document node (linked by MENTIONS), not on every entity
+            writes.append((graph_doc, asyncio.ensure_future(graph_write_batcher.submit([graph_doc]))))
+    results = await asyncio.gather(*(write for _, write in writes), return_exceptions=True)
+    graph_docs = []
+    for (graph_doc, _), result in zip(writes, results):
+        if isinstance(result, Exception):
+            logger.info(f"   > Graph write failed for chunk {graph_doc.source.metadata.get('id')}: {result}")
+            continue
+        graph_docs.append(graph_doc)
+        extracted_ids.add(graph_doc.source.metadata["id"])
+        chunks_extracted += 1
+    if graph_docs:
+        chat_vocabulary.add_graph_documents(graph_docs)
+    new_labels, new_rel_types = schema_elements(graph_docs)
+
+    failed = len(safe_graph_docs) - chunks_extracted
+    if failed:
+        # Only report chunks we know are stored, so the next ingest retries the rest
+        extract_chunk_ids = [cid for cid in extract_chunk_ids if cid in known_chunk_ids or cid in extracted_ids]
+        ingest_complete = False
+    logger.info(f"   > Extracted Knowledge Graph from {chunks_extracted} chunks ({failed} failed).")
 
     # 4. SEMANTIC VECTOR INDEXING (Vector Store handles large contexts better, so this is fine)
     logger.info("   > Performing Semantic Splitting...")
-    semantic_splitter = SemanticChunker(
-        embeddings, 
-        breakpoint_threshold_type="percentile" 
-    )
-    
-    chunked_docs = semantic_splitter.split_documents(docs_to_process)
+    chunked_docs = await run_io(semantic_splitter.split_documents, docs_to_process)
     logger.info(f"   > Created {len(chunked_docs)} semantic chunks.")
-    
-    if chunked_docs:
-        # Neo4j Vector
+
+    # dict() also drops repeated identical chunks, which would collide on ID
+    chunks_by_id = dict((chunk_id(d.metadata["doc_id"], d.page_content, VECTOR), d) for d in chunked_docs)
+    vector_chunk_ids = list(chunks_by_id)
+    new_ids = [cid for cid in vector_chunk_ids if cid not in known_chunk_ids]
+    logger.info(f"   > {len(vector_chunk_ids) - len(new_ids)} semantic chunks unchanged since last ingest.")
+    vectors_ok = True
+    neo4j_ids = []   # Chunks this window wrote to Neo4j, linked to their machinery below
+
+    # Boilerplate already stored (from any manual) is linked to, not embedded again
+    duplicates, signatures = {}, {}
+    if new_ids and CHUNK_DEDUP_ENABLED:
         try:
-            Neo4jVector.from_documents(
-                chunked_docs, embeddings, url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD,
-                index_name="factory_vector_index", node_label="DocumentChunk", embedding_node_property="embedding"
+            duplicates, signatures = await run_io(
+                chunk_dedup.find_duplicates, [(cid, chunks_by_id[cid].page_content) for cid in new_ids]
             )
-        except Exception as e: logger.info(f"Neo4j Vector Error: {e}")
-        
-        # Chroma Vector
+        except Exception as e:
+            logger.info(f"Chunk Dedup Error: {e}")
+        if duplicates:
+            logger.info(f"   > {len(duplicates)} semantic chunks are near-duplicates of stored chunks.")
+    store_ids = [cid for cid in new_ids if cid not in duplicates]
+
+    if store_ids:
+        new_docs = [chunks_by_id[cid] for cid in store_ids]
+        texts = [d.page_content for d in new_docs]
+        metadatas = [d.metadata for d in new_docs]
+
+        # Embed once, then fan the same vectors out to both stores
         try:
-            vector_store_chroma.add_documents(chunked_docs)
-        except Exception as e: logger.info(f"Chroma Vector Error: {e}")
+            vectors = await embedding_batcher.submit(texts)
+        except Exception as e:
+            logger.info(f"Embedding Error: {e}")
+            vectors = None
+            vectors_ok = False
+
+        if vectors:
+            # Neo4j Vector + Chroma Vector, written in parallel
+            results = await asyncio.gather(
+                run_io(write_neo4j_vectors, texts, vectors, metadatas, store_ids),
+                run_io(write_chroma_vectors, texts, vectors, metadatas, store_ids),
+                return_exceptions=True
+            )
+            for store, result in zip(("Neo4j", "Chroma"), results):
+                if isinstance(result, Exception):
+                    logger.info(f"{store} Vector Error: {result}")
+                    vectors_ok = False
+                else:
+                    vectors_written += len(new_docs)
+            if not isinstance(results[0], Exception):
+                chat_vocabulary.add_documents(metadatas)
+                new_labels.add("DocumentChunk")
+                neo4j_ids = store_ids
+
+    if vectors_ok and (signatures or duplicates):
+        try:
+            await run_io(chunk_dedup.add_canonical, {cid: signatures[cid] for cid in store_ids if cid in signatures})
+            if duplicates:
+                await run_io(link_duplicate_chunks, [
+                    {
+                        "id": cid,
+                        "canonical_id": canonical_id,
+                        "similarity": score,
+                        "doc_id": chunks_by_id[cid].metadata.get("doc_id"),
+                        "machinery": chunks_by_id[cid].metadata.get("machinery"),
+                        "manual_type": chunks_by_id[cid].metadata.get("manual_type")
+                    }
+                    for cid, (canonical_id, score) in duplicates.items()
+                ])
+                await run_io(chunk_dedup.add_duplicates, duplicates)
+                chat_vocabulary.add_documents([chunks_by_id[cid].metadata for cid in duplicates], labels=["DuplicateChunk"])
+                chunks_deduplicated = len(duplicates)
+                new_labels.update(("DuplicateChunk", "DocumentChunk"))
+                new_rel_types.add("DUPLICATE_OF")
+        except Exception as e:
+            logger.info(f"Duplicate Link Error: {e}")
+            vectors_ok = False
+
+    if not vectors_ok:
+        # Only report chunks we know are stored, so the next ingest retries the rest
+        vector_chunk_ids = [cid for cid in vector_chunk_ids if cid in known_chunk_ids]
+        ingest_complete = False
 
     # 5. LINK DOCUMENT TO MACHINERY
+    # One statement for the chunks this window wrote (matched on the DocumentChunk.id
+    # constraint); unchanged chunks were linked by the ingest that stored them
     logger.info("   > Linking Semantic Chunks to Machinery...")
-    for doc in docs_to_process:
-        target_machine = doc.metadata.get("machinery")
-        doc_id = doc.metadata.get("doc_id")
-        
-        if target_machine and target_machine != "Unknown":
-            link_query = """
-            MATCH (d:DocumentChunk) 
-            WHERE d.doc_id = $doc_id
-            MERGE (m:Machinery {name: $machine_name})
-            MERGE (d)-[:MANUAL_FOR]->(m)
-            """
+    links = {}
+    for cid in neo4j_ids:
+        machine = chunks_by_id[cid].metadata.get("machinery")
+        if machine and machine != "Unknown":
+            links.setdefault(machine, []).append(cid)
+    if links:
+        try:
+            await run_io(link_chunks_to_machinery, [{"chunk_ids": ids, "machine_name": m} for m, ids in links.items()])
+            chat_vocabulary.add_machines(links)
+            new_labels.add("Machinery")
+            new_rel_types.add("MANUAL_FOR")
+        except Exception as e: logger.info(f"Linking Error: {e}")
+
+    # Most windows only add entities of known types; the Cypher schema is refreshed only
+    # when this one added a label or relationship type it doesn't have yet
+    schema_cache.invalidate_if_new(new_labels, new_rel_types)
+
+    return {
+        "error_log": None,
+        "chunks_extracted": chunks_extracted,
+        "vectors_written": vectors_written,
+        "chunks_deduplicated": chunks_deduplicated,
+        "extract_chunk_ids": extract_chunk_ids,
+        "vector_chunk_ids": vector_chunk_ids,
+        "ingest_complete": ingest_complete
+    }
+
+def retire_chunks(extract_ids: List[str], vector_ids: List[str]):
+    """
+    Removes chunks that disappeared from a re-ingested manual:
+    - semantic chunks from Neo4j (DocumentChunk) and Chroma
+    - token-split source Documents, plus any extracted entity only they mentioned
+    """
+    if extract_ids:
+        retire_query = """
+        MATCH (d:Document) WHERE d.id IN $ids
+        OPTIONAL MATCH (d)-[:MENTIONS]->(e)
+        DETACH DELETE d
+        WITH DISTINCT e
+        WHERE e IS NOT NULL
+          AND e:__Entity__
+          AND NOT (e)<-[:MENTIONS]-(:Document)
+          AND NONE(label IN labels(e) WHERE label IN $core_labels)
+        DETACH DELETE e
+        """
+        try:
+            graph.query(retire_query, {"ids": extract_ids, "core_labels": CORE_LABELS})
+        except Exception as e: logger.info(f"Entity Retire Error: {e}")
+
+    if vector_ids:
+        # Canonical chunks that other manuals' duplicates still point at are kept
+        deletable = chunk_dedup.retire(vector_ids)
+        try:
+            graph.query("MATCH (c:DuplicateChunk) WHERE c.id IN $ids DETACH DELETE c", {"ids": vector_ids})
+            graph.query("MATCH (c:DocumentChunk) WHERE c.id IN $ids DETACH DELETE c", {"ids": deletable})
+        except Exception as e: logger.info(f"Neo4j Chunk Retire Error: {e}")
+        if deletable:
             try:
-                graph.query(link_query, {"doc_id": doc_id, "machine_name": target_machine})
-            except Exception as e: logger.info(f"Linking Error: {e}")
+                vector_store_chroma.delete(ids=deletable)
+            except Exception as e: logger.info(f"Chroma Chunk Retire Error: {e}")
 
-    return {"error_log": None}
+    # Removals add no labels or relationship types, so the Cypher schema is left to its TTL.
+    # An entity or source may still be used elsewhere, so removals rebuild the vocabulary
+    try:
+        chat_vocabulary.load(graph)
+    except Exception as e: logger.info(f"Chat Vocabulary Reload Error: {e}")
+    logger.info(f"   > Retired {len(extract_ids)} extraction chunks and {len(vector_ids)} vector chunks.")
    
 # --- 5. REFACTOR NODE ---
 def refactor_node(state: GraphState):
@@ -303,96 +588,38 @@ graph_workflow = workflow_builder.compile()
 
 def get_knowledge_graph_filters():
     """
-    Queries Neo4j to find all unique Machinery names and Data Sources.
-    Dynamically checks if 'Incident_History' is linked to any Machinery.
+    All unique Machinery names and Data Sources, from the chat vocabulary.
+    'Incident_History' is offered only if incidents are linked to any Machinery.
     """
     try:
-        # --- 1. FETCH MACHINERY ---
-        query_machine = """
-        MATCH (m:Machinery) 
-        WHERE m.name IS NOT NULL
-        RETURN DISTINCT m.name AS name
-        ORDER BY name ASC
-        """
-        machine_result = graph.query(query_machine)
-        machines = [r["name"] for r in machine_result]
-        
-        # --- 2. FETCH DOCUMENT SOURCES ---
-        # Checks DocumentChunks for types like "Manuals", "Logs", etc.
-        query_source = "MATCH (n:DocumentChunk) RETURN DISTINCT n.manual_type AS s"
-        source_result = graph.query(query_source)
-        sources = [r["s"] for r in source_result if r["s"] and r["s"] != "General"]
-        
-        # --- 3. CHECK FOR MACHINE-SPECIFIC INCIDENT HISTORY ---
-        # "It should be for that specific machinery"
-        # We check if there are ANY nodes linked to machinery that represent incidents/history.
-        # This ensures the filter only appears if real incident data exists for your machines.
-        query_incident = """
-        MATCH (m:Machinery)--(n)
-        WHERE n.manual_type = 'Incident_History' OR n.source = 'Incident_History' OR 'Incident' IN labels(n)
-        RETURN count(n) as count
-        """
-        incident_check = graph.query(query_incident)
-        has_incidents = incident_check[0]["count"] > 0
-        
-        # Only add "Incident_History" if we actually found relevant data linked to machines
-        if has_incidents and "Incident_History" not in sources:
-            sources.append("Incident_History")
-        
-        return {
-            "machinery": machines,
-            "sources": sorted(list(set(sources))) 
-        }
+        if not chat_vocabulary.loaded:
+            chat_vocabulary.load(graph)
+        return chat_vocabulary.filters()
     except Exception as e:
         logger.info(f"Error fetching filters: {e}")
         return {"machinery": [], "sources": []}
 
 # --- 8. HYBRID RETRIEVAL (VECTOR + GRAPH) ---
+CHAT_VECTOR_K = int(os.getenv("CHAT_VECTOR_K", "3"))
+CHAT_GRAPH_TOP_K = int(os.getenv("CHAT_GRAPH_TOP_K", "10"))   # Rows of Cypher output passed to synthesis
 
-def get_dynamic_schema_context(graph, selected_machine=None):
+async def aquery(query: str, params: Optional[dict] = None) -> List[dict]:
+    """graph.query on the async driver, in a read transaction."""
+    records, _, _ = await async_driver.execute_query(query, params or {}, routing_=RoutingControl.READ)
+    return [record.data() for record in records]
+
+async def get_dynamic_schema_context(selected_machine=None):
     """
     Fetches key values (IDs) specifically for the selected machine
     to help the LLM map 'bench lathe' -> 'Bench_Lathe'.
+    Served from the chat vocabulary; Neo4j is only queried if it isn't loaded yet.
     """
-    context_data = {
-        "valid_machines": "",
-        "valid_labels": "",
-        "relevant_ids": "" 
-    }
-    
-    try:
-        # 1. Get valid machines (Global)
-        result = graph.query("MATCH (n) WHERE n.machinery IS NOT NULL RETURN DISTINCT n.machinery as m")
-        context_data["valid_machines"] = ", ".join([r['m'] for r in result])
-        
-        # 2. Get valid labels (Global)
-        labels_result = graph.query("CALL db.labels()")
-        valid_labels = [r['label'] for r in labels_result if r['label'] not in ['Document', 'DocumentChunk']]
-        context_data["valid_labels"] = ", ".join(valid_labels)
-
-        # 3. Get Relevant IDs for the SPECIFIC Machine (Context Injection)
-        if selected_machine and selected_machine != "All":
-            # We fetch IDs only for the semantic nodes (Machine, Organization, Part, etc.)
-            # We exclude 'DocumentChunk' to keep the list clean.
-            query_ids = f"""
-            MATCH (n) 
-            WHERE n.machinery = '{selected_machine}' 
-            AND NOT 'DocumentChunk' IN labels(n)
-            AND NOT 'Document' IN labels(n)
-            RETURN DISTINCT n.id as id
-            LIMIT 100
-            """
-            id_result = graph.query(query_ids)
-            ids_list = [str(r['id']) for r in id_result if r['id']]
-            context_data["relevant_ids"] = ", ".join(ids_list)
-        else:
-            context_data["relevant_ids"] = "No specific machine selected, so no specific IDs loaded."
-
-        return context_data
-
-    except Exception as e:
-        logger.info(f"Error in schema context: {e}")
-        return context_data
+    if not chat_vocabulary.loaded:
+        try:
+            await run_io(chat_vocabulary.load, graph)
+        except Exception as e:
+            logger.info(f"Error in schema context: {e}")
+    return chat_vocabulary.schema_context(selected_machine)
 
 def get_machine_neighborhood_context(machine_name, allowed_sources=None):
     """
@@ -411,10 +638,13 @@ def get_machine_neighborhood_context(machine_name, allowed_sources=None):
     # 1. Matches the machine and neighbors.
     # 2. WHERE clause: 
     #    - If the node has a 'manual_type' property (ingested data), it MUST be in 'allowed_sources'.
+    #    - Extracted entities carry no metadata; they count if a chunk of an allowed source mentions them.
     #    - OR if 'manual_type' is NULL (e.g., Tasks/Technicians created via UI), we include them.
     query = """
     MATCH (m:Machinery {name: $name})-[r]-(n)
-    WHERE (n.manual_type IN $sources OR n.manual_type IS NULL)
+    WHERE (n.manual_type IN $sources
+           OR (n:__Entity__ AND EXISTS { MATCH (d:Document)-[:MENTIONS]->(n) WHERE d.manual_type IN $sources })
+           OR (n.manual_type IS NULL AND NOT n:__Entity__))
     RETURN 
         type(r) as relationship,
         labels(n) as node_labels,
@@ -436,7 +666,7 @@ def get_machine_neighborhood_context(machine_name, allowed_sources=None):
         
         for record in results:
             rel_type = record['relationship']
-            node_type = record['node_labels'][0] if record['node_labels'] else "Node"
+            node_type = next((l for l in record['node_labels'] if l != "__Entity__"), "Node")
             content = record['content']
             
             # Smart Formatting based on Node Type
@@ -456,7 +686,92 @@ def get_machine_neighborhood_context(machine_name, allowed_sources=None):
         return f"Graph Retrieval Error: {str(e)}"
     
 
-def process_chat_query(request):
+CYPHER_GENERATION_TEMPLATE = """
+        Task: Generate Cypher statement to query a graph database.
+        Schema: {schema}
+        
+        CRITICAL DATA CONTEXT:
+        1. Valid Machinery: [{valid_machines}]
+        2. Valid Labels: [{valid_labels}]
+        3. ACTUAL IDs IN DB: [{relevant_ids}]
+        
+        Instructions:
+        1. If user says 'bench lathe' and 'Bench_Lathe' is in ACTUAL IDs, use `n.id = 'Bench_Lathe'`.
+        2. Extracted entities have no `machinery` property; the manual chunks that mention them do.
+           To scope to machine `{machine}` (unless it is 'All' or empty), match through them:
+           `MATCH (d:Document {{machinery: '{machine}'}})-[:MENTIONS]->(n)`.
+        
+        Question: {query}
+        """
+
+cypher_prompt = PromptTemplate(
+    input_variables=["schema", "query", "valid_machines", "valid_labels", "relevant_ids", "machine"],
+    template=CYPHER_GENERATION_TEMPLATE
+)
+
+synthesis_prompt = ChatPromptTemplate.from_template(
+    """You are a FactoryOS industrial expert.
+        Use the following retrieved data to answer the user.
+        
+        STRUCTURED GRAPH DATA: {graph_context}
+        UNSTRUCTURED MANUAL TEXT: {vector_context}
+        
+        USER QUESTION: {query}
+        
+        Instruction: If the answer isn't in the data, explain that active filters ({sources}) might be hiding it."""
+)
+
+# Built once and shared by every chat request
+cypher_generation_chain = cypher_prompt | llm | StrOutputParser()
+synthesis_chain = synthesis_prompt | llm | StrOutputParser()
+
+async def retrieve_vector_context(query_vector: "asyncio.Future", final_filter: dict) -> List[Document]:
+    return await vector_store_chroma.asimilarity_search_by_vector(await query_vector, k=CHAT_VECTOR_K, filter=final_filter)
+
+async def retrieve_graph_context(query: str, machine, query_vector: "asyncio.Future") -> List[Any]:
+    """
+    Generates Cypher for the question and runs it (the old GraphCypherQAChain
+    with return_direct, on the async LLM and driver). Cypher that returned rows
+    is reused for the same question (see cypher_cache). Returns [] on any error.
+    """
+    try:
+        schema, dyn_ctx = await asyncio.gather(schema_cache.aget(graph), get_dynamic_schema_context(machine))
+        fingerprint = schema_fingerprint(schema.schema)
+        cypher = None
+        if CYPHER_CACHE_ENABLED:
+            # SQLite reads and the similarity scan run in a thread, off the event loop
+            cypher = await asyncio.to_thread(cypher_cache.lookup_exact, query, machine, fingerprint, schema.structured_schema)
+            if cypher is None:
+                cypher = await asyncio.to_thread(
+                    cypher_cache.lookup_similar, query, machine, await query_vector, fingerprint, schema.structured_schema
+                )
+        cached = cypher is not None
+
+        if not cached:
+            started = time.perf_counter()
+            generated = await cypher_generation_chain.ainvoke({
+                "schema": schema.schema,
+                "query": query,
+                "machine": machine,
+                "valid_machines": dyn_ctx['valid_machines'],
+                "valid_labels": dyn_ctx['valid_labels'],
+                "relevant_ids": dyn_ctx['relevant_ids']
+            })
+            cypher_cache.record_generation(time.perf_counter() - started)
+            cypher = extract_cypher(generated)
+            logger.info(f"Generated Cypher: {cypher}")
+        else:
+            logger.info(f"Cached Cypher: {cypher}")
+
+        rows = (await aquery(cypher))[:CHAT_GRAPH_TOP_K] if cypher else []
+        if rows and not cached and CYPHER_CACHE_ENABLED:
+            await asyncio.to_thread(cypher_cache.put, query, machine, cypher, fingerprint, await query_vector)
+        return rows
+    except Exception as e:
+        logger.info(f"Graph Error: {e}")
+        return []
+
+async def process_chat_query(request):
     query = request.query
     sources = request.selected_sources 
     machine = request.selected_machine
@@ -476,7 +791,6 @@ def process_chat_query(request):
     if not sources:
         return {"answer": "Please select at least one data source.", "trace": trace_graph, "citations": []}
 
-    # --- STEP 1: VECTOR RETRIEVAL ---
     conditions = []
     if len(sources) == 1:
         conditions.append({"manual_type": sources[0]})
@@ -487,9 +801,14 @@ def process_chat_query(request):
         conditions.append({"machinery": machine})
 
     final_filter = conditions[0] if len(conditions) == 1 else {"$and": conditions}
-    
-    retriever = vector_store_chroma.as_retriever(search_kwargs={"k": 3, "filter": final_filter})
-    vector_docs = retriever.invoke(query)
+
+    # --- STEPS 1 + 2: VECTOR AND GRAPH RETRIEVAL, CONCURRENTLY ---
+    # The question is embedded once, for the vector search and the Cypher cache's semantic lookup
+    query_vector = asyncio.ensure_future(embeddings.aembed_query(query))
+    vector_docs, raw_graph_data = await asyncio.gather(
+        retrieve_vector_context(query_vector, final_filter),
+        retrieve_graph_context(query, machine, query_vector)
+    )
 
     for i, doc in enumerate(vector_docs):
         doc_id = f"vec_{i}"
@@ -505,80 +824,21 @@ def process_chat_query(request):
 
     vector_context_str = "\n\n".join([d.page_content for d in vector_docs])
 
-    # --- STEP 2: GRAPH RETRIEVAL (DYNAMIC CYPHER) ---
     graph_context_str = "No graph data found."
-    try:
-        graph.refresh_schema()
-        dyn_ctx = get_dynamic_schema_context(graph, selected_machine=machine)
-        
-        cypher_generation_template = """
-        Task: Generate Cypher statement to query a graph database.
-        Schema: {schema}
-        
-        CRITICAL DATA CONTEXT:
-        1. Valid Machinery: [{valid_machines}]
-        2. Valid Labels: [{valid_labels}]
-        3. ACTUAL IDs IN DB: [{relevant_ids}]
-        
-        Instructions:
-        1. If user says 'bench lathe' and 'Bench_Lathe' is in ACTUAL IDs, use `n.id = 'Bench_Lathe'`.
-        2. Filter by `machinery` property: `{machine}`.
-        
-        Question: {query}
-        """
-        
-        cypher_prompt = PromptTemplate(
-            input_variables=["schema", "query", "valid_machines", "valid_labels", "relevant_ids", "machine"],
-            template=cypher_generation_template
-        )
-
-        cypher_chain = GraphCypherQAChain.from_llm(
-            llm=llm, graph=graph, cypher_prompt=cypher_prompt, 
-            verbose=True, allow_dangerous_requests=True, return_direct=True 
-        )
-        
-        graph_result = cypher_chain.invoke({
-            "query": query,
-            "machine": machine,
-            "valid_machines": dyn_ctx['valid_machines'],
-            "valid_labels": dyn_ctx['valid_labels'],
-            "relevant_ids": dyn_ctx['relevant_ids']
-        })
-        
-        raw_graph_data = graph_result.get('result', [])
-        if raw_graph_data:
-            graph_context_str = str(raw_graph_data)
-            for item in raw_graph_data:
-                if isinstance(item, dict) and 'id' in item:
-                    add_to_trace(item['id'], item.get('name', item['id']), role="knowledge")
-                    trace_graph["links"].append({"source": "user_query", "target": item['id']})
-    except Exception as e:
-        logger.info(f"Graph Error: {e}")
+    if raw_graph_data:
+        graph_context_str = str(raw_graph_data)
+        for item in raw_graph_data:
+            if isinstance(item, dict) and 'id' in item:
+                add_to_trace(item['id'], item.get('name', item['id']), role="knowledge")
+                trace_graph["links"].append({"source": "user_query", "target": item['id']})
 
     # --- STEP 3: HYBRID SYNTHESIS ---
-    prompt = ChatPromptTemplate.from_template(
-        """You are a FactoryOS industrial expert.
-        Use the following retrieved data to answer the user.
-        
-        STRUCTURED GRAPH DATA: {graph_context}
-        UNSTRUCTURED MANUAL TEXT: {vector_context}
-        
-        USER QUESTION: {query}
-        
-        Instruction: If the answer isn't in the data, explain that active filters ({sources}) might be hiding it."""
-    )
-
-    chain = (
-        {
-            "graph_context": lambda x: graph_context_str, 
-            "vector_context": lambda x: vector_context_str, 
-            "query": lambda x: query,
-            "sources": lambda x: ", ".join(sources)
-        }
-        | prompt | llm | StrOutputParser()
-    )
-
-    response_text = chain.invoke(query)
+    response_text = await synthesis_chain.ainvoke({
+        "graph_context": graph_context_str,
+        "vector_context": vector_context_str,
+        "query": query,
+        "sources": ", ".join(sources)
+    })
 
     return {
         "answer": response_text,
@@ -613,6 +873,8 @@ def add_technician_to_graph(tech: dict):
     
     try:
         graph.query(query, params)
+        schema_cache.invalidate()
+        chat_vocabulary.add_labels(["Person", "Technician"])
         logger.info(f" > Added Technician: {tech['name']}")
         return True
     except Exception as e:
@@ -657,6 +919,9 @@ def add_task_to_graph(task: dict):
 
     try:
         graph.query(query, params)
+        schema_cache.invalidate()
+        chat_vocabulary.add_labels(["Task"])
+        chat_vocabulary.add_machines([task["target_machine"]])
         logger.info(f" > SUCCESS: Task '{task['title']}' linked to Machine '{task['target_machine']}'")
         return True
     except Exception as e:
@@ -0,0 +1,65 @@
+"""
+Chain Construction Benchmark
+Times the per-request setup that chat and the work-order nodes used to pay:
+graph.refresh_schema() plus a new PromptTemplate / GraphCypherQAChain on
+every call, against ManufacturingKGQueryEngine.shared() (one schema lookup,
+chain from chain_registry).
+
+No LLM calls are made; only construction and schema lookups are timed, so
+the difference is pure per-request overhead. Needs the Neo4j instance agent.py
+points at.
+
+Usage: python bench_chain_registry.py [requests]
+"""
+import sys
+import time
+import statistics
+
+started = time.perf_counter()
+from langchain_neo4j import GraphCypherQAChain
+from langchain_core.prompts import PromptTemplate
+from agent import llm, graph, CYPHER_GENERATION_TEMPLATE
+from kg_engine import ManufacturingKGQueryEngine
+from chain_registry import chain_registry
+IMPORT_SECONDS = time.perf_counter() - started
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+
+def legacy_request():
+    """What every chat / work-order node execution built before the registry."""
+    graph.refresh_schema()
+    prompt = PromptTemplate(
+        input_variables=["schema", "query", "valid_machines", "valid_labels", "relevant_ids", "machine"],
+        template=CYPHER_GENERATION_TEMPLATE
+    )
+    GraphCypherQAChain.from_llm(
+        llm=llm, graph=graph, cypher_prompt=prompt,
+        verbose=True, allow_dangerous_requests=True, return_direct=True
+    )
+    GraphCypherQAChain.from_llm(
+        llm=llm, graph=graph, verbose=True,
+        allow_dangerous_requests=True, return_direct=True, validate_cypher=True
+    )
+
+def shared_request():
+    return ManufacturingKGQueryEngine.shared().chain
+
+def timed(fn):
+    t = time.perf_counter()
+    fn()
+    return (time.perf_counter() - t) * 1000
+
+def report(name, samples):
+    samples = sorted(samples)
+    print(f"{name:<10} p50 {statistics.median(samples):8.2f}ms   p95 {samples[int(0.95 * (len(samples) - 1))]:8.2f}ms")
+
+def main():
+    print(f"Imports (agent, kg_engine): {IMPORT_SECONDS:.2f}s")
+    print(f"First shared build (cold):  {timed(shared_request):.2f}ms")
+
+    report("legacy", [timed(legacy_request) for _ in range(REQUESTS)])
+    report("shared", [timed(shared_request) for _ in range(REQUESTS)])
+    print(chain_registry.stats())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+Chunk Link Benchmark
+Times linking one ingest's DocumentChunks to their Machinery node as the corpus
+grows, for the old per-document statements and the single UNWIND statement over
+the ingest's chunk ids.
+
+The UNWIND statement matches on the DocumentChunk.id constraint and only touches
+the chunks the ingest wrote, so its time should stay flat. The per-document
+statements use the DocumentChunk.doc_id index (graph_schema); pass --no-index
+to drop it and see their label scans.
+Uses throwaway doc_ids and machinery names and cleans up after itself.
+
+Usage: python bench_chunk_link.py [--no-index]
+"""
+import os
+import sys
+import time
+from langchain_neo4j import Neo4jGraph
+from graph_schema import bootstrap_schema
+
+# --- CONFIGURATION ---
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "qwertyuiop")
+
+CORPUS_SIZES = [1000, 10000, 50000]   # DocumentChunks in the store
+DOCS_PER_INGEST = 20
+CHUNKS_PER_DOC = 40
+PREFIX = "bench_link_"
+
+LEGACY_QUERY = """
+MATCH (d:DocumentChunk)
+WHERE d.doc_id = $doc_id
+MERGE (m:Machinery {name: $machine_name})
+MERGE (d)-[:MANUAL_FOR]->(m)
+"""
+
+LINK_QUERY = """
+UNWIND $links AS link
+MATCH (d:DocumentChunk) WHERE d.id IN link.chunk_ids
+MERGE (m:Machinery {name: link.machine_name})
+MERGE (d)-[:MANUAL_FOR]->(m)
+"""
+
+def grow_corpus(graph, target, current):
+    """Adds filler DocumentChunks (CHUNKS_PER_DOC per doc_id) until the corpus has `target`."""
+    for start in range(current, target, 5000):
+        graph.query("""
+        UNWIND range($start, $end - 1) AS i
+        CREATE (:DocumentChunk {id: $prefix + 'chunk_' + i, doc_id: $prefix + 'doc_' + (i / $per_doc), text: 'filler'})
+        """, {"start": start, "end": min(start + 5000, target), "prefix": PREFIX, "per_doc": CHUNKS_PER_DOC})
+    return target
+
+def ingest_links(size):
+    """The last DOCS_PER_INGEST documents, per doc_id (legacy) and as one ingest's chunk ids."""
+    last_doc = size // CHUNKS_PER_DOC
+    docs = range(last_doc - DOCS_PER_INGEST, last_doc)
+    machine = f"{PREFIX}machine"
+    legacy = [{"doc_id": f"{PREFIX}doc_{d}", "machine_name": machine} for d in docs]
+    chunk_ids = [f"{PREFIX}chunk_{i}" for d in docs for i in range(d * CHUNKS_PER_DOC, (d + 1) * CHUNKS_PER_DOC)]
+    return legacy, [{"chunk_ids": chunk_ids, "machine_name": machine}]
+
+def timed(fn):
+    started = time.perf_counter()
+    fn()
+    return time.perf_counter() - started
+
+def cleanup(graph):
+    graph.query("""
+    MATCH (d:DocumentChunk) WHERE d.id STARTS WITH $prefix
+    CALL { WITH d DETACH DELETE d } IN TRANSACTIONS OF 10000 ROWS
+    """, {"prefix": PREFIX})
+    graph.query("MATCH (m:Machinery) WHERE m.name STARTS WITH $prefix DETACH DELETE m", {"prefix": PREFIX})
+
+if __name__ == "__main__":
+    graph = Neo4jGraph(url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD)
+    bootstrap_schema(graph)
+    if "--no-index" in sys.argv:
+        graph.query("DROP INDEX document_chunk_doc_id IF EXISTS")
+
+    current = 0
+    try:
+        print(f"Linking {DOCS_PER_INGEST} docs x {CHUNKS_PER_DOC} chunks per ingest")
+        for size in CORPUS_SIZES:
+            current = grow_corpus(graph, size, current)
+            legacy_links, links = ingest_links(size)
+            legacy = timed(lambda: [graph.query(LEGACY_QUERY, link) for link in legacy_links])
+            unwind = timed(lambda: graph.query(LINK_QUERY, {"links": links}))
+            print(f"{size:>7} chunks: per-document {legacy * 1000:8.1f} ms   UNWIND {unwind * 1000:8.1f} ms")
+    finally:
+        cleanup(graph)
+        if "--no-index" in sys.argv:
+            graph.query("CREATE INDEX document_chunk_doc_id IF NOT EXISTS FOR (n:DocumentChunk) ON (n.doc_id)")
@@ -0,0 +1,70 @@
+"""
+Extraction Benchmark
+Times text + image extraction of a PDF in one process (page range by page range)
+against pdf_extract.iter_page_shards across the process pool, for increasing
+parallelism.
+
+Without a PDF argument a synthetic 2000-page manual (text plus a diagram every
+fifth page) is generated in a temp dir.
+
+Usage: python bench_extract.py [manual.pdf] [--shard-pages N]
+"""
+import os
+import time
+import argparse
+import asyncio
+import tempfile
+import fitz  # PyMuPDF
+from executors import INGEST_PROCESS_WORKERS, shutdown_pools
+from pdf_extract import get_page_count, extract_page_range, iter_page_shards
+
+SYNTHETIC_PAGES = 2000
+
+def synthetic_manual(path):
+    diagram = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 1200, 900), 0)
+    diagram.clear_with(160)
+    diagram.set_rect(fitz.IRect(100, 100, 700, 500), (30, 30, 30))
+    png = diagram.tobytes("png")
+    doc = fitz.open()
+    for i in range(SYNTHETIC_PAGES):
+        page = doc.new_page()
+        page.insert_textbox(fitz.Rect(50, 50, 560, 740), f"Section {i}. Torque the J{i % 6 + 1} bolts to spec. " * 40, fontsize=8)
+        if i % 5 == 0:
+            page.insert_image(fitz.Rect(50, 400, 560, 760), stream=png)
+    doc.save(path)
+
+def sequential(pdf_path, page_count, shard_pages):
+    for start in range(0, page_count, shard_pages):
+        extract_page_range(pdf_path, start, start + shard_pages)
+
+async def sharded(pdf_path, page_count, shard_pages, parallelism):
+    async for _ in iter_page_shards(pdf_path, page_count, shard_pages, parallelism):
+        pass
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("pdf", nargs="?")
+    parser.add_argument("--shard-pages", type=int, default=10)
+    args = parser.parse_args()
+    shard_pages = args.shard_pages
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pdf_path = args.pdf or os.path.join(tmp_dir, "synthetic.pdf")
+        if not args.pdf:
+            synthetic_manual(pdf_path)
+        page_count = get_page_count(pdf_path)
+        print(f"{page_count} pages, {shard_pages} pages per shard, {INGEST_PROCESS_WORKERS} worker processes")
+
+        started = time.perf_counter()
+        sequential(pdf_path, page_count, shard_pages)
+        baseline = time.perf_counter() - started
+        print(f"  single process   {baseline:7.2f} s   {page_count / baseline:7.1f} pages/s")
+
+        parallelism = 1
+        while parallelism <= INGEST_PROCESS_WORKERS:
+            started = time.perf_counter()
+            asyncio.run(sharded(pdf_path, page_count, shard_pages, parallelism))
+            elapsed = time.perf_counter() - started
+            print(f"  {parallelism:>2} shards at once {elapsed:7.2f} s   {page_count / elapsed:7.1f} pages/s   x{baseline / elapsed:.2f}")
+            parallelism *= 2
+        shutdown_pools()
@@ -0,0 +1,83 @@
+"""
+Graph Write Benchmark
+Compares the old per-chunk write path (metadata copied onto every node, then
+Neo4jGraph.add_graph_documents per chunk) with graph_writer.write_graph_documents
+on synthetic extraction output.
+
+Reports write time, rows/s and graph size (nodes, relationships, stored node
+properties). Uses throwaway labels and cleans up after itself.
+
+Usage: python bench_graph_write.py [chunks] [entities_per_chunk]
+"""
+import os
+import sys
+import time
+import random
+from langchain_core.documents import Document
+from langchain_neo4j import Neo4jGraph
+from langchain_neo4j.graphs.graph_document import GraphDocument, Node, Relationship
+import graph_writer
+
+# --- CONFIGURATION ---
+NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
+NEO4J_USERNAME = os.getenv("NEO4J_USERNAME", "neo4j")
+NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "qwertyuiop")
+
+BENCH_LABEL = "BenchPart"
+
+def synthetic_graph_documents(run, chunks, entities_per_chunk, vocabulary=400):
+    """Chunks of one manual mentioning overlapping parts, as LLMGraphTransformer returns them."""
+    rng = random.Random(42)
+    docs = []
+    for c in range(chunks):
+        parts = rng.sample(range(vocabulary), entities_per_chunk)
+        nodes = [Node(id=f"{run} part {p}", type=BENCH_LABEL) for p in parts]
+        rels = [Relationship(source=a, target=b, type="connected to") for a, b in zip(nodes, nodes[1:])]
+        source = Document(page_content=f"Synthetic chunk {c}", metadata={
+            "id": f"{run}-chunk-{c}", "doc_id": f"{run}_Service_Manual", "filename": f"{run}.pdf",
+            "machinery": "Bench_Robot", "manual_type": "Service_Manual", "source": "Service_Manual",
+            "page_start": c, "page_end": c
+        })
+        docs.append(GraphDocument(nodes=nodes, relationships=rels, source=source))
+    return docs
+
+def legacy_write(graph, graph_docs):
+    for graph_doc in graph_docs:
+        source_meta = {k: v for k, v in graph_doc.source.metadata.items() if k != "id"}
+        for node in graph_doc.nodes:
+            node.properties.update(source_meta)
+        graph.add_graph_documents([graph_doc], include_source=True)
+
+def graph_size(graph, run):
+    return graph.query(f"""
+    MATCH (n:{BENCH_LABEL}) WHERE n.id STARTS WITH $run
+    RETURN count(n) AS nodes,
+           sum(size(keys(n))) AS node_properties,
+           sum(COUNT {{ (n)-[]->(:{BENCH_LABEL}) }}) AS relationships,
+           sum(COUNT {{ (n)<-[:MENTIONS]-() }}) AS mentions
+    """, {"run": run})[0]
+
+def cleanup(graph, run):
+    graph.query(f"MATCH (n:{BENCH_LABEL}) WHERE n.id STARTS WITH $run DETACH DELETE n", {"run": run})
+    graph.query("MATCH (d:Document) WHERE d.id STARTS WITH $run DETACH DELETE d", {"run": run})
+
+def bench(graph, name, writer, chunks, entities_per_chunk):
+    graph_docs = synthetic_graph_documents(name, chunks, entities_per_chunk)
+    rows = sum(len(gd.nodes) + len(gd.relationships) + 1 for gd in graph_docs)
+    started = time.perf_counter()
+    writer(graph, graph_docs)
+    elapsed = time.perf_counter() - started
+    size = graph_size(graph, name)
+    cleanup(graph, name)
+    print(f"{name:>8}: {elapsed:7.2f}s  {rows / elapsed:9.1f} rows/s  "
+          f"{size['nodes']} nodes  {size['relationships']} rels  {size['mentions']} mentions  "
+          f"{size['node_properties']} node properties")
+
+if __name__ == "__main__":
+    chunks = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    entities_per_chunk = int(sys.argv[2]) if len(sys.argv) > 2 else 15
+    graph = Neo4jGraph(url=NEO4J_URI, username=NEO4J_USERNAME, password=NEO4J_PASSWORD)
+    graph_writer.ensure_schema(graph)
+    print(f"{chunks} chunks x {entities_per_chunk} entities")
+    bench(graph, "legacy", legacy_write, chunks, entities_per_chunk)
+    bench(graph, "unwind", graph_writer.write_graph_documents, chunks, entities_per_chunk)
@@ -0,0 +1,61 @@
+"""
+Chain Registry
+Cypher QA chains (and anything else costly to build) are built once per
+configuration and shared by every request, instead of once per chat or per
+work-order node. The registered objects are stateless between calls (each
+invoke gets its own inputs; Neo4j sessions are per query), so concurrent
+requests can use the same instance.
+
+    chain = chain_registry.get("kg_cypher_qa", build_chain, version=schema.version)
+
+A name holds one object. Asking with a different version (e.g. a new graph
+schema) builds a replacement; requests already holding the old one finish with it.
+"""
+import time
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+import logging
+logger = logging.getLogger("uvicorn")
+
+class ChainRegistry:
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Optional[Hashable], Any]] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.builds: Dict[str, int] = {}
+        self.build_seconds: Dict[str, float] = {}
+
+    def get(self, name: str, build: Callable[[], Any], version: Optional[Hashable] = None) -> Any:
+        entry = self._entries.get(name)
+        if entry is not None and entry[0] == version:
+            self.hits += 1
+            return entry[1]
+        with self._lock:
+            # Built by another thread while we waited
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version:
+                self.hits += 1
+                return entry[1]
+            started = time.perf_counter()
+            obj = build()
+            elapsed = time.perf_counter() - started
+            self._entries[name] = (version, obj)
+            self.builds[name] = self.builds.get(name, 0) + 1
+            self.build_seconds[name] = self.build_seconds.get(name, 0.0) + elapsed
+            logger.info(f" > Built {name} (version {version}) in {elapsed * 1000:.1f}ms")
+            return obj
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": {name: str(version) for name, (version, _) in self._entries.items()},
+            "hits": self.hits,
+            "builds": dict(self.builds),
+            "build_seconds": {name: round(s, 4) for name, s in self.build_seconds.items()}
+        }
+
+# Singleton Instance
+chain_registry = ChainRegistry()
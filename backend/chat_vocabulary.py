@@ -0,0 +1,201 @@
+"""
+Chat Vocabulary
+In-process index of the values the Cypher prompt and the chat filters need:
+machinery values, node labels, document sources, whether machines have incident
+history, and the entity IDs each machine's manuals mention.
+
+It is loaded from Neo4j once at startup and then updated by the write paths
+(ingest, dashboard resources, work orders), so chat reads it without querying
+the database. Removals (retired chunks) rebuild it, since an entity may still
+be mentioned by another chunk. Formatted views are cached until the next change.
+"""
+import os
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+CHAT_VOCAB_MAX_IDS = int(os.getenv("CHAT_VOCAB_MAX_IDS", "100"))   # Entity IDs per machine put in the Cypher prompt
+
+# Structural labels the Cypher prompt doesn't offer
+HIDDEN_LABELS = {"Document", "DocumentChunk", "DuplicateChunk", "__Entity__"}
+
+_LOAD_QUERIES = {
+    "machinery": "MATCH (n) WHERE n.machinery IS NOT NULL RETURN DISTINCT n.machinery AS value",
+    "labels": "CALL db.labels() YIELD label RETURN label AS value",
+    "machines": "MATCH (m:Machinery) WHERE m.name IS NOT NULL RETURN DISTINCT m.name AS value",
+    "sources": "MATCH (n:DocumentChunk) RETURN DISTINCT n.manual_type AS value",
+    "incident_machines": """
+        MATCH (m:Machinery)--(n)
+        WHERE n.manual_type = 'Incident_History' OR n.source = 'Incident_History' OR 'Incident' IN labels(n)
+        RETURN DISTINCT m.name AS value
+    """,
+}
+
+_IDS_QUERY = """
+MATCH (d:Document)-[:MENTIONS]->(n)
+WHERE d.machinery IS NOT NULL AND n.id IS NOT NULL
+WITH d.machinery AS machine, collect(DISTINCT n.id) AS ids
+RETURN machine, ids[..$limit] AS ids
+"""
+
+class ChatVocabulary:
+    def __init__(self, max_ids: int = CHAT_VOCAB_MAX_IDS):
+        self.max_ids = max_ids
+        self.loaded = False
+        self.version = 0
+        self._lock = threading.Lock()
+        self._journal: Optional[List[Callable[[], None]]] = None   # Updates made while a load is running
+        self._reset()
+
+    def _reset(self):
+        self.machinery: Dict[str, None] = {}     # n.machinery values (insertion-ordered set)
+        self.labels: Dict[str, None] = {}
+        self.machines: Dict[str, None] = {}      # Machinery node names
+        self.sources: Dict[str, None] = {}       # DocumentChunk manual types
+        self.has_incidents = False
+        self.ids_by_machine: Dict[str, Dict[str, None]] = {}
+        self._views: Dict[Any, Any] = {}
+
+    # --- UPDATES ---
+
+    def _update(self, fn: Callable[[], None]):
+        with self._lock:
+            fn()
+            if self._journal is not None:
+                self._journal.append(fn)
+            self.version += 1
+            self._views = {}
+
+    def load(self, graph):
+        """Rebuilds the index from Neo4j. Updates made meanwhile are replayed on top."""
+        with self._lock:
+            self._journal = []
+        try:
+            results = {name: [r["value"] for r in graph.query(q)] for name, q in _LOAD_QUERIES.items()}
+            id_rows = graph.query(_IDS_QUERY, {"limit": self.max_ids})
+        except Exception:
+            with self._lock:
+                self._journal = None
+            raise
+
+        with self._lock:
+            journal, self._journal = self._journal, None
+            self._reset()
+            self.machinery.update((v, None) for v in results["machinery"] if v)
+            self.labels.update((v, None) for v in results["labels"] if v)
+            self.machines.update((v, None) for v in results["machines"] if v)
+            self.sources.update((v, None) for v in results["sources"] if v)
+            self.has_incidents = bool(results["incident_machines"])
+            for row in id_rows:
+                self.ids_by_machine[row["machine"]] = {str(i): None for i in row["ids"] if i}
+            for fn in journal:
+                fn()
+            self.loaded = True
+            self.version += 1
+        logger.info(
+            f" > Chat vocabulary loaded: {len(self.machinery)} machinery values, {len(self.labels)} labels, "
+            f"{sum(len(ids) for ids in self.ids_by_machine.values())} entity IDs"
+        )
+
+    def add_labels(self, labels: Iterable[str]):
+        labels = [l for l in labels if l]
+        self._update(lambda: self.labels.update((l, None) for l in labels))
+
+    def add_machines(self, names: Iterable[str]):
+        """Machinery nodes (dashboard, tasks, work orders, manual links)."""
+        names = [n for n in names if n]
+
+        def apply():
+            self.machines.update((n, None) for n in names)
+            self.labels["Machinery"] = None
+        self._update(apply)
+
+    def add_documents(self, metadatas: Iterable[Dict[str, Any]], labels: Iterable[str] = ("DocumentChunk",)):
+        """Stored chunks: their machinery and manual_type values."""
+        metadatas, labels = list(metadatas), list(labels)
+
+        def apply():
+            for meta in metadatas:
+                if meta.get("machinery"):
+                    self.machinery[meta["machinery"]] = None
+                if meta.get("manual_type") and "DocumentChunk" in labels:
+                    self.sources[meta["manual_type"]] = None
+            self.labels.update((l, None) for l in labels)
+        self._update(apply)
+
+    def add_graph_documents(self, graph_docs: Iterable[Any]):
+        """Extraction output written to the graph: entity labels and per-machine IDs."""
+        graph_docs = list(graph_docs)
+
+        def apply():
+            self.labels.update({"Document": None, "__Entity__": None})
+            for gd in graph_docs:
+                machine = gd.source.metadata.get("machinery")
+                if machine:
+                    self.machinery[machine] = None
+                ids = self.ids_by_machine.setdefault(machine, {}) if machine else None
+                for node in gd.nodes:
+                    self.labels[node.type.replace("`", "")] = None
+                    if ids is not None and node.id and len(ids) < self.max_ids:
+                        ids[str(node.id)] = None
+                for rel in gd.relationships:
+                    self.labels[rel.source.type.replace("`", "")] = None
+                    self.labels[rel.target.type.replace("`", "")] = None
+        self._update(apply)
+
+    def add_incident(self, machine_name: str):
+        def apply():
+            self.has_incidents = True
+            self.labels["Incident"] = None
+            if machine_name:
+                self.machines[machine_name] = None
+        self._update(apply)
+
+    # --- READS ---
+
+    def _view(self, key, build: Callable[[], Any]):
+        with self._lock:
+            if key not in self._views:
+                self._views[key] = build()
+            return self._views[key]
+
+    def schema_context(self, selected_machine: Optional[str] = None) -> Dict[str, str]:
+        """valid_machines / valid_labels / relevant_ids strings for the Cypher prompt."""
+        def build():
+            if selected_machine and selected_machine != "All":
+                relevant_ids = ", ".join(self.ids_by_machine.get(selected_machine, ()))
+            else:
+                relevant_ids = "No specific machine selected, so no specific IDs loaded."
+            return {
+                "valid_machines": ", ".join(self.machinery),
+                "valid_labels": ", ".join(l for l in self.labels if l not in HIDDEN_LABELS),
+                "relevant_ids": relevant_ids
+            }
+        return dict(self._view(("schema_context", selected_machine), build))
+
+    def filters(self) -> Dict[str, List[str]]:
+        """Machinery names and data sources offered by the chat filters."""
+        def build():
+            sources = {s for s in self.sources if s != "General"}
+            if self.has_incidents:
+                sources.add("Incident_History")
+            return {"machinery": sorted(self.machines), "sources": sorted(sources)}
+        view = self._view("filters", build)
+        return {"machinery": list(view["machinery"]), "sources": list(view["sources"])}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "loaded": self.loaded,
+                "version": self.version,
+                "machinery_values": len(self.machinery),
+                "labels": len(self.labels),
+                "machines": len(self.machines),
+                "sources": len(self.sources),
+                "entity_ids": sum(len(ids) for ids in self.ids_by_machine.values())
+            }
+
+# Singleton Instance
+chat_vocabulary = ChatVocabulary()
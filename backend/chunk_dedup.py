@@ -0,0 +1,225 @@
+"""
+Near-Duplicate Chunk Index
+MinHash signatures over word shingles of every stored semantic chunk, with an
+LSH band index in SQLite, kept up to date by ingest.
+
+Safety boilerplate, warranty text and standard torque tables repeat across
+manuals. A new chunk whose estimated Jaccard similarity to a stored chunk is at
+least CHUNK_DEDUP_THRESHOLD is not embedded or stored again; it is linked to
+that canonical chunk instead (see agent.link_duplicate_chunks).
+
+A canonical chunk whose own manual retires it is kept while duplicates still
+point at it (orphaned), and deleted together with its last duplicate.
+"""
+import os
+import re
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+CHUNK_DEDUP_ENABLED = os.getenv("CHUNK_DEDUP_ENABLED", "true").lower() == "true"
+CHUNK_DEDUP_PATH = os.getenv("CHUNK_DEDUP_PATH", "./chunk_dedup.db")
+CHUNK_DEDUP_THRESHOLD = float(os.getenv("CHUNK_DEDUP_THRESHOLD", "0.85"))
+CHUNK_DEDUP_MIN_TOKENS = int(os.getenv("CHUNK_DEDUP_MIN_TOKENS", "20"))   # Shorter chunks are always stored
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16            # 16 bands x 4 rows: candidates from ~50% similarity, verified against the threshold
+ROWS = NUM_PERM // BANDS
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+_rng = np.random.RandomState(1)   # Fixed seed: signatures must stay comparable across restarts
+_PERM_A = _rng.randint(1, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.randint(0, (1 << 61) - 1, size=NUM_PERM, dtype=np.uint64)
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> List[str]:
+    tokens = re.findall(r"\w+", text.lower())
+    if len(tokens) < CHUNK_DEDUP_MIN_TOKENS:
+        return []
+    return [" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)]
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """NUM_PERM uint32 MinHash signature, or None for chunks too short to compare."""
+    grams = set(shingles(text))
+    if not grams:
+        return None
+    hashes = np.array(
+        [int.from_bytes(hashlib.blake2b(g.encode("utf-8"), digest_size=4).digest(), "little") for g in grams],
+        dtype=np.uint64
+    )
+    # (a * h + b) mod p for every permutation x shingle; uint64 wrap-around is part of the hash
+    with np.errstate(over="ignore"):
+        permuted = ((np.outer(hashes, _PERM_A) + _PERM_B) % _MERSENNE_PRIME) & _MAX_HASH
+    return permuted.min(axis=0).astype(np.uint32)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the two chunks' shingle sets."""
+    return float(np.mean(a == b))
+
+def band_keys(signature: np.ndarray) -> List[Tuple[int, int]]:
+    keys = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(signature[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8).digest()
+        keys.append((band, int.from_bytes(digest, "little", signed=True)))
+    return keys
+
+class ChunkDedupIndex:
+    def __init__(self, path: str = CHUNK_DEDUP_PATH, threshold: float = CHUNK_DEDUP_THRESHOLD):
+        self.path = path
+        self.threshold = threshold
+        self.lookups = 0
+        self.duplicates_found = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_signatures (
+                chunk_id TEXT PRIMARY KEY,
+                signature BLOB,
+                canonical_id TEXT,            -- NULL for stored (canonical) chunks
+                orphaned INTEGER DEFAULT 0    -- canonical retired by its manual, kept for its duplicates
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_signatures_canonical ON chunk_signatures (canonical_id)")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS chunk_bands (
+                band INTEGER,
+                bucket INTEGER,
+                chunk_id TEXT
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunk_bands ON chunk_bands (band, bucket)")
+        self._conn.commit()
+
+    def _stored_candidates(self, signature: np.ndarray) -> Dict[str, np.ndarray]:
+        """Canonical chunks sharing at least one band with the signature."""
+        candidates = {}
+        for band, bucket in band_keys(signature):
+            rows = self._conn.execute("""
+                SELECT s.chunk_id, s.signature FROM chunk_bands b
+                JOIN chunk_signatures s ON s.chunk_id = b.chunk_id
+                WHERE b.band = ? AND b.bucket = ?
+            """, (band, bucket)).fetchall()
+            for cid, blob in rows:
+                candidates[cid] = np.frombuffer(blob, dtype=np.uint32)
+        return candidates
+
+    def find_duplicates(self, chunks: Iterable[Tuple[str, str]]) -> Tuple[Dict[str, Tuple[str, float]], Dict[str, np.ndarray]]:
+        """
+        chunks: [(chunk_id, text)] about to be stored.
+        Returns ({duplicate_id: (canonical_id, similarity)}, {chunk_id: signature}).
+        Earlier chunks of the same call count as canonical for later ones. Nothing
+        is recorded; call add_canonical / add_duplicates once the writes succeeded.
+        """
+        duplicates, signatures = {}, {}
+        batch_bands: Dict[Tuple[int, int], List[str]] = {}
+        with self._lock:
+            for cid, text in chunks:
+                signature = minhash(text)
+                if signature is None:
+                    continue
+                signatures[cid] = signature
+                self.lookups += 1
+                keys = band_keys(signature)
+                candidates = self._stored_candidates(signature)
+                for key in keys:
+                    for other in batch_bands.get(key, ()):
+                        candidates[other] = signatures[other]
+                # A re-ingest may bring back a chunk kept as an orphaned canonical
+                candidates.pop(cid, None)
+
+                best, best_score = None, self.threshold
+                for other, other_signature in candidates.items():
+                    score = similarity(signature, other_signature)
+                    if score >= best_score:
+                        best, best_score = other, score
+                if best is not None:
+                    duplicates[cid] = (best, round(best_score, 3))
+                    self.duplicates_found += 1
+                else:
+                    for key in keys:
+                        batch_bands.setdefault(key, []).append(cid)
+        return duplicates, signatures
+
+    def add_canonical(self, signatures: Dict[str, np.ndarray]):
+        """Records stored chunks so later chunks can be matched against them."""
+        with self._lock:
+            for cid, signature in signatures.items():
+                self._conn.execute("DELETE FROM chunk_bands WHERE chunk_id = ?", (cid,))
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO chunk_signatures (chunk_id, signature, canonical_id, orphaned) VALUES (?, ?, NULL, 0)",
+                    (cid, signature.astype(np.uint32).tobytes())
+                )
+                self._conn.executemany(
+                    "INSERT INTO chunk_bands (band, bucket, chunk_id) VALUES (?, ?, ?)",
+                    [(band, bucket, cid) for band, bucket in band_keys(signature)]
+                )
+            self._conn.commit()
+
+    def add_duplicates(self, duplicates: Dict[str, Tuple[str, float]]):
+        """Records chunks that were linked to a canonical chunk instead of being stored."""
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO chunk_signatures (chunk_id, signature, canonical_id, orphaned) VALUES (?, NULL, ?, 0)",
+                [(cid, canonical_id) for cid, (canonical_id, _) in duplicates.items()]
+            )
+            self._conn.commit()
+
+    def retire(self, chunk_ids: Iterable[str]) -> List[str]:
+        """
+        Forgets retired chunks. Returns the IDs whose stored vectors can be deleted:
+        canonical chunks nothing else points at, plus IDs this index never saw.
+        """
+        deletable = []
+        with self._lock:
+            for cid in chunk_ids:
+                row = self._conn.execute(
+                    "SELECT canonical_id FROM chunk_signatures WHERE chunk_id = ?", (cid,)
+                ).fetchone()
+                if row is None:
+                    deletable.append(cid)
+                    continue
+                canonical_id = row[0]
+                if canonical_id is not None:
+                    # A duplicate: nothing of its own is stored
+                    self._conn.execute("DELETE FROM chunk_signatures WHERE chunk_id = ?", (cid,))
+                    if self._drop_if_unused(canonical_id, orphan_only=True):
+                        deletable.append(canonical_id)
+                elif self._drop_if_unused(cid, orphan_only=False):
+                    deletable.append(cid)
+                else:
+                    self._conn.execute("UPDATE chunk_signatures SET orphaned = 1 WHERE chunk_id = ?", (cid,))
+            self._conn.commit()
+        return deletable
+
+    def _drop_if_unused(self, cid: str, orphan_only: bool) -> bool:
+        if self._conn.execute("SELECT 1 FROM chunk_signatures WHERE canonical_id = ? LIMIT 1", (cid,)).fetchone():
+            return False
+        if orphan_only and not self._conn.execute(
+            "SELECT 1 FROM chunk_signatures WHERE chunk_id = ? AND orphaned = 1", (cid,)
+        ).fetchone():
+            return False
+        self._conn.execute("DELETE FROM chunk_signatures WHERE chunk_id = ?", (cid,))
+        self._conn.execute("DELETE FROM chunk_bands WHERE chunk_id = ?", (cid,))
+        return True
+
+    def stats(self):
+        with self._lock:
+            canonical, duplicates = self._conn.execute("""
+                SELECT COALESCE(SUM(canonical_id IS NULL), 0), COALESCE(SUM(canonical_id IS NOT NULL), 0)
+                FROM chunk_signatures
+            """).fetchone()
+        return {
+            "canonical_chunks": canonical,
+            "duplicate_chunks": duplicates,
+            "lookups": self.lookups,
+            "duplicates_found": self.duplicates_found,
+            "dedup_rate": round(self.duplicates_found / self.lookups, 4) if self.lookups else 0.0
+        }
+
+# Singleton Instance
+chunk_dedup = ChunkDedupIndex()
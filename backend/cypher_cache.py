@@ -0,0 +1,242 @@
+"""
+Cypher Cache
+Chat users ask the same few dozen questions per machine, and each one used to
+pay an LLM round trip for Cypher generation. Cypher that ran and returned rows
+is stored in SQLite under (normalized question, machine), together with the
+fingerprint of the graph schema it was generated for and the question's
+embedding.
+
+Lookup order:
+1. Exact: same normalized question and machine.
+2. Semantic: the most similar stored question for the same machine, at least
+   CYPHER_CACHE_SIMILARITY, and only if both mention the same identifiers
+   ("J2", "R-2000iB"), since those end up as literals in the Cypher.
+
+A hit generated for another schema fingerprint is re-validated against the
+current structured schema (labels, relationship types and directions). Hits
+that no longer validate are dropped and regenerated.
+
+Hit counts and last_used are buffered in memory and written in one statement on
+the next put or stats call (or every HIT_FLUSH_SIZE distinct entries hit), so a
+hit costs no write.
+"""
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from langchain_neo4j.chains.graph_qa.cypher_utils import CypherQueryCorrector, Schema
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+CYPHER_CACHE_ENABLED = os.getenv("CYPHER_CACHE_ENABLED", "true").lower() == "true"
+CYPHER_CACHE_PATH = os.getenv("CYPHER_CACHE_PATH", "./cypher_cache.db")
+CYPHER_CACHE_SIMILARITY = float(os.getenv("CYPHER_CACHE_SIMILARITY", "0.95"))   # Cosine, for the semantic fallback
+CYPHER_CACHE_MAX_ENTRIES = int(os.getenv("CYPHER_CACHE_MAX_ENTRIES", "5000"))
+HIT_FLUSH_SIZE = 256
+
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-./][a-z0-9]+)*")
+_NODE_LABELS = re.compile(r"\(\s*\w*\s*:([^(){}]*?)\s*[{)]")   # (n:A:B {...}) -> "A:B"
+_REL_TYPES = re.compile(r"\[\s*\w*\s*:([^\]{*]*)")            # [r:A|B*1..2] -> "A|B"
+
+def normalize_question(question: str) -> str:
+    """Lowercased word / identifier tokens: 'Torque spec for J2?' -> 'torque spec for j2'."""
+    return " ".join(_TOKEN.findall(question.lower()))
+
+def identifiers(normalized: str) -> frozenset:
+    """Tokens containing a digit (part numbers, models, axes); they must match for a semantic hit."""
+    return frozenset(t for t in normalized.split() if any(c.isdigit() for c in t))
+
+def schema_fingerprint(schema: str) -> str:
+    return hashlib.sha256(schema.encode("utf-8")).hexdigest()[:16]
+
+def validate_cypher(cypher: str, structured_schema: Dict[str, Any]) -> Optional[str]:
+    """
+    The Cypher (relationship directions corrected) if every label and relationship
+    type it uses exists in the schema, else None. Regex only; no database round trip.
+    """
+    relationships = structured_schema.get("relationships", [])
+    labels = set(structured_schema.get("node_props", {}))
+    labels.update(r["start"] for r in relationships)
+    labels.update(r["end"] for r in relationships)
+    rel_types = set(structured_schema.get("rel_props", {}))
+    rel_types.update(r["type"] for r in relationships)
+
+    for pattern, known in ((_NODE_LABELS, labels), (_REL_TYPES, rel_types)):
+        for group in pattern.findall(cypher):
+            for name in re.split(r"[:|&!]", group):
+                name = name.strip(" `")
+                if name and name not in known:
+                    return None
+
+    corrector = CypherQueryCorrector([Schema(r["start"], r["type"], r["end"]) for r in relationships])
+    return corrector(cypher) or None
+
+class CypherCache:
+    def __init__(self, path: str = CYPHER_CACHE_PATH, similarity: float = CYPHER_CACHE_SIMILARITY,
+                 max_entries: int = CYPHER_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.similarity = similarity
+        self.max_entries = max_entries
+        self.lookups = 0
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.revalidated = 0
+        self.rejected = 0          # Hits that no longer validated against the schema
+        self.generation_seconds = 0.0
+        self.generations = 0
+        self.latency_saved_seconds = 0.0
+        self._hits: Dict[Tuple[str, str], Tuple[int, float]] = {}   # (machine, question) -> (hits, last_used), not yet written
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS cypher_cache (
+                machine TEXT,
+                question TEXT,          -- normalized
+                fingerprint TEXT,       -- schema the Cypher was generated / last validated for
+                cypher TEXT,
+                embedding BLOB,         -- float32 question embedding, unit length
+                hits INTEGER DEFAULT 0,
+                last_used REAL,
+                PRIMARY KEY (machine, question)
+            )
+        """)
+        self._conn.commit()
+
+    @property
+    def avg_generation_seconds(self) -> float:
+        return self.generation_seconds / self.generations if self.generations else 0.0
+
+    def record_generation(self, seconds: float):
+        self.generations += 1
+        self.generation_seconds += seconds
+
+    def lookup_exact(self, question: str, machine: Optional[str], fingerprint: str,
+                     structured_schema: Dict[str, Any]) -> Optional[str]:
+        self.lookups += 1
+        key = (machine or "", normalize_question(question))
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fingerprint, cypher FROM cypher_cache WHERE machine = ? AND question = ?", key
+            ).fetchone()
+        if row is None:
+            return None
+        cypher = self._revalidate(key, row[0], row[1], fingerprint, structured_schema)
+        if cypher is not None:
+            self.exact_hits += 1
+        return cypher
+
+    def lookup_similar(self, question: str, machine: Optional[str], embedding: List[float], fingerprint: str,
+                       structured_schema: Dict[str, Any]) -> Optional[str]:
+        """Semantic fallback after an exact miss (counted by lookup_exact)."""
+        normalized = normalize_question(question)
+        wanted = identifiers(normalized)
+        query = _unit(embedding)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT question, fingerprint, cypher, embedding FROM cypher_cache WHERE machine = ? AND embedding IS NOT NULL",
+                (machine or "",)
+            ).fetchall()
+        best, best_score = None, self.similarity
+        for other, other_fingerprint, cypher, blob in rows:
+            if identifiers(other) != wanted:
+                continue
+            score = float(np.dot(query, np.frombuffer(blob, dtype=np.float32)))
+            if score >= best_score:
+                best, best_score = (other, other_fingerprint, cypher), score
+        if best is None:
+            return None
+        other, other_fingerprint, cypher = best
+        cypher = self._revalidate((machine or "", other), other_fingerprint, cypher, fingerprint, structured_schema)
+        if cypher is not None:
+            self.semantic_hits += 1
+            logger.info(f" > Cypher cache: '{normalized}' matched '{other}' ({best_score:.3f})")
+        return cypher
+
+    def _revalidate(self, key: Tuple[str, str], stored_fingerprint: str, cypher: str, fingerprint: str,
+                    structured_schema: Dict[str, Any]) -> Optional[str]:
+        if stored_fingerprint != fingerprint:
+            cypher = validate_cypher(cypher, structured_schema)
+            with self._lock:
+                if cypher is None:
+                    self.rejected += 1
+                    self._hits.pop(key, None)
+                    self._conn.execute("DELETE FROM cypher_cache WHERE machine = ? AND question = ?", key)
+                else:
+                    self.revalidated += 1
+                    self._conn.execute(
+                        "UPDATE cypher_cache SET fingerprint = ?, cypher = ? WHERE machine = ? AND question = ?",
+                        (fingerprint, cypher, *key)
+                    )
+                self._conn.commit()
+            if cypher is None:
+                return None
+        with self._lock:
+            hits, _ = self._hits.get(key, (0, 0.0))
+            self._hits[key] = (hits + 1, time.time())
+            if len(self._hits) >= HIT_FLUSH_SIZE:
+                self._flush_hits()
+                self._conn.commit()
+        self.latency_saved_seconds += self.avg_generation_seconds
+        return cypher
+
+    def _flush_hits(self):
+        """Writes buffered hit counts; the caller holds the lock and commits."""
+        if self._hits:
+            self._conn.executemany(
+                "UPDATE cypher_cache SET hits = hits + ?, last_used = ? WHERE machine = ? AND question = ?",
+                [(hits, last_used, *key) for key, (hits, last_used) in self._hits.items()]
+            )
+            self._hits.clear()
+
+    def put(self, question: str, machine: Optional[str], cypher: str, fingerprint: str,
+            embedding: Optional[List[float]] = None):
+        blob = _unit(embedding).tobytes() if embedding is not None else None
+        key = (machine or "", normalize_question(question))
+        with self._lock:
+            # Eviction goes by last_used, so pending hits are written first; the new row starts at 0
+            self._hits.pop(key, None)
+            self._flush_hits()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cypher_cache (machine, question, fingerprint, cypher, embedding, hits, last_used) "
+                "VALUES (?, ?, ?, ?, ?, 0, ?)",
+                (*key, fingerprint, cypher, blob, time.time())
+            )
+            count = self._conn.execute("SELECT COUNT(*) FROM cypher_cache").fetchone()[0]
+            if count > self.max_entries:
+                self._conn.execute("""
+                    DELETE FROM cypher_cache WHERE rowid IN (
+                        SELECT rowid FROM cypher_cache ORDER BY last_used ASC LIMIT ?
+                    )
+                """, (count - self.max_entries,))
+            self._conn.commit()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._flush_hits()
+            self._conn.commit()
+            entries = self._conn.execute("SELECT COUNT(*) FROM cypher_cache").fetchone()[0]
+        hits = self.exact_hits + self.semantic_hits
+        return {
+            "entries": entries,
+            "lookups": self.lookups,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "hit_rate": round(hits / self.lookups, 4) if self.lookups else 0.0,
+            "revalidated": self.revalidated,
+            "rejected": self.rejected,
+            "avg_generation_seconds": round(self.avg_generation_seconds, 3),
+            "latency_saved_seconds": round(self.latency_saved_seconds, 2)
+        }
+
+def _unit(vector: List[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(v)
+    return v / norm if norm else v
+
+# Singleton Instance
+cypher_cache = CypherCache()
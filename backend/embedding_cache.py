@@ -0,0 +1,229 @@
+"""
+Embedding Cache
+Content-addressed SQLite store for text embeddings, plus a wrapper that puts it
+in front of the embedding model.
+
+Boilerplate paragraphs repeat across manuals, re-ingests re-embed unchanged
+text and common chat questions repeat, so vectors are keyed by model name and
+a SHA-256 of the text. They are stored as float16 blobs (half the size of
+float32, well within cosine-similarity tolerance), with a small in-memory LRU
+in front of the on-disk store.
+"""
+import os
+import asyncio
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Any, Iterable, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+EMBEDDING_CACHE_PATH = os.getenv("EMBEDDING_CACHE_PATH", "./embedding_cache.db")
+EMBEDDING_CACHE_MAX_BYTES = int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
+# Hot vectors also kept in memory, in front of SQLite
+EMBEDDING_CACHE_MEMORY_BYTES = int(os.getenv("EMBEDDING_CACHE_MEMORY_BYTES", str(32 * 1024 * 1024)))
+
+def text_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def _encode(vector: Iterable[float]) -> bytes:
+    return np.asarray(vector, dtype=np.float16).tobytes()
+
+def _decode(blob: bytes) -> List[float]:
+    return np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+
+class EmbeddingCache:
+    def __init__(self, path: str = EMBEDDING_CACHE_PATH, max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+                 memory_bytes: int = EMBEDDING_CACHE_MEMORY_BYTES):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.memory_bytes = memory_bytes
+        self.hits = 0
+        self.memory_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._last_tick = 0.0
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                model TEXT,
+                text_hash TEXT,
+                vector BLOB,
+                size INTEGER,
+                last_used REAL,
+                PRIMARY KEY (model, text_hash)
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+        self._conn.commit()
+        self._bytes = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM embeddings").fetchone()[0]
+
+    def _tick(self) -> float:
+        """Strictly increasing timestamp so LRU order is exact even within one clock tick."""
+        self._last_tick = max(time.time(), self._last_tick + 1e-6)
+        return self._last_tick
+
+    def _remember(self, key: Tuple[str, str], blob: bytes):
+        if key in self._memory:
+            self._memory.move_to_end(key)
+            return
+        self._memory[key] = blob
+        self._memory_used += len(blob)
+        while self._memory_used > self.memory_bytes and self._memory:
+            _, dropped = self._memory.popitem(last=False)
+            self._memory_used -= len(dropped)
+
+    def get_many(self, model: str, hashes: List[str]) -> Dict[str, List[float]]:
+        """Cached vectors for the given text hashes; missing hashes are left out."""
+        found: Dict[str, bytes] = {}
+        with self._lock:
+            pending = []
+            for h in dict.fromkeys(hashes):
+                blob = self._memory.get((model, h))
+                if blob is not None:
+                    self._memory.move_to_end((model, h))
+                    found[h] = blob
+                    self.memory_hits += 1
+                else:
+                    pending.append(h)
+
+            # SQLite caps bound parameters per statement
+            for start in range(0, len(pending), 500):
+                batch = pending[start:start + 500]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                    (model, *batch)
+                ).fetchall()
+                for h, blob in rows:
+                    found[h] = blob
+                    self._remember((model, h), blob)
+
+            self.hits += len(found)
+            self.misses += len(set(hashes)) - len(found)
+            if found:
+                tick = self._tick()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model = ? AND text_hash = ?",
+                    [(tick, model, h) for h in found]
+                )
+                self._conn.commit()
+        return {h: _decode(blob) for h, blob in found.items()}
+
+    def put_many(self, model: str, vectors: Dict[str, List[float]]) -> Dict[str, List[float]]:
+        """
+        Stores vectors by text hash. Returns them as they will be served from the
+        cache (float16-rounded), so a text always gets the same vector.
+        """
+        blobs = {h: _encode(v) for h, v in vectors.items()}
+        with self._lock:
+            tick = self._tick()
+            for h, blob in blobs.items():
+                previous = self._conn.execute(
+                    "SELECT size FROM embeddings WHERE model = ? AND text_hash = ?", (model, h)
+                ).fetchone()
+                self._bytes += len(blob) - (previous[0] if previous else 0)
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO embeddings (model, text_hash, vector, size, last_used) VALUES (?, ?, ?, ?, ?)",
+                    (model, h, blob, len(blob), tick)
+                )
+                self._remember((model, h), blob)
+            self._evict()
+            self._conn.commit()
+        return {h: _decode(blob) for h, blob in blobs.items()}
+
+    def _evict(self):
+        """Drops least recently used vectors until the store fits in max_bytes."""
+        if self._bytes <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT model, text_hash, size FROM embeddings ORDER BY last_used ASC")
+        doomed = []
+        for model, h, size in rows:
+            if self._bytes <= self.max_bytes:
+                break
+            doomed.append((model, h))
+            self._bytes -= size
+        self._conn.executemany("DELETE FROM embeddings WHERE model = ? AND text_hash = ?", doomed)
+        for key in doomed:
+            blob = self._memory.pop(key, None)
+            if blob is not None:
+                self._memory_used -= len(blob)
+        self.evictions += len(doomed)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "memory_entries": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "max_memory_bytes": self.memory_bytes,
+            "hits": self.hits,
+            "memory_hits": self.memory_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0
+        }
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings that only send unseen text to the wrapped model.
+    Drop-in for SemanticChunker, Neo4jVector, Chroma and retrievers.
+    """
+    def __init__(self, underlying: Embeddings, cache: EmbeddingCache):
+        self.underlying = underlying
+        self.cache = cache
+        self.model_name = getattr(underlying, "model", None) or type(underlying).__name__
+
+    def __getattr__(self, name):
+        # Expose the wrapped model's settings (e.g. .model, .dimensions)
+        if name == "underlying":
+            raise AttributeError(name)
+        return getattr(self.underlying, name)
+
+    def _lookup(self, texts: List[str]):
+        hashes = [text_hash(t) for t in texts]
+        found = self.cache.get_many(self.model_name, hashes)
+        missing = {h: t for h, t in zip(hashes, texts) if h not in found}
+        return hashes, found, missing
+
+    def embed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        hashes, found, missing = self._lookup(texts)
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()), **kwargs)
+            found.update(self.cache.put_many(self.model_name, dict(zip(missing, vectors))))
+        return [found[h] for h in hashes]
+
+    def embed_query(self, text: str) -> List[float]:
+        hashes, found, missing = self._lookup([text])
+        if missing:
+            found.update(self.cache.put_many(self.model_name, {hashes[0]: self.underlying.embed_query(text)}))
+        return found[hashes[0]]
+
+    # Async callers (chat) run on the event loop, so the SQLite reads and writes go to a thread
+    async def aembed_documents(self, texts: List[str], **kwargs) -> List[List[float]]:
+        hashes, found, missing = await asyncio.to_thread(self._lookup, texts)
+        if missing:
+            vectors = await self.underlying.aembed_documents(list(missing.values()), **kwargs)
+            found.update(await asyncio.to_thread(self.cache.put_many, self.model_name, dict(zip(missing, vectors))))
+        return [found[h] for h in hashes]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        hashes, found, missing = await asyncio.to_thread(self._lookup, [text])
+        if missing:
+            vector = await self.underlying.aembed_query(text)
+            found.update(await asyncio.to_thread(self.cache.put_many, self.model_name, {hashes[0]: vector}))
+        return found[hashes[0]]
+
+# Singleton Instance
+embedding_cache = EmbeddingCache()
@@ -0,0 +1,53 @@
+"""
+Executor Pools
+Keeps ingest work off the asyncio event loop so chat / compliance endpoints stay responsive.
+
+- CPU pool (processes): PDF parsing, anything that holds the GIL for long stretches
+- I/O pool (threads):   synchronous LangChain / Neo4j / Chroma calls (graph_workflow.invoke)
+"""
+import os
+import asyncio
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+INGEST_PROCESS_WORKERS = int(os.getenv("INGEST_PROCESS_WORKERS", str(max(1, (os.cpu_count() or 2) - 1))))
+INGEST_THREAD_WORKERS = int(os.getenv("INGEST_THREAD_WORKERS", "4"))
+
+_process_pool = None
+_thread_pool = None
+
+def get_process_pool() -> ProcessPoolExecutor:
+    global _process_pool
+    if _process_pool is None:
+        _process_pool = ProcessPoolExecutor(max_workers=INGEST_PROCESS_WORKERS)
+        logger.info(f" > CPU pool started with {INGEST_PROCESS_WORKERS} processes")
+    return _process_pool
+
+def get_thread_pool() -> ThreadPoolExecutor:
+    global _thread_pool
+    if _thread_pool is None:
+        _thread_pool = ThreadPoolExecutor(max_workers=INGEST_THREAD_WORKERS, thread_name_prefix="ingest-io")
+        logger.info(f" > I/O pool started with {INGEST_THREAD_WORKERS} threads")
+    return _thread_pool
+
+async def run_cpu(fn, *args, **kwargs):
+    """Runs a picklable, module-level function in the process pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_process_pool(), functools.partial(fn, *args, **kwargs))
+
+async def run_io(fn, *args, **kwargs):
+    """Runs a blocking call in the ingest thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_thread_pool(), functools.partial(fn, *args, **kwargs))
+
+def shutdown_pools():
+    global _process_pool, _thread_pool
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+    if _thread_pool is not None:
+        _thread_pool.shutdown(wait=False, cancel_futures=True)
+        _thread_pool = None
@@ -0,0 +1,53 @@
+"""
+Graph Schema Bootstrap
+Indexes and uniqueness constraints for every property the app MATCHes or
+MERGEs on, created once at startup (all statements are IF NOT EXISTS).
+
+Without them each MATCH/MERGE on e.g. DocumentChunk.doc_id scans the whole
+label, so ingest and link time grow with the corpus.
+"""
+from typing import List, Tuple
+import logging
+logger = logging.getLogger("uvicorn")
+
+# (name, label, property) -- unique per label
+UNIQUE_CONSTRAINTS: List[Tuple[str, str, str]] = [
+    ("machinery_name", "Machinery", "name"),
+    ("work_order_id", "WorkOrder", "id"),
+    ("technician_id", "Technician", "id"),
+    ("incident_id", "Incident", "id"),
+    ("task_title", "Task", "title"),
+    ("document_chunk_id", "DocumentChunk", "id"),
+    ("duplicate_chunk_id", "DuplicateChunk", "id"),
+]
+
+# (name, label, property) -- lookup only
+INDEXES: List[Tuple[str, str, str]] = [
+    ("document_chunk_doc_id", "DocumentChunk", "doc_id"),
+    ("document_id", "Document", "id"),
+    ("entity_id", "__Entity__", "id"),
+]
+
+_bootstrapped = False
+
+def bootstrap_schema(graph):
+    """
+    Creates the constraints and indexes. If existing data violates a constraint
+    (duplicate values), falls back to a plain index so lookups are still fast.
+    """
+    global _bootstrapped
+    if _bootstrapped:
+        return
+    for name, label, prop in UNIQUE_CONSTRAINTS:
+        try:
+            graph.query(f"CREATE CONSTRAINT {name} IF NOT EXISTS FOR (n:`{label}`) REQUIRE n.`{prop}` IS UNIQUE")
+        except Exception as e:
+            logger.info(f"Constraint {name} not created ({e}); using an index instead")
+            try:
+                graph.query(f"CREATE INDEX {name}_index IF NOT EXISTS FOR (n:`{label}`) ON (n.`{prop}`)")
+            except Exception as e:
+                logger.info(f"Index {name}_index not created: {e}")
+    for name, label, prop in INDEXES:
+        graph.query(f"CREATE INDEX {name} IF NOT EXISTS FOR (n:`{label}`) ON (n.`{prop}`)")
+    _bootstrapped = True
+    logger.info(f"Graph schema ready: {len(UNIQUE_CONSTRAINTS)} constraints, {len(INDEXES)} indexes.")
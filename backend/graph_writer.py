@@ -0,0 +1,171 @@
+"""
+Bulk Graph Writer
+Writes LLMGraphTransformer output for a whole ingest window in a handful of
+UNWIND statements instead of Neo4jGraph.add_graph_documents' per-chunk writes.
+
+- Entities repeated across chunks are merged in memory first, so each one is
+  written once per batch rather than once per mentioning chunk.
+- Every extracted entity also gets the __Entity__ label (indexed on id, and
+  hidden from the Cypher QA schema), so merges and matches use an index lookup.
+- Provenance (doc_id, filename, machinery, manual_type, pages) lives only on the
+  source chunk's Document node; each entity gets one MENTIONS edge to it instead
+  of a copy of the metadata on every node.
+- Document nodes hold no chunk text: DocumentChunk and Chroma already store the
+  manual's text, so a third copy would only grow the graph.
+"""
+import os
+import time
+from typing import Any, Dict, List, Set, Tuple
+from langchain_neo4j.graphs.graph_document import GraphDocument
+from graph_schema import bootstrap_schema
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+GRAPH_WRITE_BATCH_SIZE = int(os.getenv("GRAPH_WRITE_BATCH_SIZE", "1000"))
+
+ENTITY_LABEL = "__Entity__"
+# Nodes owned by the app (dashboard, work orders), never treated as extracted entities
+CORE_LABELS = ["Machinery", "Technician", "Task", "WorkOrder", "Incident"]
+
+_CHUNK_QUERY = """
+UNWIND $rows AS row
+MERGE (d:Document {id: row.id})
+SET d += row.metadata
+"""
+
+_NODE_QUERY = f"""
+UNWIND $rows AS row
+CALL apoc.merge.node(['{ENTITY_LABEL}', row.type], {{id: row.id}}, row.properties, row.properties) YIELD node
+RETURN count(node) AS written
+"""
+
+_MENTION_QUERY = f"""
+UNWIND $rows AS row
+MATCH (d:Document {{id: row.chunk}})
+MATCH (e:{ENTITY_LABEL} {{id: row.id}}) WHERE row.type IN labels(e)
+MERGE (d)-[:MENTIONS]->(e)
+"""
+
+_RELATIONSHIP_QUERY = f"""
+UNWIND $rows AS row
+MATCH (s:{ENTITY_LABEL} {{id: row.source}}) WHERE row.source_label IN labels(s)
+MATCH (t:{ENTITY_LABEL} {{id: row.target}}) WHERE row.target_label IN labels(t)
+CALL apoc.merge.relationship(s, row.type, {{}}, row.properties, t, row.properties) YIELD rel
+RETURN count(rel) AS written
+"""
+
+_schema_ready = False
+
+def ensure_schema(graph):
+    """Indexes for entity merges; also adopts entities written before this writer existed."""
+    global _schema_ready
+    if _schema_ready:
+        return
+    bootstrap_schema(graph)
+    # Earlier ingests (add_graph_documents without include_source) copied the chunk metadata
+    # onto every extracted entity and kept no source Document. Such entities get the entity
+    # label and a MENTIONS edge from one Document per manual holding that metadata, so the
+    # machine / source filters and retirement treat them like entities written here.
+    graph.query(f"""
+    MATCH (e)
+    WHERE e.doc_id IS NOT NULL AND e.id IS NOT NULL AND NOT e:{ENTITY_LABEL}
+      AND NONE(label IN labels(e) WHERE label IN $skip_labels)
+    MERGE (d:Document {{id: 'legacy:' + e.doc_id}})
+    ON CREATE SET d.doc_id = e.doc_id, d.filename = e.filename, d.machinery = e.machinery,
+                  d.manual_type = e.manual_type, d.source = e.source
+    MERGE (d)-[:MENTIONS]->(e)
+    SET e:{ENTITY_LABEL}
+    REMOVE e.doc_id, e.filename, e.machinery, e.manual_type, e.source, e.page_start, e.page_end
+    """, {"skip_labels": CORE_LABELS + ["Document", "DocumentChunk", "DuplicateChunk"]})
+    # Earlier versions of this writer also copied the chunk text onto each Document
+    graph.query("MATCH (d:Document) WHERE d.text IS NOT NULL REMOVE d.text")
+    _schema_ready = True
+
+def _clean(text: str) -> str:
+    return text.replace("`", "")
+
+def _rel_type(rel) -> str:
+    return _clean(rel.type.replace(" ", "_").upper())
+
+def schema_elements(graph_documents: List[GraphDocument]) -> Tuple[Set[str], Set[str]]:
+    """Node labels and relationship types that writing these documents can add to the graph."""
+    if not graph_documents:
+        return set(), set()
+    labels, rel_types = {"Document"}, {"MENTIONS"}
+    for graph_doc in graph_documents:
+        labels.update(_clean(node.type) for node in graph_doc.nodes)
+        for rel in graph_doc.relationships:
+            labels.update((_clean(rel.source.type), _clean(rel.target.type)))
+            rel_types.add(_rel_type(rel))
+    return labels, rel_types
+
+def merge_graph_documents(graph_documents: List[GraphDocument]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Collapses the graph documents of many chunks into UNWIND rows:
+    one row per distinct chunk, entity, (chunk, entity) mention and relationship.
+    """
+    chunks: Dict[str, Dict[str, Any]] = {}
+    nodes: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    mentions: Dict[Tuple[str, str, str], Dict[str, Any]] = {}
+    relationships: Dict[Tuple[str, str, str, str, str], Dict[str, Any]] = {}
+
+    def add_node(node_type, node_id, properties=None):
+        key = (_clean(node_type), str(node_id))
+        merged = nodes.setdefault(key, {})
+        merged.update(properties or {})
+        return key
+
+    for graph_doc in graph_documents:
+        source = graph_doc.source
+        metadata = dict(source.metadata)
+        chunk = metadata.pop("id")
+        chunks[chunk] = {"id": chunk, "metadata": metadata}
+
+        for node in graph_doc.nodes:
+            node_type, node_id = add_node(node.type, node.id, node.properties)
+            mentions[(chunk, node_type, node_id)] = {"chunk": chunk, "type": node_type, "id": node_id}
+
+        for rel in graph_doc.relationships:
+            # The LLM sometimes relates nodes it didn't list; create them like add_graph_documents does
+            source_key = add_node(rel.source.type, rel.source.id)
+            target_key = add_node(rel.target.type, rel.target.id)
+            rel_type = _rel_type(rel)
+            merged = relationships.setdefault((*source_key, rel_type, *target_key), {})
+            merged.update(rel.properties or {})
+
+    return {
+        "chunks": list(chunks.values()),
+        "nodes": [{"type": t, "id": i, "properties": props} for (t, i), props in nodes.items()],
+        "mentions": list(mentions.values()),
+        "relationships": [
+            {"source_label": st, "source": si, "type": rt, "target_label": tt, "target": ti, "properties": props}
+            for (st, si, rt, tt, ti), props in relationships.items()
+        ],
+    }
+
+def write_graph_documents(graph, graph_documents: List[GraphDocument], batch_size: int = GRAPH_WRITE_BATCH_SIZE) -> Dict[str, Any]:
+    """
+    Writes graph documents (each with a source chunk whose metadata has an 'id')
+    and returns row/statement counts and throughput for the ingest metrics.
+    """
+    ensure_schema(graph)
+    rows = merge_graph_documents(graph_documents)
+    started = time.perf_counter()
+    statements = 0
+    # Order matters: mentions and relationships MATCH what the earlier steps created
+    for query, key in ((_CHUNK_QUERY, "chunks"), (_NODE_QUERY, "nodes"), (_MENTION_QUERY, "mentions"), (_RELATIONSHIP_QUERY, "relationships")):
+        for start in range(0, len(rows[key]), batch_size):
+            graph.query(query, {"rows": rows[key][start:start + batch_size]})
+            statements += 1
+    elapsed = time.perf_counter() - started
+
+    stats = {key: len(value) for key, value in rows.items()}
+    stats["statements"] = statements
+    stats["seconds"] = round(elapsed, 3)
+    stats["rows_per_second"] = round(sum(len(value) for value in rows.values()) / elapsed, 1) if elapsed else 0.0
+    logger.info(
+        f"   > Graph write: {stats['chunks']} chunks, {stats['nodes']} entities, {stats['relationships']} relationships "
+        f"in {statements} statements ({stats['seconds']}s, {stats['rows_per_second']} rows/s)"
+    )
+    return stats
@@ -0,0 +1,179 @@
+"""
+Image Description Cache
+Content-addressed SQLite store for GPT-4o diagram descriptions.
+
+Manuals reuse the same exploded diagrams, pictograms and wiring charts across
+model variants and revisions, so descriptions are keyed by a SHA-256 of the
+extracted image bytes. Re-ingesting a revised manual only sends unseen images
+to the vision model.
+
+Reads don't write: LRU touches are buffered in memory and flushed with the
+next put, eviction or stats call (or every TOUCH_FLUSH_SIZE touches).
+"""
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import Optional, Dict, Any, Tuple
+from image_dedup import PhashIndex
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+IMAGE_CACHE_PATH = os.getenv("IMAGE_CACHE_PATH", "./vision_cache.db")
+IMAGE_CACHE_MAX_BYTES = int(os.getenv("IMAGE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Also reuse descriptions of near-duplicate images seen in OTHER manuals
+IMAGE_DEDUP_CORPUS = os.getenv("IMAGE_DEDUP_CORPUS", "false").lower() == "true"
+TOUCH_FLUSH_SIZE = 256
+
+def image_hash(image_bytes: bytes) -> str:
+    return hashlib.sha256(image_bytes).hexdigest()
+
+class ImageDescriptionCache:
+    def __init__(self, path: str = IMAGE_CACHE_PATH, max_bytes: int = IMAGE_CACHE_MAX_BYTES, corpus_dedup: bool = IMAGE_DEDUP_CORPUS):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.corpus_dedup = corpus_dedup
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._last_tick = 0.0
+        self._touched: Dict[Tuple[str, str], float] = {}   # (image_hash, model) -> last_used, not yet written
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        columns = {row[1]: row[5] for row in self._conn.execute("PRAGMA table_info(image_descriptions)")}
+        if columns and "phash" not in columns:
+            self._conn.execute("ALTER TABLE image_descriptions ADD COLUMN phash TEXT")
+        if columns and not columns.get("model"):
+            # Older stores were keyed by image_hash alone, so a second model overwrote the first
+            self._conn.execute("ALTER TABLE image_descriptions RENAME TO image_descriptions_old")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS image_descriptions (
+                image_hash TEXT,
+                model TEXT,
+                description TEXT,
+                size INTEGER,
+                last_used REAL,
+                phash TEXT,
+                PRIMARY KEY (image_hash, model)
+            )
+        """)
+        if columns and not columns.get("model"):
+            self._conn.execute("INSERT INTO image_descriptions SELECT image_hash, model, description, size, last_used, phash FROM image_descriptions_old")
+            self._conn.execute("DROP TABLE image_descriptions_old")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_image_descriptions_last_used ON image_descriptions (last_used)")
+        self._conn.commit()
+        self._phash_index = None
+
+    def _tick(self) -> float:
+        """Strictly increasing timestamp so LRU order is exact even within one clock tick."""
+        self._last_tick = max(time.time(), self._last_tick + 1e-6)
+        return self._last_tick
+
+    def get(self, key: str, model: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT description FROM image_descriptions WHERE image_hash = ? AND model = ?",
+                (key, model)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._touch(key, model)
+            return row[0]
+
+    def get_similar(self, phash: int, model: str) -> Optional[str]:
+        """Description of a near-duplicate image from anywhere in the corpus (corpus_dedup only)."""
+        if not self.corpus_dedup or phash is None:
+            return None
+        with self._lock:
+            key = self._corpus_index().find(phash)
+        if key is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT description FROM image_descriptions WHERE image_hash = ? AND model = ?",
+                (key, model)
+            ).fetchone()
+            if row is None:
+                # Evicted since it was indexed
+                return None
+            self.near_hits += 1
+            # The exact lookup before this one already counted a miss
+            self.misses -= 1
+            self._touch(key, model)
+            return row[0]
+
+    def _touch(self, key: str, model: str):
+        self._touched[(key, model)] = self._tick()
+        if len(self._touched) >= TOUCH_FLUSH_SIZE:
+            self._flush_touches()
+            self._conn.commit()
+
+    def _flush_touches(self):
+        """Writes buffered LRU touches; the caller holds the lock and commits."""
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE image_descriptions SET last_used = ? WHERE image_hash = ? AND model = ?",
+                [(tick, key, model) for (key, model), tick in self._touched.items()]
+            )
+            self._touched.clear()
+
+    def _corpus_index(self) -> PhashIndex:
+        if self._phash_index is None:
+            self._phash_index = PhashIndex()
+            for key, phash in self._conn.execute("SELECT image_hash, phash FROM image_descriptions WHERE phash IS NOT NULL"):
+                self._phash_index.add(int(phash, 16), key)
+        return self._phash_index
+
+    def put(self, key: str, model: str, description: str, phash: Optional[int] = None):
+        size = len(description.encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO image_descriptions (image_hash, model, description, size, last_used, phash) VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model, description, size, self._tick(), format(phash, "016x") if phash is not None else None)
+            )
+            self._touched.pop((key, model), None)
+            if self.corpus_dedup and phash is not None:
+                self._corpus_index().add(phash, key)
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        """Drops least recently used descriptions until the store fits in max_bytes."""
+        self._flush_touches()
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM image_descriptions").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        rows = self._conn.execute("SELECT image_hash, model, size FROM image_descriptions ORDER BY last_used ASC").fetchall()
+        for key, model, size in rows:
+            if total <= self.max_bytes:
+                break
+            self._conn.execute("DELETE FROM image_descriptions WHERE image_hash = ? AND model = ?", (key, model))
+            total -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._flush_touches()
+            self._conn.commit()
+            entries, total = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM image_descriptions"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "entries": entries,
+            "bytes": total,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0
+        }
+
+# Singleton Instance
+image_cache = ImageDescriptionCache()
@@ -0,0 +1,88 @@
+"""
+Near-Duplicate Image Detection
+Perceptual (difference) hashes for extracted images, plus a banded index that
+finds images within a small Hamming distance of each other.
+
+The same diagram at a different resolution, or with one callout number changed,
+hashes to (nearly) the same 64-bit value, so only one copy needs a vision call.
+"""
+import os
+from typing import Optional, Dict, List, Any, Tuple
+import fitz  # PyMuPDF
+
+# --- CONFIGURATION ---
+# Max differing bits (out of 64) for two images to count as the same diagram
+IMAGE_PHASH_DISTANCE = int(os.getenv("IMAGE_PHASH_DISTANCE", "6"))
+
+HASH_BITS = 64
+_BANDS = 8
+_BAND_BITS = HASH_BITS // _BANDS
+
+def perceptual_hash(image_bytes: bytes) -> Optional[int]:
+    """
+    64-bit dHash: shrink to 9x8 grayscale and record whether each pixel is
+    brighter than its right-hand neighbour. Returns None if the image can't be decoded.
+    """
+    try:
+        pix = fitz.Pixmap(image_bytes)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        if pix.colorspace is None or pix.colorspace.n != 1:
+            pix = fitz.Pixmap(fitz.csGRAY, pix)
+        small = fitz.Pixmap(pix, 9, 8, None)
+    except Exception:
+        return None
+
+    samples = small.samples
+    stride = small.stride
+    value = 0
+    for row in range(8):
+        offset = row * stride
+        for col in range(8):
+            value = (value << 1) | (1 if samples[offset + col] > samples[offset + col + 1] else 0)
+    return value
+
+def hamming_distance(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+class PhashIndex:
+    """
+    Maps perceptual hashes to a payload (e.g. a description or a pending task).
+
+    The 64 bits are split into 8 bands. Two hashes within IMAGE_PHASH_DISTANCE (< 8)
+    bits must agree exactly on at least one band, so only images sharing a band are compared.
+    """
+    def __init__(self, max_distance: int = IMAGE_PHASH_DISTANCE):
+        self.max_distance = max_distance
+        self._entries: List[Tuple[int, Any]] = []
+        self._bands: List[Dict[int, List[int]]] = [{} for _ in range(_BANDS)]
+
+    def __len__(self):
+        return len(self._entries)
+
+    @staticmethod
+    def _band_keys(phash: int):
+        mask = (1 << _BAND_BITS) - 1
+        for band in range(_BANDS):
+            yield band, (phash >> (band * _BAND_BITS)) & mask
+
+    def add(self, phash: int, payload: Any):
+        entry_index = len(self._entries)
+        self._entries.append((phash, payload))
+        for band, key in self._band_keys(phash):
+            self._bands[band].setdefault(key, []).append(entry_index)
+
+    def find(self, phash: int) -> Optional[Any]:
+        """Payload of the closest indexed hash within max_distance, or None."""
+        best, best_distance = None, self.max_distance + 1
+        seen = set()
+        for band, key in self._band_keys(phash):
+            for entry_index in self._bands[band].get(key, ()):
+                if entry_index in seen:
+                    continue
+                seen.add(entry_index)
+                other, payload = self._entries[entry_index]
+                distance = hamming_distance(phash, other)
+                if distance < best_distance:
+                    best, best_distance = payload, distance
+        return best
@@ -0,0 +1,133 @@
+"""
+Image Triage
+Cheap local scoring of extracted images before they reach the vision model.
+Each image starts at 1.0 and loses points for signs of low information value:
+
+    blank            near-uniform pixels (empty boxes, solid fills)
+    text_layer_scan  a full-page scan on a page that already has a text layer
+    margin_banner    a thin strip in the header / footer band
+    repeated         the same picture on TRIAGE_REPEAT_PAGES or more pages (logos, banners)
+    cover_photo      a photo-like image on the cover page
+
+Images scoring below TRIAGE_MIN_SCORE are skipped. Every skip is logged with its
+score and reasons so the thresholds can be tuned from the ingest logs.
+"""
+import os
+import math
+from typing import Any, Dict, List, Optional, Tuple
+import fitz  # PyMuPDF
+from image_dedup import PhashIndex
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+TRIAGE_ENABLED = os.getenv("TRIAGE_ENABLED", "true").lower() == "true"
+TRIAGE_MIN_SCORE = float(os.getenv("TRIAGE_MIN_SCORE", "0.5"))
+TRIAGE_MIN_STDDEV = float(os.getenv("TRIAGE_MIN_STDDEV", "6"))               # Gray levels (0-255)
+TRIAGE_SCAN_COVERAGE = float(os.getenv("TRIAGE_SCAN_COVERAGE", "0.8"))       # Page area covered by a scan
+TRIAGE_TEXT_LAYER_CHARS = int(os.getenv("TRIAGE_TEXT_LAYER_CHARS", "200"))   # Extracted chars that count as a text layer
+TRIAGE_MARGIN = float(os.getenv("TRIAGE_MARGIN", "0.12"))                    # Header / footer band, as a page fraction
+TRIAGE_REPEAT_PAGES = int(os.getenv("TRIAGE_REPEAT_PAGES", "3"))
+TRIAGE_PHOTO_ENTROPY = float(os.getenv("TRIAGE_PHOTO_ENTROPY", "6.5"))      # Bits; line art is far lower
+
+PENALTIES = {
+    "blank": 1.0,
+    "text_layer_scan": 0.6,
+    "margin_banner": 0.4,
+    "repeated": 0.4,
+    "cover_photo": 0.6,
+}
+
+def pixel_stats(image_bytes: bytes) -> Optional[Dict[str, float]]:
+    """Gray-level standard deviation and histogram entropy of a 64x64 thumbnail."""
+    try:
+        pix = fitz.Pixmap(image_bytes)
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        if pix.colorspace is None or pix.colorspace.n != 1:
+            pix = fitz.Pixmap(fitz.csGRAY, pix)
+        small = fitz.Pixmap(pix, 64, 64, None)
+    except Exception:
+        return None
+
+    samples = small.samples
+    stride, width = small.stride, small.width
+    values = [samples[row * stride + col] for row in range(small.height) for col in range(width)]
+    mean = sum(values) / len(values)
+    stddev = math.sqrt(sum((v - mean) ** 2 for v in values) / len(values))
+    histogram = [0] * 256
+    for v in values:
+        histogram[v] += 1
+    entropy = -sum((c / len(values)) * math.log2(c / len(values)) for c in histogram if c)
+    return {"stddev": round(stddev, 2), "entropy": round(entropy, 2)}
+
+def score_image(image: Dict[str, Any], page_number: int, text_chars: int, repeat_pages: int) -> Tuple[float, List[str]]:
+    """Score in [0, 1] (clamped) and the penalties that applied."""
+    reasons = []
+    stats = image.get("pixels")
+    if stats is not None and stats["stddev"] < TRIAGE_MIN_STDDEV:
+        reasons.append("blank")
+
+    bbox = image.get("bbox")
+    if bbox is not None:
+        x0, y0, x1, y1 = bbox
+        coverage = max(0.0, x1 - x0) * max(0.0, y1 - y0)
+        if coverage >= TRIAGE_SCAN_COVERAGE and text_chars >= TRIAGE_TEXT_LAYER_CHARS:
+            reasons.append("text_layer_scan")
+        if y1 <= TRIAGE_MARGIN or y0 >= 1 - TRIAGE_MARGIN:
+            reasons.append("margin_banner")
+
+    if repeat_pages >= TRIAGE_REPEAT_PAGES:
+        reasons.append("repeated")
+    if page_number == 1 and stats is not None and stats["entropy"] >= TRIAGE_PHOTO_ENTROPY:
+        reasons.append("cover_photo")
+
+    score = max(0.0, 1.0 - sum(PENALTIES[r] for r in reasons))
+    return score, reasons
+
+class ImageTriage:
+    """
+    Per-document triage. Pages must be passed in page order, so repeat counts
+    only use the pages seen so far.
+    """
+    def __init__(self, filename: str = "", min_score: float = TRIAGE_MIN_SCORE, enabled: bool = TRIAGE_ENABLED):
+        self.filename = filename
+        self.min_score = min_score
+        self.enabled = enabled
+        self.kept = 0
+        self.skipped = 0
+        self.reasons: Dict[str, int] = {}
+        self._seen = PhashIndex()   # phash -> set of page numbers it appeared on
+
+    def _repeat_pages(self, phash: Optional[int], page_number: int) -> int:
+        if phash is None:
+            return 1
+        pages = self._seen.find(phash)
+        if pages is None:
+            pages = set()
+            self._seen.add(phash, pages)
+        pages.add(page_number)
+        return len(pages)
+
+    def filter_page(self, page: Dict[str, Any]) -> List[Dict[str, Any]]:
+        """The page's images worth describing; logs every skipped one."""
+        if not self.enabled:
+            return page["images"]
+        text_chars = len(page["text"].strip())
+        keep = []
+        for image in page["images"]:
+            repeats = self._repeat_pages(image.get("phash"), page["page_number"])
+            score, reasons = score_image(image, page["page_number"], text_chars, repeats)
+            if score >= self.min_score:
+                keep.append(image)
+                self.kept += 1
+                continue
+            self.skipped += 1
+            for reason in reasons:
+                self.reasons[reason] = self.reasons.get(reason, 0) + 1
+            logger.info(
+                f"   > Triage skipped image (file {self.filename}, page {page['page_number']}, xref {image.get('xref')}): "
+                f"score {score:.2f} [{', '.join(reasons)}] pixels={image.get('pixels')} bbox={image.get('bbox')} "
+                f"text_chars={text_chars} repeat_pages={repeats}"
+            )
+        return keep
@@ -0,0 +1,165 @@
+"""
+Ingest Admission Control
+Every ingest (single upload or a manual from a bulk batch) needs one of
+INGEST_ADMISSION_SLOTS slots before its pipeline starts, so parallel uploads
+can't starve chat or blow through provider rate limits.
+
+Waiting ingests are queued per tenant and admitted round-robin across tenants,
+FIFO within a tenant. A tenant can hold at most INGEST_TENANT_SLOTS slots and
+INGEST_TENANT_QUEUE_SIZE waiting uploads.
+
+    ticket = ingest_admission.enqueue(tenant)   # raises AdmissionRejected when full
+    waited = await ingest_admission.wait(ticket)
+    try: ...
+    finally: ingest_admission.release(ticket)   # or cancel(ticket) to give up a queued one
+"""
+import os
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Optional
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+INGEST_ADMISSION_SLOTS = int(os.getenv("INGEST_ADMISSION_SLOTS", "2"))                    # Manuals ingested at the same time
+INGEST_TENANT_SLOTS = int(os.getenv("INGEST_TENANT_SLOTS", str(INGEST_ADMISSION_SLOTS)))  # ...of which one tenant may hold
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "20"))                              # Uploads allowed to wait before we refuse more
+INGEST_TENANT_QUEUE_SIZE = int(os.getenv("INGEST_TENANT_QUEUE_SIZE", str(INGEST_QUEUE_SIZE)))
+DEFAULT_TENANT = "default"
+_WAIT_SAMPLES = 500   # Recent admission waits kept for percentiles
+
+class AdmissionRejected(Exception):
+    pass
+
+class AdmissionTicket:
+    def __init__(self, tenant: str, future: asyncio.Future):
+        self.tenant = tenant
+        self.future = future
+        self.enqueued_at = time.monotonic()
+        self.admitted_at: Optional[float] = None
+        self.released = False
+
+    @property
+    def wait_seconds(self) -> float:
+        end = self.admitted_at if self.admitted_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+class AdmissionController:
+    def __init__(self, slots: int = INGEST_ADMISSION_SLOTS, tenant_slots: int = INGEST_TENANT_SLOTS,
+                 max_waiting: int = INGEST_QUEUE_SIZE, tenant_max_waiting: int = INGEST_TENANT_QUEUE_SIZE):
+        self.slots = slots
+        self.tenant_slots = tenant_slots
+        self.max_waiting = max_waiting
+        self.tenant_max_waiting = tenant_max_waiting
+        self.active = 0
+        self.active_by_tenant: Dict[str, int] = {}
+        self.admitted = 0
+        self.rejected = 0
+        # Tenants in round-robin order; a tenant moves to the back when it is served
+        self._queues: "OrderedDict[str, Deque[AdmissionTicket]]" = OrderedDict()
+        self._waits: Deque[float] = deque(maxlen=_WAIT_SAMPLES)
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    def enqueue(self, tenant: str = DEFAULT_TENANT, enforce_limits: bool = True) -> AdmissionTicket:
+        """
+        Queues an ingest for admission. Uploads are refused here (enforce_limits)
+        when the global or tenant queue is full; bulk batches bound their own
+        backlog and skip the check.
+        """
+        tenant = tenant or DEFAULT_TENANT
+        if enforce_limits:
+            if self.waiting >= self.max_waiting:
+                self.rejected += 1
+                raise AdmissionRejected(f"Ingest queue is full ({self.max_waiting} uploads waiting)")
+            if len(self._queues.get(tenant, ())) >= self.tenant_max_waiting:
+                self.rejected += 1
+                raise AdmissionRejected(f"Tenant {tenant} already has {self.tenant_max_waiting} uploads waiting")
+        ticket = AdmissionTicket(tenant, asyncio.get_running_loop().create_future())
+        self._queues.setdefault(tenant, deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    async def wait(self, ticket: AdmissionTicket) -> float:
+        """Waits for the ticket's slot; returns the seconds spent queued."""
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            # Cancelled while queued, or right after being admitted
+            self.cancel(ticket)
+            raise
+        return ticket.wait_seconds
+
+    def release(self, ticket: AdmissionTicket):
+        if ticket.released or ticket.admitted_at is None:
+            return
+        ticket.released = True
+        self.active -= 1
+        self.active_by_tenant[ticket.tenant] -= 1
+        if not self.active_by_tenant[ticket.tenant]:
+            del self.active_by_tenant[ticket.tenant]
+        self._dispatch()
+
+    def cancel(self, ticket: AdmissionTicket):
+        """Gives up a ticket whether it is still queued or already admitted."""
+        if ticket.admitted_at is not None:
+            self.release(ticket)
+        else:
+            self._remove(ticket)
+
+    def _remove(self, ticket: AdmissionTicket):
+        queue = self._queues.get(ticket.tenant)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[ticket.tenant]
+        ticket.future.cancel()
+
+    def _dispatch(self):
+        """Fills free slots, one ticket per tenant in turn."""
+        while self.active < self.slots:
+            tenant = next(
+                (t for t, q in self._queues.items() if q and self.active_by_tenant.get(t, 0) < self.tenant_slots),
+                None
+            )
+            if tenant is None:
+                return
+            queue = self._queues[tenant]
+            ticket = queue.popleft()
+            if queue:
+                self._queues.move_to_end(tenant)
+            else:
+                del self._queues[tenant]
+            if ticket.future.done():
+                continue
+            ticket.admitted_at = time.monotonic()
+            self.active += 1
+            self.active_by_tenant[tenant] = self.active_by_tenant.get(tenant, 0) + 1
+            self.admitted += 1
+            self._waits.append(ticket.wait_seconds)
+            ticket.future.set_result(None)
+
+    def stats(self) -> Dict[str, Any]:
+        waits = sorted(self._waits)
+
+        def percentile(p: float) -> float:
+            return round(waits[min(len(waits) - 1, int(p * len(waits)))], 3) if waits else 0.0
+
+        return {
+            "slots": self.slots,
+            "active": self.active,
+            "active_by_tenant": dict(self.active_by_tenant),
+            "queue_depth": self.waiting,
+            "queue_depth_by_tenant": {t: len(q) for t, q in self._queues.items()},
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "wait_seconds_p50": percentile(0.5),
+            "wait_seconds_p95": percentile(0.95),
+            "wait_seconds_max": round(waits[-1], 3) if waits else 0.0
+        }
+
+# Singleton Instance
+ingest_admission = AdmissionController()
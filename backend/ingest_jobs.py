@@ -0,0 +1,333 @@
+"""
+Ingest Job Queue
+/api/ingest persists the upload, returns a job ID right away and runs the
+streaming pipeline (and through it, graph_workflow) in the background once
+ingest_admission grants the job a slot.
+
+/api/ingest/bulk submits a batch of manuals that run INGEST_BULK_CONCURRENCY at a
+time; their page windows share embedding requests, the extraction concurrency
+budget and graph write transactions (see agent.embedding_batcher).
+"""
+import os
+import json
+import uuid
+import asyncio
+import zipfile
+import datetime
+from typing import Dict, Any, Optional, List, Tuple
+import logging
+logger = logging.getLogger("uvicorn")
+
+from ingest_pipeline import stream_ingest, new_ingest_stats
+from ingest_admission import ingest_admission, AdmissionRejected, AdmissionTicket, DEFAULT_TENANT
+
+# --- 1. CONFIGURATION ---
+# Concurrency and queue limits live in ingest_admission
+INGEST_UPLOAD_DIR = os.getenv("INGEST_UPLOAD_DIR", "./ingest_uploads")
+INGEST_JOB_HISTORY = int(os.getenv("INGEST_JOB_HISTORY", "200"))   # Finished jobs kept for status lookups
+INGEST_BULK_CONCURRENCY = int(os.getenv("INGEST_BULK_CONCURRENCY", "4"))  # Manuals of one bulk batch queued for admission at the same time
+INGEST_BULK_MAX_FILES = int(os.getenv("INGEST_BULK_MAX_FILES", "500"))
+INGEST_UPLOAD_CHUNK_BYTES = int(os.getenv("INGEST_UPLOAD_CHUNK_BYTES", str(1024 * 1024)))  # Upload bytes held in memory at once
+
+class IngestQueueFull(Exception):
+    pass
+
+# --- 2. JOB ---
+class IngestJob:
+    def __init__(self, pdf_path: str, filename: str, machinery: str, manual_type: str, tenant: str = DEFAULT_TENANT):
+        self.id = f"ING-{str(uuid.uuid4())[:8]}"
+        self.pdf_path = pdf_path
+        self.filename = filename
+        self.machinery = machinery
+        self.manual_type = manual_type
+        self.tenant = tenant or DEFAULT_TENANT
+        self.status = "queued"   # queued -> running -> completed / failed / cancelled
+        self.error = None
+        self.progress = new_ingest_stats()
+        self.created_at = datetime.datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.queue_wait_seconds: Optional[float] = None
+        self.ticket: Optional[AdmissionTicket] = None
+        self.task: Optional[asyncio.Task] = None
+        self.cancel_requested = False   # Set by IngestJobManager.cancel, to tell it apart from shutdown
+
+    @property
+    def is_finished(self) -> bool:
+        return self.status in ("completed", "failed", "cancelled")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "machinery": self.machinery,
+            "manual_type": self.manual_type,
+            "tenant": self.tenant,
+            "status": self.status,
+            "error": self.error,
+            "progress": {
+                "pages_total": self.progress["pages_total"],
+                "pages_parsed": self.progress["pages_parsed"],
+                "pages_unchanged": self.progress["pages_unchanged"],
+                "images_described": self.progress["images_described"],
+                "images_deduplicated": self.progress["images_deduplicated"],
+                "images_skipped": self.progress["images_skipped"],
+                "chunks_extracted": self.progress["chunks_extracted"],
+                "vectors_written": self.progress["vectors_written"],
+                "chunks_deduplicated": self.progress["chunks_deduplicated"],
+                "chunks_retired": self.progress["chunks_retired"],
+            },
+            "workflow_path": "Refactored" if self.progress["refactored"] else "Standard Ingest",
+            "queue_wait_seconds": round(self.queue_wait_seconds, 3) if self.queue_wait_seconds is not None else None,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+class IngestBatch:
+    def __init__(self, jobs: List[IngestJob]):
+        self.id = f"BATCH-{str(uuid.uuid4())[:8]}"
+        self.jobs = jobs
+        self.created_at = datetime.datetime.now()
+        self.started_at = None
+        self.finished_at = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def status(self) -> str:
+        if self.finished_at is not None:
+            return "completed"
+        return "running" if self.started_at is not None else "queued"
+
+    def to_dict(self) -> Dict[str, Any]:
+        totals = {
+            key: sum(job.progress[key] for job in self.jobs)
+            for key in ("pages_total", "pages_parsed", "pages_unchanged", "chunks_extracted", "vectors_written")
+        }
+        elapsed = 0.0
+        if self.started_at is not None:
+            elapsed = ((self.finished_at or datetime.datetime.now()) - self.started_at).total_seconds()
+        jobs_by_status: Dict[str, int] = {}
+        for job in self.jobs:
+            jobs_by_status[job.status] = jobs_by_status.get(job.status, 0) + 1
+        return {
+            "batch_id": self.id,
+            "status": self.status,
+            "files": len(self.jobs),
+            "jobs_by_status": jobs_by_status,
+            "totals": totals,
+            "elapsed_seconds": round(elapsed, 1),
+            # chunks = token-split chunks that went through extraction and into the graph
+            "pages_per_sec": round(totals["pages_parsed"] / elapsed, 2) if elapsed else 0.0,
+            "chunks_per_sec": round(totals["chunks_extracted"] / elapsed, 2) if elapsed else 0.0,
+            "jobs": [job.to_dict() for job in self.jobs],
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+# --- 3. MANAGER ---
+class IngestJobManager:
+    def __init__(self):
+        self.jobs: Dict[str, IngestJob] = {}
+        self.batches: Dict[str, IngestBatch] = {}
+        self._runners = set()   # One task per single-upload job, from submit until it finishes
+
+    def start(self):
+        """Must be called from inside the running event loop (app startup)."""
+        os.makedirs(INGEST_UPLOAD_DIR, exist_ok=True)
+        logger.info(f" > Ingest jobs ready: {ingest_admission.slots} admission slots, queue size {ingest_admission.max_waiting}")
+
+    async def stop(self):
+        tasks = list(self._runners) + [b.task for b in self.batches.values() if b.task is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._runners.clear()
+
+    async def spool_upload(self, upload, suffix: str = ".pdf") -> str:
+        """
+        Streams an UploadFile to the upload dir in INGEST_UPLOAD_CHUNK_BYTES blocks, so
+        the manual is never held in memory whole. Parsing later opens it by path.
+        Writes go through asyncio's default threads, not the ingest I/O pool, so uploads
+        don't queue behind (or hold up) running ingests.
+        """
+        path = os.path.join(INGEST_UPLOAD_DIR, f"{uuid.uuid4().hex}{suffix}")
+        try:
+            with open(path, "wb") as f:
+                while chunk := await upload.read(INGEST_UPLOAD_CHUNK_BYTES):
+                    await asyncio.to_thread(f.write, chunk)
+        except BaseException:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            raise
+        return path
+
+    def save_zip_members(self, zip_path: str) -> Tuple[List[Tuple[str, str]], Dict[str, Any]]:
+        """
+        Unpacks the PDFs of an uploaded zip into the upload dir.
+        Returns [(pdf_path, filename)] and the zip's metadata.json, if it has one.
+        """
+        pdfs, metadata = [], {}
+        written = []
+        try:
+            with zipfile.ZipFile(zip_path) as archive:
+                for member in archive.infolist():
+                    name = os.path.basename(member.filename)
+                    if member.is_dir() or not name:
+                        continue
+                    if name == "metadata.json":
+                        metadata = json.loads(archive.read(member))
+                    elif name.lower().endswith(".pdf"):
+                        path = os.path.join(INGEST_UPLOAD_DIR, f"{uuid.uuid4().hex}.pdf")
+                        written.append(path)
+                        with archive.open(member) as src, open(path, "wb") as dst:
+                            while block := src.read(INGEST_UPLOAD_CHUNK_BYTES):
+                                dst.write(block)
+                        pdfs.append((path, name))
+        except BaseException:
+            # A corrupt member or full disk mid-archive leaves no orphaned PDFs behind
+            for path in written:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            raise
+        return pdfs, metadata
+
+    def submit(self, pdf_path: str, filename: str, machinery: str, manual_type: str, tenant: str = DEFAULT_TENANT) -> IngestJob:
+        job = IngestJob(pdf_path, filename, machinery, manual_type, tenant)
+        try:
+            ticket = ingest_admission.enqueue(job.tenant)
+        except AdmissionRejected as e:
+            raise IngestQueueFull(str(e))
+        self.jobs[job.id] = job
+        runner = asyncio.create_task(self._run(job, ticket))
+        self._runners.add(runner)
+        runner.add_done_callback(self._runners.discard)
+        self._prune_history()
+        logger.info(f" > Ingest job {job.id} queued for {filename} (tenant {job.tenant})")
+        return job
+
+    def submit_batch(self, files: List[Tuple[str, str, str, str]], tenant: str = DEFAULT_TENANT) -> IngestBatch:
+        """
+        files: [(pdf_path, filename, machinery, manual_type)]. Up to INGEST_BULK_CONCURRENCY
+        of the batch's manuals wait for admission at a time, alongside single uploads.
+        """
+        if len(files) > INGEST_BULK_MAX_FILES:
+            raise IngestQueueFull(f"Bulk ingest is limited to {INGEST_BULK_MAX_FILES} files per batch")
+        jobs = [IngestJob(*f, tenant=tenant) for f in files]
+        batch = IngestBatch(jobs)
+        for job in jobs:
+            self.jobs[job.id] = job
+        self.batches[batch.id] = batch
+        batch.task = asyncio.create_task(self._run_batch(batch))
+        self._prune_history()
+        logger.info(f" > Ingest batch {batch.id} queued with {len(jobs)} files")
+        return batch
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self.jobs.get(job_id)
+
+    def get_batch(self, batch_id: str) -> Optional[IngestBatch]:
+        return self.batches.get(batch_id)
+
+    def cancel_batch(self, batch_id: str) -> Optional[IngestBatch]:
+        batch = self.batches.get(batch_id)
+        if batch is not None:
+            for job in batch.jobs:
+                self.cancel(job.id)
+        return batch
+
+    def cancel(self, job_id: str) -> Optional[IngestJob]:
+        job = self.jobs.get(job_id)
+        if job is None or job.is_finished:
+            return job
+        job.cancel_requested = True
+        if job.task is not None:
+            # Running: stop the pipeline at its next await
+            job.task.cancel()
+        else:
+            # Still queued: give up its place (or slot) and let _run return
+            self._finish(job, "cancelled")
+            if job.ticket is not None:
+                ingest_admission.cancel(job.ticket)
+        return job
+
+    async def _run_batch(self, batch: IngestBatch):
+        slots = asyncio.Semaphore(INGEST_BULK_CONCURRENCY)
+        batch.started_at = datetime.datetime.now()
+
+        async def run_one(job: IngestJob):
+            async with slots:
+                if job.status != "cancelled":
+                    await self._run(job, ingest_admission.enqueue(job.tenant, enforce_limits=False))
+
+        try:
+            await asyncio.gather(*(run_one(job) for job in batch.jobs))
+        finally:
+            for job in batch.jobs:
+                if not job.is_finished:
+                    self._finish(job, "cancelled")
+            batch.finished_at = datetime.datetime.now()
+            batch.task = None
+            logger.info(f" > Ingest batch {batch.id} finished: {batch.to_dict()['pages_per_sec']} pages/sec")
+
+    async def _run(self, job: IngestJob, ticket: AdmissionTicket):
+        job.ticket = ticket
+        try:
+            try:
+                job.queue_wait_seconds = await ingest_admission.wait(ticket)
+            except asyncio.CancelledError:
+                if job.is_finished:
+                    return  # Cancelled by the user while queued
+                self._finish(job, "cancelled")
+                raise
+            if job.is_finished:
+                return
+
+            job.status = "running"
+            job.started_at = datetime.datetime.now()
+            job.task = asyncio.create_task(
+                stream_ingest(job.pdf_path, job.filename, job.machinery, job.manual_type, stats=job.progress)
+            )
+            try:
+                await job.task
+                self._finish(job, "completed")
+            except asyncio.CancelledError:
+                # Either the job was cancelled, or the manager itself is being stopped. Either way
+                # job.task is cancelled by now, so only the flag set by cancel() tells them apart.
+                job.task.cancel()
+                self._finish(job, "cancelled")
+                if not job.cancel_requested:
+                    raise
+            except Exception as e:
+                logger.info(f"Ingest job {job.id} failed: {e}")
+                job.error = str(e)
+                self._finish(job, "failed")
+        finally:
+            ingest_admission.release(ticket)
+
+    def _finish(self, job: IngestJob, status: str):
+        job.status = status
+        job.finished_at = datetime.datetime.now()
+        job.task = None
+        try:
+            os.remove(job.pdf_path)
+        except OSError:
+            pass
+        logger.info(f" > Ingest job {job.id} {status}")
+
+    def _prune_history(self):
+        batched = {job.id for b in self.batches.values() if b.finished_at is None for job in b.jobs}
+        finished = [j for j in self.jobs.values() if j.is_finished and j.id not in batched]
+        for job in finished[:max(0, len(finished) - INGEST_JOB_HISTORY)]:
+            del self.jobs[job.id]
+        finished_batches = [b for b in self.batches.values() if b.finished_at is not None]
+        for batch in finished_batches[:max(0, len(finished_batches) - INGEST_JOB_HISTORY)]:
+            del self.batches[batch.id]
+
+# Singleton Instance
+ingest_jobs = IngestJobManager()
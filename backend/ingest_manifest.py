@@ -0,0 +1,142 @@
+"""
+Ingest Manifest
+Per-page and per-chunk content hashes for every ingested manual, keyed by
+(machinery, manual_type, filename).
+
+Re-ingesting a revised manual diffs against the manifest: page windows whose
+pages are unchanged are skipped entirely, chunks whose content is unchanged are
+not re-extracted or re-embedded, and chunks that no longer exist are retired
+from Neo4j and Chroma (see agent.retire_chunks).
+"""
+import os
+import sqlite3
+import hashlib
+import threading
+from typing import Dict, Iterable, Set
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+INGEST_MANIFEST_PATH = os.getenv("INGEST_MANIFEST_PATH", "./ingest_manifest.db")
+
+# Chunk kinds tracked by the manifest
+EXTRACT = "extract"   # Token-split chunks sent to LLMGraphTransformer (Document nodes in Neo4j)
+VECTOR = "vector"     # Semantic chunks embedded into Neo4j DocumentChunk + Chroma
+
+def manual_key(machinery: str, manual_type: str, filename: str) -> str:
+    return f"{machinery}|{manual_type}|{filename}"
+
+def chunk_id(doc_id: str, content: str, kind: str) -> str:
+    """Deterministic ID for a chunk of a manual, so unchanged chunks keep their ID across re-ingests."""
+    return hashlib.sha256(f"{kind}\n{doc_id}\n{content}".encode("utf-8")).hexdigest()[:32]
+
+class IngestManifest:
+    def __init__(self, path: str = INGEST_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS manifest_pages (
+                manual_key TEXT,
+                page_number INTEGER,
+                page_hash TEXT,
+                PRIMARY KEY (manual_key, page_number)
+            )
+        """)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS manifest_chunks (
+                manual_key TEXT,
+                kind TEXT,
+                chunk_id TEXT,
+                page_start INTEGER,
+                PRIMARY KEY (manual_key, kind, chunk_id, page_start)
+            )
+        """)
+        self._conn.commit()
+
+    # --- PAGES ---
+    def get_page_hashes(self, key: str) -> Dict[int, str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT page_number, page_hash FROM manifest_pages WHERE manual_key = ?", (key,)
+            ).fetchall()
+        return {page_number: h for page_number, h in rows}
+
+    def record_pages(self, key: str, hashes: Dict[int, str]):
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO manifest_pages (manual_key, page_number, page_hash) VALUES (?, ?, ?)",
+                [(key, page_number, h) for page_number, h in hashes.items()]
+            )
+            self._conn.commit()
+
+    # --- CHUNKS ---
+    # A chunk row is (chunk_id, page_start of the window that produced it). The same
+    # boilerplate chunk can appear in several windows, so a chunk is only retired
+    # once no window of the manual references it any more.
+
+    def get_chunk_ids(self, key: str) -> Set[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT DISTINCT chunk_id FROM manifest_chunks WHERE manual_key = ?", (key,)
+            ).fetchall()
+        return {cid for (cid,) in rows}
+
+    def replace_window_chunks(self, key: str, kind: str, page_start: int, page_end: int, chunk_ids: Iterable[str]) -> Set[str]:
+        """
+        Makes chunk_ids the chunks of this kind for pages [page_start, page_end].
+        Returns the IDs that are no longer referenced anywhere in the manual (to retire).
+        """
+        chunk_ids = set(chunk_ids)
+        with self._lock:
+            previous = {cid for (cid,) in self._conn.execute(
+                "SELECT chunk_id FROM manifest_chunks WHERE manual_key = ? AND kind = ? AND page_start BETWEEN ? AND ?",
+                (key, kind, page_start, page_end)
+            )}
+            self._conn.execute(
+                "DELETE FROM manifest_chunks WHERE manual_key = ? AND kind = ? AND page_start BETWEEN ? AND ?",
+                (key, kind, page_start, page_end)
+            )
+            self._conn.executemany(
+                "INSERT INTO manifest_chunks (manual_key, kind, chunk_id, page_start) VALUES (?, ?, ?, ?)",
+                [(key, kind, cid, page_start) for cid in chunk_ids]
+            )
+            orphaned = self._orphaned(key, kind, previous - chunk_ids)
+            self._conn.commit()
+        return orphaned
+
+    def truncate(self, key: str, page_count: int) -> Dict[str, Set[str]]:
+        """
+        Forgets pages (and their chunks) past the end of a manual that got shorter.
+        Returns {kind: orphaned chunk IDs}.
+        """
+        orphaned = {}
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM manifest_pages WHERE manual_key = ? AND page_number > ?", (key, page_count)
+            )
+            for kind in (EXTRACT, VECTOR):
+                dropped = {cid for (cid,) in self._conn.execute(
+                    "SELECT chunk_id FROM manifest_chunks WHERE manual_key = ? AND kind = ? AND page_start > ?",
+                    (key, kind, page_count)
+                )}
+                self._conn.execute(
+                    "DELETE FROM manifest_chunks WHERE manual_key = ? AND kind = ? AND page_start > ?",
+                    (key, kind, page_count)
+                )
+                orphaned[kind] = self._orphaned(key, kind, dropped)
+            self._conn.commit()
+        return orphaned
+
+    def _orphaned(self, key: str, kind: str, candidates: Set[str]) -> Set[str]:
+        still_used = set()
+        for cid in candidates:
+            if self._conn.execute(
+                "SELECT 1 FROM manifest_chunks WHERE manual_key = ? AND kind = ? AND chunk_id = ? LIMIT 1",
+                (key, kind, cid)
+            ).fetchone():
+                still_used.add(cid)
+        return candidates - still_used
+
+# Singleton Instance
+ingest_manifest = IngestManifest()
@@ -0,0 +1,139 @@
+"""
+Ingest Memory Budget
+Bounds the extracted image bytes held in memory by ingests, per manual and for
+the whole worker. Parsing waits (backpressure) when the budget is spent instead
+of piling up images until the pod runs out of memory.
+
+    ingest_memory (INGEST_MEMORY_BUDGET_BYTES, shared)
+      └── one MemoryBudget per ingest (INGEST_REQUEST_MEMORY_BYTES)
+"""
+import os
+import asyncio
+from collections import deque
+from typing import Any, Dict, Optional
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+INGEST_MEMORY_BUDGET_BYTES = int(os.getenv("INGEST_MEMORY_BUDGET_BYTES", str(1024 * 1024 * 1024)))
+INGEST_REQUEST_MEMORY_BYTES = int(os.getenv("INGEST_REQUEST_MEMORY_BYTES", str(256 * 1024 * 1024)))
+
+class MemoryBudget:
+    def __init__(self, limit: int, parent: Optional["MemoryBudget"] = None):
+        self.limit = limit
+        self.parent = parent
+        self.used = 0
+        self.peak = 0
+        self.waits = 0
+        self._granted = 0         # Bytes the parent has granted us; all close() may hand back
+        self._closed = False
+        self._waiters = deque()   # (nbytes, future), served in FIFO order
+
+    @property
+    def max_grant(self) -> int:
+        """Largest single reservation; bigger items are clamped so they can still run alone."""
+        return min(self.limit, self.parent.max_grant) if self.parent else self.limit
+
+    def _fits(self, nbytes: int) -> bool:
+        return self.used == 0 or self.used + nbytes <= self.limit
+
+    async def acquire(self, nbytes: int) -> int:
+        """
+        Waits until nbytes fit in this budget and every parent budget.
+        Returns the amount actually reserved; pass that to release().
+        """
+        nbytes = min(nbytes, self.max_grant)
+        if self._waiters or not self._fits(nbytes):
+            self.waits += 1
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.append((nbytes, future))
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Granted just as we were cancelled: hand it back
+                    self._release_local(nbytes)
+                elif (nbytes, future) in self._waiters:   # close() already dropped it otherwise
+                    self._waiters.remove((nbytes, future))
+                raise
+        else:
+            self.used += nbytes
+        self.peak = max(self.peak, self.used)
+
+        if self.parent is not None:
+            try:
+                await self.parent.acquire(nbytes)
+            except BaseException:
+                if not self._closed:
+                    self._release_local(nbytes)
+                raise
+            if self._closed:
+                # Closed while we waited on the parent: nothing will release this grant
+                self.parent.release(nbytes)
+            else:
+                self._granted += nbytes
+        return nbytes
+
+    def release(self, nbytes: int):
+        if self._closed:
+            return
+        self._release_local(nbytes)
+        if self.parent is not None:
+            self._granted -= nbytes
+            self.parent.release(nbytes)
+
+    def adjust(self, reserved: int, nbytes: int) -> int:
+        """
+        Resizes a reservation to the real size of what it was made for, without waiting:
+        that data is already in memory. Growing past the limit makes later acquire()
+        calls wait longer. Returns nbytes; pass that to release().
+        """
+        if nbytes < reserved:
+            self.release(reserved - nbytes)
+        elif nbytes > reserved and not self._closed:
+            self.used += nbytes - reserved
+            self.peak = max(self.peak, self.used)
+            if self.parent is not None:
+                self._granted += nbytes - reserved
+                self.parent.adjust(0, nbytes - reserved)
+        return nbytes
+
+    def _release_local(self, nbytes: int):
+        self.used -= nbytes
+        while self._waiters and self._fits(self._waiters[0][0]):
+            waiting, future = self._waiters.popleft()
+            if future.done():
+                continue
+            self.used += waiting
+            future.set_result(None)
+
+    def close(self):
+        """
+        Returns everything the parent granted to it (e.g. a cancelled ingest). Bytes
+        counted here but still waiting on the parent were never granted, so stay out.
+        """
+        if self._closed:
+            return
+        if self.parent is not None and self._granted:
+            self.parent.release(self._granted)
+        self._granted = 0
+        self.used = 0
+        self._closed = True
+        for _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    def child(self, limit: int = INGEST_REQUEST_MEMORY_BYTES) -> "MemoryBudget":
+        return MemoryBudget(limit, parent=self)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "limit_bytes": self.limit,
+            "used_bytes": self.used,
+            "peak_bytes": self.peak,
+            "waiting": len(self._waiters),
+            "waits": self.waits
+        }
+
+# Singleton Instance
+ingest_memory = MemoryBudget(INGEST_MEMORY_BUDGET_BYTES)
@@ -0,0 +1,319 @@
+"""
+Streaming Ingest Pipeline
+Pages flow out of PyMuPDF one at a time through overlapping, bounded stages:
+
+    parse pages -> describe images -> page windows -> graph_workflow (split / extract / embed / write)
+
+The first page window reaches Neo4j/Chroma while later pages are still being parsed.
+Windows whose pages are unchanged since the last ingest of the same manual are
+skipped, and chunks that disappeared are retired (see ingest_manifest).
+"""
+import os
+import asyncio
+import hashlib
+import datetime
+from typing import Dict, Any, List, Optional, Tuple
+from langchain_core.documents import Document
+import logging
+logger = logging.getLogger("uvicorn")
+
+from agent import graph_workflow, retire_chunks
+from ingest_manifest import ingest_manifest, manual_key, EXTRACT, VECTOR
+from pdf_extract import get_page_count, iter_page_shards
+from vision import safe_analyze_images
+from executors import run_cpu, run_io
+from image_dedup import PhashIndex
+from image_triage import ImageTriage
+from ingest_memory import ingest_memory, MemoryBudget
+
+# --- 1. CONFIGURATION ---
+# Pages per Document handed to graph_workflow. Small enough that the first
+# chunks land quickly, large enough that SemanticChunker has context.
+INGEST_PAGE_BATCH = int(os.getenv("INGEST_PAGE_BATCH", "10"))
+
+# How many pages may be parsed / described ahead of the writer. Image bytes of
+# those pages are additionally capped by the ingest memory budget (ingest_memory).
+INGEST_PAGE_LOOKAHEAD = int(os.getenv("INGEST_PAGE_LOOKAHEAD", "8"))
+
+# Sentinels marking the end of a page window / of a stage's output
+_WINDOW_END = object()
+_DONE = object()
+
+def make_doc_id(machinery: str, manual_type: str, filename: str) -> str:
+    """
+    Stable ID for the whole manual, shared by every page window. Derived from the
+    filename rather than the content so revisions of a manual keep their doc_id.
+    """
+    name_hash = hashlib.md5(filename.encode("utf-8")).hexdigest()[:8]
+    return f"{machinery}_{manual_type}_{name_hash}"
+
+def build_window_document(pages: List[Dict[str, Any]], machinery: str, manual_type: str, filename: str, doc_id: str) -> Document:
+    """Combines a window of described pages into one Document for graph_workflow."""
+    page_texts = []
+    for page in pages:
+        page_texts.append(page["text"] + "\n" + "\n".join(page["descriptions"]))
+
+    enriched_content = f"Document Type: {manual_type}. Machinery: {machinery}. Content: " + "\n".join(page_texts)
+
+    return Document(
+        page_content=enriched_content,
+        metadata={
+            "source": str(manual_type),
+            "machinery": str(machinery),
+            "filename": str(filename),
+            "doc_id": doc_id,
+            "page_start": pages[0]["page_number"],
+            "page_end": pages[-1]["page_number"]
+        }
+    )
+
+# --- 2. STAGES ---
+
+async def _parse_stage(pdf_path: str, out_queue: asyncio.Queue, previous_hashes: Dict[int, str], stats: Dict[str, int], budget: MemoryBudget, triage: ImageTriage):
+    """
+    Parses page windows (INGEST_PAGE_BATCH pages each) in the CPU process pool,
+    INGEST_EXTRACT_PARALLELISM windows at a time (see pdf_extract.iter_page_shards).
+    Windows whose pages all match the manifest are dropped here, before any vision call,
+    and so are images that image_triage scores as not worth describing.
+    Every window reserves an estimate of its image bytes (its share of the file size)
+    in the memory budget before it is scheduled, resized to the real bytes once
+    extracted; parsing stalls while too many undescribed images are alive.
+    Images dropped here hand their bytes back at once.
+    """
+    page_count = await run_cpu(get_page_count, pdf_path)
+    stats["pages_total"] = page_count
+    shard_bytes = os.path.getsize(pdf_path) * INGEST_PAGE_BATCH // max(page_count, 1)
+    shards = iter_page_shards(pdf_path, page_count, INGEST_PAGE_BATCH, budget=budget, shard_bytes=shard_bytes)
+    try:
+        async for pages in shards:
+            stats["pages_parsed"] += len(pages)
+            for page in pages:
+                # Every page is triaged, unchanged or not, so repeat counts see the whole manual
+                kept = triage.filter_page(page)
+                kept_ids = {id(image) for image in kept}
+                for image in page["images"]:
+                    if id(image) not in kept_ids:
+                        budget.release(image["reserved"])
+                stats["images_skipped"] += len(page["images"]) - len(kept)
+                page["images"] = kept
+            if pages and all(previous_hashes.get(p["page_number"]) == p["content_hash"] for p in pages):
+                stats["pages_unchanged"] += len(pages)
+                for page in pages:
+                    for image in page["images"]:
+                        budget.release(image["reserved"])
+                continue
+            for page in pages:
+                await out_queue.put(page)
+            await out_queue.put(_WINDOW_END)
+    finally:
+        await shards.aclose()
+    await out_queue.put(_DONE)
+
+class _ImageDeduper:
+    """
+    Clusters near-duplicate images within one document. The first image of a
+    cluster is described; later members await and reuse its description.
+    """
+    def __init__(self, stats: Dict[str, int]):
+        self.stats = stats
+        self.index = PhashIndex()
+
+    def describe_page(self, images) -> Tuple[List["asyncio.Future"], Optional[asyncio.Task]]:
+        """
+        One future per image. The page's new images go to safe_analyze_images
+        together, so its small diagrams can share vision requests.
+        Returns the futures and the task describing the new images (if any).
+        """
+        loop = asyncio.get_running_loop()
+        futures, fresh = [], []
+        for image in images:
+            phash = image["phash"]
+            if phash is not None:
+                representative = self.index.find(phash)
+                if representative is not None:
+                    self.stats["images_deduplicated"] += 1
+                    futures.append(representative)
+                    continue
+            future = loop.create_future()
+            if phash is not None:
+                self.index.add(phash, future)
+            fresh.append((image, future))
+            futures.append(future)
+        if not fresh:
+            return futures, None
+
+        self.stats["images_described"] += len(fresh)
+        task = asyncio.ensure_future(safe_analyze_images([image for image, _ in fresh]))
+        task.add_done_callback(lambda t, pending=[f for _, f in fresh]: _resolve(pending, t))
+        return futures, task
+
+def _resolve(futures: List["asyncio.Future"], task: asyncio.Task):
+    for i, future in enumerate(futures):
+        if future.done():
+            continue
+        if task.cancelled():
+            future.cancel()
+        elif task.exception() is not None:
+            future.set_exception(task.exception())
+        else:
+            future.set_result(task.result()[i])
+
+async def _describe_page(page, deduper: _ImageDeduper, budget: MemoryBudget) -> Dict[str, Any]:
+    # Drop the page's references so image bytes are freed (and returned to the
+    # budget) as soon as the request describing them is done, not with the whole page
+    images = page.pop("images")
+    futures, task = deduper.describe_page(images)
+    for image, future in zip(images, futures):
+        future.add_done_callback(lambda _, n=image["reserved"]: budget.release(n))
+    images = image = None
+    try:
+        descriptions = await asyncio.gather(*futures)
+    except asyncio.CancelledError:
+        if task is not None:
+            task.cancel()
+        raise
+    # Repeated diagrams on one page only need describing once in the text
+    descriptions = list(dict.fromkeys(d for d in descriptions if d))
+    return {
+        "page_number": page["page_number"],
+        "text": page["text"],
+        "content_hash": page["content_hash"],
+        "descriptions": descriptions
+    }
+
+async def _describe_stage(in_queue: asyncio.Queue, out_queue: asyncio.Queue, deduper: _ImageDeduper, budget: MemoryBudget):
+    """
+    Starts image description for each page as soon as it is parsed.
+    Tasks are queued in page order so the writer can await them in order,
+    while up to INGEST_PAGE_LOOKAHEAD pages are being described at once.
+    """
+    while True:
+        page = await in_queue.get()
+        if page is _DONE:
+            break
+        if page is _WINDOW_END:
+            await out_queue.put(_WINDOW_END)
+            continue
+        await out_queue.put(asyncio.create_task(_describe_page(page, deduper, budget)))
+    await out_queue.put(_DONE)
+
+async def _write_stage(in_queue: asyncio.Queue, machinery: str, manual_type: str, filename: str, doc_id: str, stats: Dict[str, int]):
+    key = manual_key(machinery, manual_type, filename)
+    # Chunks currently stored for this manual; graph_workflow skips these
+    known_chunk_ids = await run_io(ingest_manifest.get_chunk_ids, key)
+    window = []
+
+    async def flush():
+        page_start, page_end = window[0]["page_number"], window[-1]["page_number"]
+        doc_obj = build_window_document(window, machinery, manual_type, filename, doc_id)
+        # ingest_node awaits LLM calls and pushes its blocking steps to the I/O pool,
+        # so parsing / vision for later pages keep going meanwhile
+        result = await graph_workflow.ainvoke({
+            "documents": [doc_obj],
+            "error_log": None,
+            "known_chunk_ids": list(known_chunk_ids)
+        })
+        stats["windows_written"] += 1
+        stats["chunks_extracted"] += result.get("chunks_extracted", 0)
+        stats["vectors_written"] += result.get("vectors_written", 0)
+        stats["chunks_deduplicated"] += result.get("chunks_deduplicated", 0)
+        if result.get("error_log") == "refactored":
+            stats["refactored"] = True
+
+        # Diff this window's chunks against the manifest and retire what disappeared
+        extract_ids = result.get("extract_chunk_ids", [])
+        vector_ids = result.get("vector_chunk_ids", [])
+        stale_extract = await run_io(ingest_manifest.replace_window_chunks, key, EXTRACT, page_start, page_end, extract_ids)
+        stale_vector = await run_io(ingest_manifest.replace_window_chunks, key, VECTOR, page_start, page_end, vector_ids)
+        known_chunk_ids.update(extract_ids, vector_ids)
+        known_chunk_ids.difference_update(stale_extract, stale_vector)
+        if stale_extract or stale_vector:
+            await run_io(retire_chunks, list(stale_extract), list(stale_vector))
+            stats["chunks_retired"] += len(stale_extract) + len(stale_vector)
+
+        # Only remember the pages once everything for them is stored, so failures are retried
+        if result.get("ingest_complete"):
+            await run_io(ingest_manifest.record_pages, key, {p["page_number"]: p["content_hash"] for p in window})
+        logger.info(f"   > Window pages {page_start}-{page_end} written.")
+
+    while True:
+        item = await in_queue.get()
+        if item is _DONE:
+            break
+        if item is _WINDOW_END:
+            if window:
+                await flush()
+            window = []
+            continue
+        window.append(await item)
+
+    # A shorter revision: retire everything that came from the removed pages
+    stale = await run_io(ingest_manifest.truncate, key, stats["pages_total"])
+    if stale[EXTRACT] or stale[VECTOR]:
+        await run_io(retire_chunks, list(stale[EXTRACT]), list(stale[VECTOR]))
+        stats["chunks_retired"] += len(stale[EXTRACT]) + len(stale[VECTOR])
+
+# --- 3. ENTRY POINT ---
+
+def new_ingest_stats() -> Dict[str, Any]:
+    return {
+        "pages_total": 0,
+        "pages_parsed": 0,
+        "pages_unchanged": 0,
+        "images_described": 0,
+        "images_deduplicated": 0,
+        "images_skipped": 0,
+        "chunks_extracted": 0,
+        "vectors_written": 0,
+        "chunks_deduplicated": 0,
+        "chunks_retired": 0,
+        "windows_written": 0,
+        "refactored": False
+    }
+
+async def stream_ingest(pdf_path: str, filename: str, machinery: str, manual_type: str, stats: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Ingests the PDF stored at pdf_path. Parsing runs in the process pool and
+    graph_workflow in the thread pool, so the event loop only coordinates.
+    Pass a dict from new_ingest_stats() as `stats` to watch progress while it runs.
+    """
+    logger.info(f"--- INGEST (streaming): Starting {filename} ---")
+    start_time = datetime.datetime.now()
+
+    doc_id = make_doc_id(machinery, manual_type, filename)
+    previous_hashes = await run_io(ingest_manifest.get_page_hashes, manual_key(machinery, manual_type, filename))
+    if stats is None:
+        stats = new_ingest_stats()
+    stats["doc_id"] = doc_id
+
+    page_queue = asyncio.Queue(maxsize=INGEST_PAGE_LOOKAHEAD)
+    described_queue = asyncio.Queue(maxsize=INGEST_PAGE_LOOKAHEAD)
+    budget = ingest_memory.child()
+    triage = ImageTriage(filename)
+
+    stages = [
+        asyncio.create_task(_parse_stage(pdf_path, page_queue, previous_hashes, stats, budget, triage)),
+        asyncio.create_task(_describe_stage(page_queue, described_queue, _ImageDeduper(stats), budget)),
+        asyncio.create_task(_write_stage(described_queue, machinery, manual_type, filename, doc_id, stats)),
+    ]
+    try:
+        await asyncio.gather(*stages)
+    finally:
+        # If one stage fails, don't leave the others blocked on a full queue
+        for stage in stages:
+            stage.cancel()
+        while not described_queue.empty():
+            task = described_queue.get_nowait()
+            if isinstance(task, asyncio.Task):
+                task.cancel()
+        # Whatever queued pages still hold goes back to the shared budget
+        budget.close()
+
+    logger.info(
+        f" > Streaming ingest of {stats['pages_parsed']} pages ({stats['pages_unchanged']} unchanged) "
+        f"took: {datetime.datetime.now() - start_time}"
+    )
+    if triage.skipped:
+        logger.info(f" > Triage kept {triage.kept} images, skipped {triage.skipped}: {triage.reasons}")
+
+    return stats
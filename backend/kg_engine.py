@@ -7,28 +7,40 @@ logger = logging.getLogger("uvicorn")
 
 # Import singletons from agents.py
 from agent import llm, graph
+from schema_cache import schema_cache
+from chain_registry import chain_registry
+
+def _build_chain() -> GraphCypherQAChain:
+    return GraphCypherQAChain.from_llm(
+        llm=llm,
+        graph=graph,
+        verbose=True,
+        allow_dangerous_requests=True,
+        return_direct=True,
+        validate_cypher=True
+    )
 
 class ManufacturingKGQueryEngine:
     """
     Dynamic Query Engine for Enterprise Context.
+    Get one per request with ManufacturingKGQueryEngine.shared(); the Cypher chain it
+    holds is shared by every request on the same schema version.
     """
 
-    def __init__(self):
+    def __init__(self, chain: GraphCypherQAChain):
         self.graph = graph
         self.llm = llm
-        
-        self.chain = GraphCypherQAChain.from_llm(
-            llm=self.llm,
-            graph=self.graph,
-            verbose=True,
-            allow_dangerous_requests=True,
-            return_direct=True,
-            validate_cypher=True
-        )
+        self.chain = chain
+
+    @classmethod
+    def shared(cls) -> "ManufacturingKGQueryEngine":
+        # The schema version is looked up once here, not on every query of the request.
+        # The chain copies the schema when built, so each schema version gets its own.
+        snapshot = schema_cache.get(graph)
+        return cls(chain_registry.get("kg_cypher_qa", _build_chain, version=snapshot.version))
 
     def _execute_dynamic_query(self, natural_language_logic: str) -> List[Dict]:
         try:
-            self.graph.refresh_schema()
             # --- FIX: Pass input as a dictionary with key "query" ---
             result = self.chain.invoke({"query": natural_language_logic})
             return result.get('result', [])
@@ -1,12 +1,12 @@
-from fastapi import FastAPI, HTTPException, Body, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, Body, UploadFile, File, Form, Header
 from fastapi.middleware.cors import CORSMiddleware
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import os
 import uuid
 import datetime
 import json
+import zipfile
 from dotenv import load_dotenv
-import base64
-from langchain_core.messages import HumanMessage
 import traceback
 import asyncio # You likely already have this
 import logging
@@ -24,19 +24,33 @@ from models import (
     TechnicianInput, 
     TaskInput, 
     MachineInput, 
+    IngestJobStatus,
+    IngestBatchStatus,
 )
 from data import DATA_SOURCES, STATS
-import fitz  # PyMuPDF
 from agent import (
-    graph_workflow, 
     process_chat_query, 
     get_knowledge_graph_filters, 
     add_technician_to_graph, 
     add_task_to_graph, 
     add_machine_to_graph, 
     graph, 
+    async_driver, 
     get_graph_statistics, 
-    llm)
+    embedding_batcher,
+    graph_write_batcher)
+from ingest_jobs import ingest_jobs, IngestQueueFull
+from executors import run_io, shutdown_pools
+from image_cache import image_cache
+from embedding_cache import embedding_cache
+from chunk_dedup import chunk_dedup
+from ingest_memory import ingest_memory
+from ingest_admission import ingest_admission
+from schema_cache import schema_cache
+from chat_vocabulary import chat_vocabulary
+from chain_registry import chain_registry
+from cypher_cache import cypher_cache
+from graph_schema import bootstrap_schema
 from work_order_agent import WorkOrderAssignmentAgent
 from pydantic import BaseModel
 
@@ -65,6 +79,24 @@ class WorkOrderDetail(BaseModel):
     required_skills: List[str]
     target_machine: str = "Unknown"
     assigned_technician: str = "Unassigned"
+@app.on_event("startup")
+async def start_ingest_workers():
+    try:
+        await run_io(bootstrap_schema, graph)
+    except Exception as e:
+        logger.info(f"Graph schema bootstrap failed: {e}")
+    try:
+        await run_io(chat_vocabulary.load, graph)
+    except Exception as e:
+        logger.info(f"Chat vocabulary load failed: {e}")
+    ingest_jobs.start()
+
+@app.on_event("shutdown")
+async def stop_ingest_workers():
+    await ingest_jobs.stop()
+    await async_driver.close()
+    shutdown_pools()
+
 @app.get("/")
 async def root():
     return {"message": "FactoryOS Backend is running"}
@@ -106,6 +138,9 @@ def create_work_order_in_graph(wo_data: dict):
     
     try:
         graph.query(query, wo_data)
+        schema_cache.invalidate()
+        chat_vocabulary.add_labels(["WorkOrder"])
+        chat_vocabulary.add_machines([wo_data["machine_name"]])
         logger.info(f" > SUCCESS: WorkOrder {wo_data['id']} seeded to Graph.")
         return True
     except Exception as e:
@@ -114,33 +149,6 @@ def create_work_order_in_graph(wo_data: dict):
 
 # --- Simulation & Agent Trigger Endpoint ---
 
-async def analyze_image_with_gpt4o(image_bytes):
-    # Encode image to base64
-    base64_image = base64.b64encode(image_bytes).decode('utf-8')
-    
-    # Create the payload for GPT-4o
-    message = HumanMessage(
-        content=[
-            {"type": "text", "text": "Describe this technical diagram or machine part in extreme detail for a search index."},
-            {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{base64_image}"}}
-        ]
-    )
-    
-    # Invoke the model (using the LLM imported from agent.py)
-    response = await llm.ainvoke([message])
-    return f"\n[IMAGE DESCRIPTION]: {response.content}\n"
-
-# Limit concurrent image analysis to 5 at a time to avoid Rate Limits
-image_semaphore = asyncio.Semaphore(5)
-
-async def safe_analyze_image(image_bytes):
-    async with image_semaphore:
-        try:
-            return await analyze_image_with_gpt4o(image_bytes)
-        except Exception as e:
-            logger.info(f"Image analysis failed: {e}")
-            return "" # Return empty string on failure so process continues
-
 @app.post("/api/simulation/log")
 async def simulate_log_event():
     # ... (UUID and Time generation remains same) ...
@@ -251,87 +259,134 @@ async def resolve_alert(alert_id: str):
 async def ingest_data(
     file: UploadFile = File(...), 
     machinery: str = Form(...), 
-    manual_type: str = Form(...)
+    manual_type: str = Form(...),
+    x_tenant_id: Optional[str] = Header(None)
 ):
-    logger.info(f"--- INGEST: Starting {file.filename} ---")
-    start_time = datetime.datetime.now()
-    
-    pdf_bytes = await file.read()
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    
-    # 1. Extract Text Immediately
-    # getting text is fast, so we do it all at once
-    full_text_content = []
-    for page in doc:
-        full_text_content.append(page.get_text())
-    
-    # 2. Collect Image Tasks (Do not await them yet!)
-    image_tasks = []
-    
-    logger.info(" > Extracting images for parallel processing...")
-    
-    for page_index, page in enumerate(doc):
-        image_list = page.get_images(full=True)
-        
-        for img_index, img in enumerate(image_list):
-            xref = img[0]
-            
-            # --- OPTIMIZATION: Filter Small Images ---
-            # img[2] is width, img[3] is height in PyMuPDF's get_images()
-            width, height = img[2], img[3]
-            if width < 300 or height < 300: 
-                # Skip icons, logos, lines, bullets
-                continue
-            
-            # Extract bytes only for valid images
-            base_image = doc.extract_image(xref)
-            image_bytes = base_image["image"]
-            
-            # Create a coroutine task and add to list
-            task = safe_analyze_image(image_bytes)
-            image_tasks.append(task)
-
-    logger.info(f" > Found {len(image_tasks)} valid images. analyzing concurrently...")
+    # Spool the upload to disk and queue it for admission (fair across X-Tenant-ID); the client polls for progress
+    pdf_path = await ingest_jobs.spool_upload(file)
+    try:
+        job = ingest_jobs.submit(pdf_path, file.filename, machinery, manual_type, tenant=x_tenant_id)
+    except IngestQueueFull as e:
+        os.remove(pdf_path)
+        raise HTTPException(status_code=503, detail=str(e))
 
-    # 3. Execute all Image Tasks in Parallel
-    # This runs them all at the same time (up to the semaphore limit)
-    image_descriptions = await asyncio.gather(*image_tasks)
-    
-    # 4. Combine Text and Image Descriptions
-    final_text_context = "\n".join(full_text_content) + "\n" + "\n".join(image_descriptions)
-
-    logger.info(f" > Content preparation took: {datetime.datetime.now() - start_time}")
-
-    # 5. Enrich and Run Workflow
-    enriched_content = f"Document Type: {manual_type}. Machinery: {machinery}. Content: {final_text_context}"
-
-    # Use a Document object if you updated your agent.py as discussed previously,
-    # otherwise pass the string 'enriched_content'
-    from langchain_core.documents import Document
-    doc_obj = Document(
-        page_content=enriched_content, # or just use final_text_context depending on your parser
-        metadata={
-            "source": str(manual_type),
-            "machinery": str(machinery),
-            "filename": str(file.filename)
-        }
-    )
+    return {
+        "status": "Queued",
+        "job_id": job.id,
+        "machinery_added": machinery
+    }
 
-    result = graph_workflow.invoke({
-        "documents": [doc_obj], # Passing object for better metadata handling
-        "error_log": None
-    })
+@app.post("/api/ingest/bulk", response_model=IngestBatchStatus)
+async def ingest_bulk(
+    files: List[UploadFile] = File(...),
+    metadata: str = Form("{}"),
+    machinery: Optional[str] = Form(None),
+    manual_type: Optional[str] = Form(None),
+    x_tenant_id: Optional[str] = Header(None)
+):
+    """
+    Onboards many manuals at once: PDFs and/or zips of PDFs.
+    Per-file machinery / manual_type come from `metadata`
+    ({"<filename>": {"machinery": ..., "manual_type": ...}}), then a metadata.json
+    inside a zip, then the machinery / manual_type form defaults.
+    The batch's manuals share the X-Tenant-ID tenant's admission slots.
+    """
+    try:
+        per_file = json.loads(metadata)
+    except ValueError:
+        per_file = None
+    if not isinstance(per_file, dict):
+        raise HTTPException(status_code=400, detail="metadata must be a JSON object keyed by filename")
 
+    saved = []   # (pdf_path, filename)
+    try:
+        zip_metadata = {}
+        for upload in files:
+            is_zip = upload.filename.lower().endswith(".zip")
+            path = await ingest_jobs.spool_upload(upload, suffix=".zip" if is_zip else ".pdf")
+            if is_zip:
+                try:
+                    members, meta = await asyncio.to_thread(ingest_jobs.save_zip_members, path)
+                finally:
+                    os.remove(path)
+                saved.extend(members)
+                zip_metadata.update(meta)
+            else:
+                saved.append((path, upload.filename))
+
+        submissions = []
+        for path, filename in saved:
+            meta = per_file.get(filename) or zip_metadata.get(filename) or {}
+            file_machinery = meta.get("machinery", machinery)
+            file_manual_type = meta.get("manual_type", manual_type)
+            if not file_machinery or not file_manual_type:
+                raise HTTPException(status_code=400, detail=f"No machinery / manual_type given for {filename}")
+            submissions.append((path, filename, file_machinery, file_manual_type))
+        if not submissions:
+            raise HTTPException(status_code=400, detail="No PDFs found in the upload")
+
+        batch = ingest_jobs.submit_batch(submissions, tenant=x_tenant_id)
+    except Exception as e:
+        for path, _ in saved:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if isinstance(e, IngestQueueFull):
+            raise HTTPException(status_code=503, detail=str(e))
+        if isinstance(e, (zipfile.BadZipFile, ValueError)):
+            raise HTTPException(status_code=400, detail=f"Invalid upload: {e}")
+        raise
+
+    return batch.to_dict()
+
+@app.get("/api/ingest/batches/{batch_id}", response_model=IngestBatchStatus)
+async def get_ingest_batch(batch_id: str):
+    batch = ingest_jobs.get_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Ingest batch not found")
+    return batch.to_dict()
+
+@app.post("/api/ingest/batches/{batch_id}/cancel", response_model=IngestBatchStatus)
+async def cancel_ingest_batch(batch_id: str):
+    batch = ingest_jobs.cancel_batch(batch_id)
+    if batch is None:
+        raise HTTPException(status_code=404, detail="Ingest batch not found")
+    return batch.to_dict()
+
+@app.get("/api/ingest/jobs/{job_id}", response_model=IngestJobStatus)
+async def get_ingest_job(job_id: str):
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job.to_dict()
+
+@app.post("/api/ingest/jobs/{job_id}/cancel", response_model=IngestJobStatus)
+async def cancel_ingest_job(job_id: str):
+    job = ingest_jobs.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Ingest job not found")
+    return job.to_dict()
+
+@app.get("/api/metrics/ingest")
+async def get_ingest_metrics():
     return {
-        "status": "Success",
-        "workflow_path": "Refactored" if result.get("error_log") == "refactored" else "Standard Ingest",
-        "machinery_added": machinery,
-        "images_processed": len(image_tasks)
+        "image_cache": image_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "embedding_batches": embedding_batcher.stats(),
+        "graph_write_batches": graph_write_batcher.stats(),
+        "ingest_memory": ingest_memory.stats(),
+        "chunk_dedup": chunk_dedup.stats(),
+        "ingest_admission": ingest_admission.stats(),
+        "graph_schema": schema_cache.stats(),
+        "chat_vocabulary": chat_vocabulary.stats(),
+        "chains": chain_registry.stats(),
+        "cypher_cache": cypher_cache.stats()
     }
 
 @app.post("/api/agent/chat", response_model=ChatResponse)
 async def chat_agent(request: ChatRequest):
-    return process_chat_query(request)
+    return await process_chat_query(request)
 
 @app.get("/api/agent/filters", response_model=FilterOptions)
 async def get_agent_filters():
@@ -363,13 +418,13 @@ async def get_full_graph_visualization():
     MATCH (n)-[r]->(m)
     RETURN 
         elementId(n) AS source_id,
-        labels(n) AS source_labels,
+        [l IN labels(n) WHERE l <> '__Entity__'] AS source_labels,
         coalesce(n.name, n.title, n.description, "Unknown Node") AS source_name,
         
         type(r) AS rel_type,
         
         elementId(m) AS target_id,
-        labels(m) AS target_labels,
+        [l IN labels(m) WHERE l <> '__Entity__'] AS target_labels,
         coalesce(m.name, m.title, m.description, "Unknown Node") AS target_name
     LIMIT 300
     """
@@ -428,7 +483,7 @@ def get_color_for_labels(labels):
     if "Technician" in labels: return "#a78bfa"     # Purple
     if "Task" in labels: return "#facc15"           # Yellow
     if "WorkOrder" in labels: return "#f87171"      # Red
-    if "DocumentChunk" in labels: return "#34d399"  # Emerald
+    if "DocumentChunk" in labels or "DuplicateChunk" in labels: return "#34d399"  # Emerald
     return "#888888" # Default Gray
 
 
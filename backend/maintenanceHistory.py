@@ -8,6 +8,8 @@ import hashlib
 from dotenv import load_dotenv
 from requests.packages.urllib3.exceptions import InsecureRequestWarning
 from langchain_neo4j import Neo4jGraph
+from schema_cache import schema_cache
+from chat_vocabulary import chat_vocabulary
 import logging
 logger = logging.getLogger("uvicorn")
 
@@ -68,6 +70,10 @@ def ingest_maintenance_history(file_path):
 
         for asset in assets:
             process_asset(asset)
+
+        # Only reaches the server's caches when loaded in-process; standalone runs rely on
+        # GRAPH_SCHEMA_TTL_SECONDS and the next chat vocabulary load
+        schema_cache.invalidate()
             
         logger.info("\n--- INGESTION COMPLETE ---")
         
@@ -94,6 +100,7 @@ def process_asset(asset):
     
     try:
         graph.query(machine_query, {"name": target_name})
+        chat_vocabulary.add_machines([target_name])
         logger.info(f" > Found/Matched Machine: {target_name}")
     except Exception as e:
         logger.info(f"Error matching machine {target_name}: {e}")
@@ -135,6 +142,7 @@ def process_incident(machine_name, incident):
     
     try:
         graph.query(incident_query, params)
+        chat_vocabulary.add_incident(machine_name)
         logger.info(f"   - Linked Incident {incident.get('incident_id')} to {machine_name}")
     except Exception as e:
         logger.info(f"   ! Error linking incident {incident.get('incident_id')}: {e}")
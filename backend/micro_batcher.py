@@ -0,0 +1,76 @@
+"""
+Micro-Batcher
+Coalesces small concurrent requests (one per page window, from any number of
+manuals being ingested) into full-size batches for a blocking bulk call such as
+embed_documents or the UNWIND graph writer.
+
+Callers await submit(items) and get back one result per item. A batch is sent
+once it holds max_batch items, or max_wait seconds after its first request.
+"""
+import asyncio
+from typing import Any, Callable, Dict, List, Tuple
+import logging
+logger = logging.getLogger("uvicorn")
+
+from executors import run_io
+
+class MicroBatcher:
+    def __init__(self, flush_fn: Callable[[List[Any]], List[Any]], max_batch: int, max_wait: float = 0.05, name: str = "batch"):
+        """flush_fn takes a list of items and returns one result per item (runs in the I/O pool)."""
+        self.flush_fn = flush_fn
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.name = name
+        self.batches = 0
+        self.items = 0
+        self.requests = 0
+        self._pending: List[Tuple[List[Any], asyncio.Future]] = []
+        self._pending_items = 0
+        self._timer = None
+
+    async def submit(self, items: List[Any]) -> List[Any]:
+        if not items:
+            return []
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((list(items), future))
+        self._pending_items += len(items)
+        self.requests += 1
+        if self._pending_items >= self.max_batch:
+            self._flush_now()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.max_wait, self._flush_now)
+        return await future
+
+    def _flush_now(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if not self._pending:
+            return
+        requests, self._pending, self._pending_items = self._pending, [], 0
+        asyncio.ensure_future(self._flush(requests))
+
+    async def _flush(self, requests: List[Tuple[List[Any], asyncio.Future]]):
+        batch = [item for items, _ in requests for item in items]
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = await run_io(self.flush_fn, batch)
+        except Exception as e:
+            for _, future in requests:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        offset = 0
+        for items, future in requests:
+            if not future.done():  # The caller may have been cancelled meanwhile
+                future.set_result(results[offset:offset + len(items)])
+            offset += len(items)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "batches": self.batches,
+            "items": self.items,
+            "avg_batch_size": round(self.items / self.batches, 1) if self.batches else 0.0
+        }
@@ -110,4 +110,54 @@ class TaskInput(BaseModel):
 class MachineInput(BaseModel):
     name: str # e.g., "Robotic Arm #4"
     location: str # e.g., "Line A - Station 12"
-    type: str # e.g., "Welder"
\ No newline at end of file
+    type: str # e.g., "Welder"
+
+# --- Ingest Job Models ---
+
+class IngestProgress(BaseModel):
+    pages_total: int = 0
+    pages_parsed: int = 0
+    pages_unchanged: int = 0
+    images_described: int = 0
+    images_deduplicated: int = 0
+    images_skipped: int = 0
+    chunks_extracted: int = 0
+    vectors_written: int = 0
+    chunks_deduplicated: int = 0
+    chunks_retired: int = 0
+
+class IngestJobStatus(BaseModel):
+    job_id: str
+    filename: str
+    machinery: str
+    manual_type: str
+    tenant: str = "default"
+    status: Literal["queued", "running", "completed", "failed", "cancelled"]
+    error: Optional[str] = None
+    progress: IngestProgress
+    workflow_path: str
+    queue_wait_seconds: Optional[float] = None
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+
+class IngestBatchTotals(BaseModel):
+    pages_total: int = 0
+    pages_parsed: int = 0
+    pages_unchanged: int = 0
+    chunks_extracted: int = 0
+    vectors_written: int = 0
+
+class IngestBatchStatus(BaseModel):
+    batch_id: str
+    status: Literal["queued", "running", "completed"]
+    files: int
+    jobs_by_status: Dict[str, int]
+    totals: IngestBatchTotals
+    elapsed_seconds: float
+    pages_per_sec: float
+    chunks_per_sec: float
+    jobs: List[IngestJobStatus]
+    created_at: str
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
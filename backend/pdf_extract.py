@@ -0,0 +1,166 @@
+"""
+PDF Extraction Module
+Page-by-page text and image extraction with PyMuPDF
+"""
+import os
+import asyncio
+import hashlib
+from collections import deque
+from typing import TypedDict, Dict, List, Iterator, AsyncIterator, Optional, Tuple
+import fitz  # PyMuPDF
+from image_dedup import perceptual_hash
+from image_triage import pixel_stats
+from vision_prep import prepare_image
+from executors import run_cpu, INGEST_PROCESS_WORKERS
+from ingest_memory import MemoryBudget
+import logging
+logger = logging.getLogger("uvicorn")
+
+# Skip icons, logos, lines, bullets
+MIN_IMAGE_EDGE = 300
+
+# Page ranges extracted at the same time, each in its own worker process
+INGEST_EXTRACT_PARALLELISM = int(os.getenv("INGEST_EXTRACT_PARALLELISM", str(INGEST_PROCESS_WORKERS)))
+
+class PageImage(TypedDict):
+    xref: int
+    raw_hash: str             # sha256 of the image as stored in the PDF; keys the description cache
+    data: bytes               # Normalized for the vision model (see vision_prep)
+    mime: str                 # image/jpeg or image/png
+    width: int                # Size of `data`, after downscaling
+    height: int
+    phash: Optional[int]      # Perceptual hash for near-duplicate detection
+    bbox: Optional[Tuple[float, float, float, float]]  # Where it is drawn, as fractions of the page (x0, y0, x1, y1)
+    pixels: Optional[Dict[str, float]]                 # Thumbnail statistics for image_triage
+
+class PageContent(TypedDict):
+    page_number: int          # 1-based, matches the page label in most manuals
+    text: str
+    images: List[PageImage]   # Every image worth describing
+    content_hash: str         # Hash of text + image bytes, compared by ingest_manifest
+
+def page_content_hash(text: str, image_digests: List[bytes]) -> str:
+    """
+    Hash of everything that feeds the KG for a page: its text and its images.
+    Images are hashed as stored in the PDF, so tuning vision_prep doesn't mark pages changed.
+    """
+    digest = hashlib.sha256(text.encode("utf-8"))
+    for image_digest in image_digests:
+        digest.update(image_digest)
+    return digest.hexdigest()
+
+def image_bbox(page, xref: int) -> Optional[Tuple[float, float, float, float]]:
+    """Where the image is first drawn on the page, relative to the page size."""
+    rects = page.get_image_rects(xref)
+    width, height = page.rect.width, page.rect.height
+    if not rects or not width or not height:
+        return None
+    r = rects[0]
+    return (r.x0 / width, r.y0 / height, r.x1 / width, r.y1 / height)
+
+def iter_pdf_pages(doc, min_image_edge: int = MIN_IMAGE_EDGE, start: int = 0, end: Optional[int] = None) -> Iterator[PageContent]:
+    """
+    Walks the document ONCE and yields text + image bytes for each page.
+    Nothing is held beyond the current page, so callers can start
+    downstream work on page 1 while page 2 is still being parsed.
+    """
+    end = doc.page_count if end is None else min(end, doc.page_count)
+    for page_index in range(start, end):
+        page = doc[page_index]
+        images, image_digests = [], []
+        for img in page.get_images(full=True):
+            xref = img[0]
+            # img[2] is width, img[3] is height in PyMuPDF's get_images()
+            width, height = img[2], img[3]
+            if width < min_image_edge or height < min_image_edge:
+                continue
+            try:
+                extracted = doc.extract_image(xref)
+                raw = extracted["image"]
+                raw_digest = hashlib.sha256(raw)
+                image_digests.append(raw_digest.digest())
+                # Decoding, downscaling and hashing are CPU work, so do them here in the worker process
+                prepared = prepare_image(raw, extracted.get("ext"))
+                if prepared is None:
+                    prepared = {"data": raw, "mime": f"image/{extracted.get('ext', 'jpeg')}", "width": width, "height": height}
+                del raw, extracted
+                images.append(PageImage(
+                    xref=xref,
+                    raw_hash=raw_digest.hexdigest(),
+                    phash=perceptual_hash(prepared["data"]),
+                    bbox=image_bbox(page, xref),
+                    pixels=pixel_stats(prepared["data"]),
+                    **prepared
+                ))
+            except Exception as e:
+                logger.info(f"Image extract failed (page {page_index + 1}, xref {xref}): {e}")
+
+        text = page.get_text()
+        yield PageContent(
+            page_number=page_index + 1,
+            text=text,
+            images=images,
+            content_hash=page_content_hash(text, image_digests)
+        )
+
+# --- PROCESS POOL ENTRY POINTS ---
+# These run in worker processes (see executors.run_cpu), so they take a file
+# path instead of a document handle and return plain picklable data.
+
+def get_page_count(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+def extract_page_range(pdf_path: str, start: int, end: int, min_image_edge: int = MIN_IMAGE_EDGE) -> List[PageContent]:
+    """Extracts pages [start, end) (0-based) from the PDF at pdf_path."""
+    with fitz.open(pdf_path) as doc:
+        return list(iter_pdf_pages(doc, min_image_edge=min_image_edge, start=start, end=end))
+
+# --- SHARDED EXTRACTION ---
+
+async def _extract_shard(pdf_path: str, start: int, end: int, budget: Optional[MemoryBudget], shard_bytes: int) -> List[PageContent]:
+    if budget is None:
+        return await run_cpu(extract_page_range, pdf_path, start, end)
+    reserved = await budget.acquire(shard_bytes)
+    try:
+        pages = await run_cpu(extract_page_range, pdf_path, start, end)
+    except BaseException:
+        budget.release(reserved)
+        raise
+    images = [image for page in pages for image in page["images"]]
+    budget.adjust(reserved, sum(len(image["data"]) for image in images))
+    for image in images:
+        image["reserved"] = len(image["data"])
+    return pages
+
+async def iter_page_shards(pdf_path: str, page_count: int, shard_pages: int, parallelism: int = INGEST_EXTRACT_PARALLELISM,
+                           budget: Optional[MemoryBudget] = None, shard_bytes: int = 0) -> AsyncIterator[List[PageContent]]:
+    """
+    Yields the pages of pdf_path in shards of shard_pages, in page order.
+    Up to `parallelism` shards are extracted at once across the process pool;
+    each worker opens the file by path and makes a single pass over its range.
+
+    With a budget, each shard reserves shard_bytes (an estimate) before it is
+    scheduled, so shards in flight count against it. Once extracted, the
+    reservation is resized to the shard's image bytes and every image carries
+    its share in image["reserved"]; the consumer releases it.
+    """
+    parallelism = max(1, parallelism)
+    starts = iter(range(0, page_count, shard_pages))
+    in_flight = deque()
+
+    def schedule():
+        for start in starts:
+            in_flight.append(asyncio.ensure_future(_extract_shard(pdf_path, start, start + shard_pages, budget, shard_bytes)))
+            if len(in_flight) >= parallelism:
+                break
+
+    schedule()
+    try:
+        while in_flight:
+            pages = await in_flight.popleft()
+            schedule()
+            yield pages
+    finally:
+        for future in in_flight:
+            future.cancel()
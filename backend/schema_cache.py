@@ -0,0 +1,123 @@
+"""
+Graph Schema Cache
+graph.refresh_schema() introspects the whole database with APOC / meta queries,
+often slower than the rest of chat retrieval. The formatted and structured
+schema are cached here and shared by chat and the KG query engine.
+
+The cache refreshes once GRAPH_SCHEMA_TTL_SECONDS have passed, or after a write
+path calls invalidate() (ingest, add_*_to_graph, work orders, maintenance
+history). Concurrent refreshes are coalesced: one caller queries Neo4j, the
+others wait for its result.
+
+    snapshot = schema_cache.get(graph)          # sync callers
+    snapshot = await schema_cache.aget(graph)   # event loop (refresh runs in a thread)
+    schema_cache.invalidate()                   # after a write
+    schema_cache.invalidate_if_new(labels, rel_types)   # after a bulk ingest write
+"""
+import os
+import time
+import asyncio
+import threading
+from typing import Any, Dict, Iterable, NamedTuple, Optional
+import logging
+logger = logging.getLogger("uvicorn")
+
+# --- CONFIGURATION ---
+GRAPH_SCHEMA_TTL_SECONDS = float(os.getenv("GRAPH_SCHEMA_TTL_SECONDS", "300"))
+
+class SchemaSnapshot(NamedTuple):
+    version: int                       # Bumped on every refresh
+    schema: str                        # graph.schema, as put in Cypher prompts
+    structured_schema: Dict[str, Any]  # graph.structured_schema
+
+class SchemaCache:
+    def __init__(self, ttl: float = GRAPH_SCHEMA_TTL_SECONDS):
+        self.ttl = ttl
+        self.hits = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self.refresh_seconds = 0.0
+        self._snapshot: Optional[SchemaSnapshot] = None
+        self._fetched_at = 0.0
+        self._epoch = 0          # Bumped by invalidate(); a refresh that overlaps a write stays stale
+        self._fresh_epoch = -1
+        self._lock = threading.Lock()
+        self._inflight: Optional[asyncio.Future] = None
+
+    def _is_fresh(self) -> bool:
+        return (
+            self._snapshot is not None
+            and self._fresh_epoch == self._epoch
+            and time.monotonic() - self._fetched_at < self.ttl
+        )
+
+    def invalidate(self):
+        self._epoch += 1
+        self.invalidations += 1
+
+    def invalidate_if_new(self, labels: Iterable[str], rel_types: Iterable[str]) -> bool:
+        """
+        invalidate() only if a write added a label or relationship type the cached
+        schema doesn't have. New properties on known labels wait for the TTL.
+        """
+        snapshot = self._snapshot
+        if snapshot is None:
+            return False
+        structured = snapshot.structured_schema
+        relationships = structured.get("relationships", [])
+        known_labels = set(structured.get("node_props", {}))
+        known_labels.update(r["start"] for r in relationships)
+        known_labels.update(r["end"] for r in relationships)
+        known_types = set(structured.get("rel_props", {}))
+        known_types.update(r["type"] for r in relationships)
+        if set(labels) <= known_labels and set(rel_types) <= known_types:
+            return False
+        self.invalidate()
+        return True
+
+    def get(self, graph) -> SchemaSnapshot:
+        """The cached schema, refreshing it from graph first if stale. Blocks."""
+        if self._is_fresh():
+            self.hits += 1
+            return self._snapshot
+        with self._lock:
+            # Another thread may have refreshed while we waited for the lock
+            if self._is_fresh():
+                self.hits += 1
+                return self._snapshot
+            epoch = self._epoch
+            started = time.monotonic()
+            graph.refresh_schema()
+            version = self._snapshot.version + 1 if self._snapshot else 1
+            self._snapshot = SchemaSnapshot(version, graph.schema, graph.structured_schema)
+            self._fetched_at = time.monotonic()
+            self._fresh_epoch = epoch
+            self.refreshes += 1
+            self.refresh_seconds += self._fetched_at - started
+            logger.info(f" > Graph schema refreshed (v{version}) in {self._fetched_at - started:.2f}s")
+            return self._snapshot
+
+    async def aget(self, graph) -> SchemaSnapshot:
+        """get() for the event loop; concurrent callers share one refresh."""
+        if self._is_fresh():
+            self.hits += 1
+            return self._snapshot
+        if self._inflight is None or self._inflight.done():
+            # asyncio's default executor, not the ingest I/O pool, so chat never queues behind ingest writes
+            self._inflight = asyncio.ensure_future(asyncio.to_thread(self.get, graph))
+        # Shielded so one cancelled chat doesn't cancel the refresh the others wait on
+        return await asyncio.shield(self._inflight)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "version": self._snapshot.version if self._snapshot else 0,
+            "fresh": self._is_fresh(),
+            "age_seconds": round(time.monotonic() - self._fetched_at, 1) if self._snapshot else None,
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "avg_refresh_seconds": round(self.refresh_seconds / self.refreshes, 3) if self.refreshes else 0.0
+        }
+
+# Singleton Instance
+schema_cache = SchemaCache()
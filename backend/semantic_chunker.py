@@ -0,0 +1,169 @@
+"""
+Vectorized Semantic Chunker
+Drop-in replacement for langchain_experimental's SemanticChunker
+(breakpoint_threshold_type="percentile") on the ingest path.
+
+Sentence windows from every document in a batch are embedded in one batched
+call, and cosine distances, percentile thresholds and breakpoints are computed
+with NumPy over each whole document. Chunks are then capped at max_tokens so
+they always fit the synthesis context budget.
+"""
+import os
+import re
+from typing import Callable, List
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+# --- CONFIGURATION ---
+SEMANTIC_BREAKPOINT_PERCENTILE = float(os.getenv("SEMANTIC_BREAKPOINT_PERCENTILE", "95"))
+SEMANTIC_CHUNK_MAX_TOKENS = int(os.getenv("SEMANTIC_CHUNK_MAX_TOKENS", "1000"))
+
+# Same sentence boundaries as SemanticChunker
+_SENTENCE_SPLIT = re.compile(r"(?<=[.?!])\s+")
+
+_encoding = None
+
+def count_tokens(text: str) -> int:
+    """Tokens as counted by the embedding model (text-embedding-3 uses cl100k_base)."""
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.get_encoding("cl100k_base")
+    return len(_encoding.encode_ordinary(text))
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text) if s.strip()]
+
+def sentence_windows(sentences: List[str], buffer_size: int = 1) -> List[str]:
+    """Each sentence joined with buffer_size neighbours on each side (what actually gets embedded)."""
+    return [
+        " ".join(sentences[max(0, i - buffer_size): i + buffer_size + 1])
+        for i in range(len(sentences))
+    ]
+
+def find_breakpoints(vectors: np.ndarray, percentile: float) -> np.ndarray:
+    """
+    Indices i where the cosine distance between windows i and i+1 is above the
+    document's percentile threshold; a chunk ends after sentence i.
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    unit = vectors / np.where(norms == 0, 1, norms)
+    distances = 1.0 - np.einsum("ij,ij->i", unit[:-1], unit[1:])
+    threshold = np.percentile(distances, percentile)
+    return np.flatnonzero(distances > threshold)
+
+class VectorizedSemanticChunker:
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        breakpoint_percentile: float = SEMANTIC_BREAKPOINT_PERCENTILE,
+        max_tokens: int = SEMANTIC_CHUNK_MAX_TOKENS,
+        buffer_size: int = 1,
+        batch_size: int = 2048,
+        length_function: Callable[[str], int] = count_tokens,
+    ):
+        self.embeddings = embeddings
+        self.breakpoint_percentile = breakpoint_percentile
+        self.max_tokens = max_tokens
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.length_function = length_function
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        """Chunks every document, copying its metadata onto each chunk."""
+        return [
+            Document(page_content=text, metadata=dict(doc.metadata))
+            for doc, texts in zip(documents, self.split_texts([d.page_content for d in documents]))
+            for text in texts
+        ]
+
+    def split_texts(self, texts: List[str]) -> List[List[str]]:
+        per_doc = [split_sentences(t) for t in texts]
+
+        # One batched embedding call for the windows of every multi-sentence document
+        windows, offsets = [], []
+        for sentences in per_doc:
+            offsets.append(len(windows))
+            if len(sentences) > 1:
+                windows.extend(sentence_windows(sentences, self.buffer_size))
+        vectors = np.asarray(self._embed(windows), dtype=np.float32) if windows else None
+
+        results = []
+        for sentences, start in zip(per_doc, offsets):
+            if len(sentences) > 1:
+                breaks = find_breakpoints(vectors[start:start + len(sentences)], self.breakpoint_percentile)
+                bounds = [0, *(breaks + 1).tolist(), len(sentences)]
+                groups = [sentences[a:b] for a, b in zip(bounds, bounds[1:])]
+            else:
+                groups = [sentences] if sentences else []
+            results.append([chunk for group in groups for chunk in self._cap(group)])
+        return results
+
+    def _embed(self, windows: List[str]) -> List[List[float]]:
+        vectors = []
+        for start in range(0, len(windows), self.batch_size):
+            vectors.extend(self.embeddings.embed_documents(windows[start:start + self.batch_size]))
+        return vectors
+
+    def _cap(self, sentences: List[str]) -> List[str]:
+        """Packs a semantic group's sentences into chunks of at most max_tokens."""
+        text = " ".join(sentences)
+        if self.length_function(text) <= self.max_tokens:
+            return [text]
+
+        chunks, current = [], []
+        for sentence in sentences:
+            if self.length_function(sentence) > self.max_tokens:
+                # A single runaway "sentence" (tables, part lists): split it by words
+                chunks.extend(self._pack(current))
+                current = []
+                chunks.extend(self._pack(sentence.split()))
+            else:
+                current.append(sentence)
+        chunks.extend(self._pack(current))
+        return chunks
+
+    def _pack(self, units: List[str]) -> List[str]:
+        """
+        Greedily joins units with single spaces into pieces of at most max_tokens.
+        Units start and end with non-space characters, so the tokenizer splits at
+        each joining space and a piece's size is the sum of its units' sizes
+        (every unit after the first counted with its leading space).
+        """
+        pieces, current, current_tokens = [], [], 0
+        for unit in units:
+            if self.length_function(unit) > self.max_tokens:
+                # No spaces to break at (URLs, base64, long table rows): cut it by length
+                if current:
+                    pieces.append(" ".join(current))
+                    current, current_tokens = [], 0
+                pieces.extend(self._hard_split(unit))
+                continue
+            tokens = self.length_function(" " + unit if current else unit)
+            if current and current_tokens + tokens > self.max_tokens:
+                pieces.append(" ".join(current))
+                current, tokens = [], self.length_function(unit)
+            current.append(unit)
+            current_tokens = tokens if len(current) == 1 else current_tokens + tokens
+        if current:
+            pieces.append(" ".join(current))
+        return pieces
+
+    def _hard_split(self, unit: str) -> List[str]:
+        """Cuts a unit into the longest prefixes of at most max_tokens (binary search on characters)."""
+        pieces = []
+        while unit:
+            if self.length_function(unit) <= self.max_tokens:
+                pieces.append(unit)
+                break
+            lo, hi = 1, len(unit) - 1   # lo always fits (one character), hi+1 doesn't
+            while lo < hi:
+                mid = (lo + hi + 1) // 2
+                if self.length_function(unit[:mid]) <= self.max_tokens:
+                    lo = mid
+                else:
+                    hi = mid - 1
+            pieces.append(unit[:lo])
+            unit = unit[lo:]
+        return pieces
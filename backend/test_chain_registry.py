@@ -0,0 +1,38 @@
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from chain_registry import ChainRegistry
+
+class TestChainRegistry(unittest.TestCase):
+
+    def test_built_once_per_version(self):
+        registry, built = ChainRegistry(), []
+
+        def build():
+            built.append(object())
+            return built[-1]
+
+        first = registry.get("chain", build, version=1)
+        self.assertIs(registry.get("chain", build, version=1), first)
+        second = registry.get("chain", build, version=2)
+        self.assertIsNot(second, first)
+        self.assertIs(registry.get("chain", build, version=2), second)
+        self.assertEqual(len(built), 2)
+        self.assertEqual(registry.stats()["builds"], {"chain": 2})
+
+    def test_concurrent_callers_share_one_build(self):
+        registry, built = ChainRegistry(), []
+
+        def build():
+            time.sleep(0.05)
+            built.append(object())
+            return built[-1]
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: registry.get("engine", build), range(8)))
+        self.assertEqual(len(built), 1)
+        self.assertTrue(all(r is built[0] for r in results))
+
+if __name__ == "__main__":
+    unittest.main()
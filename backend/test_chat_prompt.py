@@ -0,0 +1,30 @@
+import unittest
+
+from langchain_core.documents import Document
+from langchain_neo4j.graphs.graph_document import GraphDocument, Node
+from graph_writer import merge_graph_documents
+from agent import cypher_prompt
+
+class TestCypherPrompt(unittest.TestCase):
+
+    def render(self, machine):
+        return cypher_prompt.format(
+            schema="", query="Which parts wear out?", machine=machine,
+            valid_machines="Press", valid_labels="Part", relevant_ids="Ram"
+        )
+
+    def test_machine_filter_goes_through_the_source_document(self):
+        # The graph writer keeps provenance on the chunk's Document, not on the entities
+        rows = merge_graph_documents([GraphDocument(
+            nodes=[Node(id="Ram", type="Part")], relationships=[],
+            source=Document(page_content="The ram...", metadata={"id": "c1", "machinery": "Press"})
+        )])
+        self.assertEqual(rows["chunks"][0]["metadata"]["machinery"], "Press")
+        self.assertNotIn("machinery", rows["nodes"][0]["properties"])
+
+        prompt = self.render("Press")
+        self.assertIn("MATCH (d:Document {machinery: 'Press'})-[:MENTIONS]->(n)", prompt)
+        self.assertNotIn("Filter by `machinery` property", prompt)
+
+if __name__ == "__main__":
+    unittest.main()
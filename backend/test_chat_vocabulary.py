@@ -0,0 +1,78 @@
+import unittest
+from types import SimpleNamespace
+
+from chat_vocabulary import ChatVocabulary
+
+class FakeGraph:
+    def __init__(self, on_query=None):
+        self.queries = 0
+        self.on_query = on_query
+
+    def query(self, query, params=None):
+        self.queries += 1
+        if self.on_query:
+            self.on_query()
+        if "MENTIONS" in query:
+            return [{"machine": "Bench_Lathe", "ids": ["Chuck", "Tailstock"]}]
+        if "db.labels" in query:
+            return [{"value": l} for l in ["Document", "__Entity__", "Machinery", "Part"]]
+        if "n.machinery" in query:
+            return [{"value": "Bench_Lathe"}]
+        if "Machinery)--" in query:
+            return []
+        if "m:Machinery" in query:
+            return [{"value": "Bench_Lathe"}, {"value": "Press"}]
+        return [{"value": "Manual"}, {"value": "General"}]
+
+def node(type_, id_):
+    return SimpleNamespace(type=type_, id=id_)
+
+class TestChatVocabulary(unittest.TestCase):
+
+    def test_load_builds_prompt_context_and_filters(self):
+        vocab = ChatVocabulary()
+        vocab.load(FakeGraph())
+        context = vocab.schema_context("Bench_Lathe")
+        self.assertEqual(context["valid_machines"], "Bench_Lathe")
+        self.assertEqual(context["valid_labels"], "Machinery, Part")
+        self.assertEqual(context["relevant_ids"], "Chuck, Tailstock")
+        self.assertEqual(vocab.filters(), {"machinery": ["Bench_Lathe", "Press"], "sources": ["Manual"]})
+
+    def test_updates_are_visible_without_querying(self):
+        graph = FakeGraph()
+        vocab = ChatVocabulary(max_ids=3)
+        vocab.load(graph)
+        queries = graph.queries
+        vocab.schema_context("Drill")
+
+        source = SimpleNamespace(metadata={"machinery": "Drill"})
+        vocab.add_graph_documents([SimpleNamespace(
+            source=source,
+            nodes=[node("Motor", "Spindle_Motor"), node("Part", "Bit"), node("Part", "Chuck"), node("Part", "Guard")],
+            relationships=[SimpleNamespace(source=node("Motor", "Spindle_Motor"), target=node("Sensor", "Encoder"))]
+        )])
+        vocab.add_documents([{"machinery": "Drill", "manual_type": "Safety"}])
+        vocab.add_incident("Drill")
+
+        context = vocab.schema_context("Drill")
+        self.assertEqual(context["relevant_ids"], "Spindle_Motor, Bit, Chuck")
+        self.assertIn("Sensor", context["valid_labels"])
+        self.assertIn("Drill", context["valid_machines"])
+        self.assertEqual(vocab.filters()["sources"], ["Incident_History", "Manual", "Safety"])
+        self.assertIn("Drill", vocab.filters()["machinery"])
+        self.assertEqual(graph.queries, queries)
+
+    def test_updates_during_load_survive_it(self):
+        vocab = ChatVocabulary()
+        fired = []
+
+        def write_once():
+            if not fired:
+                fired.append(True)
+                vocab.add_machines(["Robot_Arm"])
+
+        vocab.load(FakeGraph(on_query=write_once))
+        self.assertIn("Robot_Arm", vocab.filters()["machinery"])
+
+if __name__ == "__main__":
+    unittest.main()
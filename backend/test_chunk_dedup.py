@@ -0,0 +1,73 @@
+import os
+import tempfile
+import unittest
+
+from chunk_dedup import ChunkDedupIndex, minhash, similarity
+
+WARRANTY = (
+    "The manufacturer warrants this equipment against defects in material and workmanship for a period of "
+    "twelve months from the date of installation. This warranty does not cover damage caused by improper use, "
+    "unauthorized modification, lack of maintenance or operation outside the rated load. Contact your service "
+    "representative before returning any part, and keep the original proof of purchase with the unit."
+)
+TORQUE = (
+    "Tighten the J2 axis reducer mounting bolts in a star pattern to 128 Nm using a calibrated torque wrench. "
+    "Apply thread locker to each bolt before installation and verify the final torque after the grease has "
+    "settled for ten minutes. Record the values in the maintenance log together with the reducer serial number."
+)
+
+class TestChunkDedup(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.index = ChunkDedupIndex(path=os.path.join(self.tmp_dir.name, "chunk_dedup.db"), threshold=0.7)
+
+    def tearDown(self):
+        self.index._conn.close()
+        self.tmp_dir.cleanup()
+
+    def store(self, chunks):
+        """What ingest_node does after a successful write."""
+        duplicates, signatures = self.index.find_duplicates(chunks)
+        self.index.add_canonical({cid: sig for cid, sig in signatures.items() if cid not in duplicates})
+        self.index.add_duplicates(duplicates)
+        return duplicates
+
+    def test_signature_similarity_tracks_text_overlap(self):
+        edited = WARRANTY.replace("twelve months", "24 months")
+        self.assertGreater(similarity(minhash(WARRANTY), minhash(edited)), 0.7)
+        self.assertLess(similarity(minhash(WARRANTY), minhash(TORQUE)), 0.2)
+        self.assertIsNone(minhash("Too short to compare."))
+
+    def test_near_duplicate_from_another_manual_links_to_canonical(self):
+        self.assertEqual(self.store([("a1", WARRANTY), ("a2", TORQUE)]), {})
+        duplicates = self.store([("b1", WARRANTY.replace("twelve months", "24 months")), ("b2", TORQUE.replace("J2", "J3").replace("128", "96"))])
+        self.assertEqual(list(duplicates), ["b1"])
+        self.assertEqual(duplicates["b1"][0], "a1")
+        self.assertEqual(self.index.stats()["duplicate_chunks"], 1)
+
+    def test_duplicates_within_one_batch(self):
+        duplicates = self.store([("a1", WARRANTY), ("a2", WARRANTY + " See page 4.")])
+        self.assertEqual({k: v[0] for k, v in duplicates.items()}, {"a2": "a1"})
+
+    def test_retiring_canonical_keeps_it_until_last_duplicate_goes(self):
+        self.store([("a1", WARRANTY)])
+        self.store([("b1", WARRANTY)])
+        # Manual A drops the chunk, but B's duplicate still points at it
+        self.assertEqual(self.index.retire(["a1"]), [])
+        # B drops its copy too: now the stored vectors can go
+        self.assertEqual(self.index.retire(["b1"]), ["a1"])
+        self.assertEqual(self.index.stats()["canonical_chunks"], 0)
+
+    def test_retiring_unshared_chunk_deletes_it(self):
+        self.store([("a1", WARRANTY)])
+        self.assertEqual(self.index.retire(["a1", "never-indexed"]), ["a1", "never-indexed"])
+
+    def test_reingested_orphan_is_not_its_own_duplicate(self):
+        self.store([("a1", WARRANTY)])
+        self.store([("b1", WARRANTY)])
+        self.index.retire(["a1"])
+        self.assertEqual(self.store([("a1", WARRANTY)]), {})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import os
+import tempfile
+import unittest
+
+from cypher_cache import CypherCache, normalize_question, validate_cypher
+
+SCHEMA = {
+    "node_props": {"Machinery": [], "Incident": []},
+    "rel_props": {},
+    "relationships": [{"start": "Machinery", "type": "HAS_INCIDENT", "end": "Incident"}]
+}
+CYPHER = "MATCH (m:Machinery {name: 'Press'})-[:HAS_INCIDENT]->(i:Incident) RETURN i ORDER BY i.date DESC LIMIT 1"
+
+class TestCypherValidation(unittest.TestCase):
+
+    def test_normalize_question(self):
+        self.assertEqual(normalize_question("  Torque spec for J2 on Fanuc R-2000iB?"), "torque spec for j2 on fanuc r-2000ib")
+
+    def test_valid_cypher_passes_and_directions_are_fixed(self):
+        self.assertEqual(validate_cypher(CYPHER, SCHEMA), CYPHER)
+        reversed_cypher = "MATCH (m:Machinery)<-[:HAS_INCIDENT]-(i:Incident) RETURN i"
+        self.assertEqual(validate_cypher(reversed_cypher, SCHEMA), "MATCH (m:Machinery)-[:HAS_INCIDENT]->(i:Incident) RETURN i")
+
+    def test_unknown_labels_and_relationships_fail(self):
+        self.assertIsNone(validate_cypher("MATCH (m:Machine) RETURN m", SCHEMA))
+        self.assertIsNone(validate_cypher("MATCH (m:Machinery)-[:REPAIRED_BY]->(t) RETURN t", SCHEMA))
+
+class TestCypherCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache = CypherCache(path=os.path.join(self.tmp.name, "cypher.db"), similarity=0.9)
+        self.cache.record_generation(2.0)
+
+    def tearDown(self):
+        self.cache._conn.close()
+        self.tmp.cleanup()
+
+    def test_exact_hit_on_normalized_question(self):
+        self.cache.put("Last overheating incident?", "Press", CYPHER, "v1", [1.0, 0.0])
+        self.assertEqual(self.cache.lookup_exact("last  OVERHEATING incident", "Press", "v1", SCHEMA), CYPHER)
+        self.assertIsNone(self.cache.lookup_exact("last overheating incident", "Lathe", "v1", SCHEMA))
+        stats = self.cache.stats()
+        self.assertEqual((stats["exact_hits"], stats["lookups"]), (1, 2))
+        self.assertEqual(stats["latency_saved_seconds"], 2.0)
+
+    def test_semantic_hit_requires_matching_identifiers(self):
+        self.cache.put("torque spec for J2", "Robot", CYPHER, "v1", [1.0, 0.0])
+        self.assertEqual(self.cache.lookup_similar("what is the J2 torque spec", "Robot", [0.99, 0.05], "v1", SCHEMA), CYPHER)
+        self.assertIsNone(self.cache.lookup_similar("torque spec for J3", "Robot", [1.0, 0.0], "v1", SCHEMA))
+        self.assertIsNone(self.cache.lookup_similar("how do I clean it", "Robot", [0.0, 1.0], "v1", SCHEMA))
+
+    def test_hit_counts_are_written_in_batches(self):
+        self.cache.put("last incident", "Press", CYPHER, "v1", [1.0, 0.0])
+        for _ in range(3):
+            self.cache.lookup_exact("last incident", "Press", "v1", SCHEMA)
+        stored = lambda: self.cache._conn.execute("SELECT hits FROM cypher_cache").fetchone()[0]
+        self.assertEqual(stored(), 0)   # Buffered, no write per hit
+        self.cache.stats()
+        self.assertEqual(stored(), 3)
+
+    def test_hit_for_old_schema_is_revalidated(self):
+        self.cache.put("last incident", "Press", CYPHER, "v1", [1.0, 0.0])
+        self.assertEqual(self.cache.lookup_exact("last incident", "Press", "v2", SCHEMA), CYPHER)
+        self.assertEqual(self.cache.stats()["revalidated"], 1)
+
+        changed = {"node_props": {"Machinery": []}, "rel_props": {}, "relationships": []}
+        self.assertIsNone(self.cache.lookup_exact("last incident", "Press", "v3", changed))
+        self.assertEqual(self.cache.stats()["entries"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
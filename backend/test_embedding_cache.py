@@ -0,0 +1,76 @@
+import os
+import tempfile
+import unittest
+
+from langchain_core.embeddings import Embeddings
+from embedding_cache import EmbeddingCache, CachedEmbeddings, text_hash
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic fake model that records every text it is asked to embed."""
+    model = "fake-embedding"
+
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts, **kwargs):
+        self.calls.extend(texts)
+        return [[float(len(t)), 0.5, -0.25] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "embedding_cache.db")
+        self.cache = EmbeddingCache(path=self.path, max_bytes=1000, memory_bytes=12)
+        self.model = CountingEmbeddings()
+        self.embeddings = CachedEmbeddings(self.model, self.cache)
+
+    def tearDown(self):
+        self.cache._conn.close()
+        self.tmp_dir.cleanup()
+
+    def test_repeated_text_is_embedded_once(self):
+        first = self.embeddings.embed_documents(["Torque J2 to 45 Nm", "Lock out power", "Torque J2 to 45 Nm"])
+        second = self.embeddings.embed_query("Lock out power")
+
+        self.assertEqual(self.model.calls, ["Torque J2 to 45 Nm", "Lock out power"])
+        self.assertEqual(first[0], first[2])
+        self.assertEqual(second, first[1])
+        stats = self.cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 2))
+
+    def test_vectors_are_float16_rounded_consistently(self):
+        fresh = self.embeddings.embed_query("x" * 3)
+        cached = self.embeddings.embed_query("x" * 3)
+        self.assertEqual(fresh, cached)
+        self.assertEqual(fresh, [3.0, 0.5, -0.25])
+
+    def test_persists_across_instances(self):
+        self.embeddings.embed_query("Replace the J3 encoder battery")
+        reopened = EmbeddingCache(path=self.path, max_bytes=1000)
+        try:
+            found = reopened.get_many("fake-embedding", [text_hash("Replace the J3 encoder battery")])
+            self.assertEqual(len(found), 1)
+            self.assertEqual(reopened.get_many("other-model", [text_hash("Replace the J3 encoder battery")]), {})
+        finally:
+            reopened._conn.close()
+
+    def test_size_based_eviction_drops_least_recently_used(self):
+        # Each 3-dim float16 vector is 6 bytes
+        cache = EmbeddingCache(path=os.path.join(self.tmp_dir.name, "small.db"), max_bytes=12, memory_bytes=0)
+        try:
+            cache.put_many("m", {"a": [1.0] * 3, "b": [2.0] * 3})
+            cache.get_many("m", ["a"])  # "a" is now the most recently used
+            cache.put_many("m", {"c": [3.0] * 3})
+
+            self.assertEqual(set(cache.get_many("m", ["a", "b", "c"])), {"a", "c"})
+            self.assertEqual(cache.stats()["evictions"], 1)
+            self.assertLessEqual(cache.stats()["bytes"], 12)
+        finally:
+            cache._conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+import unittest
+
+from langchain_core.documents import Document
+from langchain_neo4j.graphs.graph_document import GraphDocument, Node, Relationship
+import graph_writer
+import graph_schema
+from graph_writer import merge_graph_documents, schema_elements, write_graph_documents
+
+def extracted(chunk_id, parts, related=()):
+    """GraphDocument for one chunk mentioning the given part names."""
+    source = Document(page_content=f"chunk {chunk_id}", metadata={
+        "id": chunk_id, "doc_id": "R2000iB_Service_Manual", "machinery": "R2000iB", "manual_type": "Service_Manual"
+    })
+    nodes = [Node(id=p, type="Part") for p in parts]
+    rels = [Relationship(source=Node(id=a, type="Part"), target=Node(id=b, type="Part"), type="part of") for a, b in related]
+    return GraphDocument(nodes=nodes, relationships=rels, source=source)
+
+class RecordingGraph:
+    def __init__(self):
+        self.queries = []
+
+    def query(self, query, params=None):
+        self.queries.append((query, params))
+        return []
+
+class TestGraphWriter(unittest.TestCase):
+
+    def setUp(self):
+        graph_writer._schema_ready = True
+
+    def test_entities_are_merged_across_chunks(self):
+        rows = merge_graph_documents([
+            extracted("c1", ["J2 Gearbox", "J2 Motor"], related=[("J2 Motor", "J2 Gearbox")]),
+            extracted("c2", ["J2 Gearbox"], related=[("J2 Motor", "J2 Gearbox")]),
+        ])
+        self.assertEqual(len(rows["chunks"]), 2)
+        self.assertEqual(len(rows["nodes"]), 2)
+        self.assertEqual(len(rows["mentions"]), 3)
+        self.assertEqual(len(rows["relationships"]), 1)
+        self.assertEqual(rows["relationships"][0]["type"], "PART_OF")
+
+    def test_provenance_is_on_the_chunk_not_the_entities(self):
+        rows = merge_graph_documents([extracted("c1", ["J2 Gearbox"])])
+        self.assertEqual(rows["nodes"][0]["properties"], {})
+        self.assertEqual(rows["chunks"][0]["metadata"]["doc_id"], "R2000iB_Service_Manual")
+        self.assertNotIn("id", rows["chunks"][0]["metadata"])
+        self.assertNotIn("text", rows["chunks"][0])   # DocumentChunk and Chroma hold the text
+
+    def test_relationship_endpoints_missing_from_nodes_are_created(self):
+        rows = merge_graph_documents([extracted("c1", [], related=[("Brake", "J3 Axis")])])
+        self.assertEqual({n["id"] for n in rows["nodes"]}, {"Brake", "J3 Axis"})
+        self.assertEqual(rows["mentions"], [])
+
+    def test_schema_elements(self):
+        self.assertEqual(schema_elements([]), (set(), set()))
+        labels, rel_types = schema_elements([extracted("c1", ["Brake"], related=[("Brake", "J3 Axis")])])
+        self.assertEqual(labels, {"Document", "Part"})
+        self.assertEqual(rel_types, {"MENTIONS", "PART_OF"})
+
+    def test_statements_scale_with_batches_not_chunks(self):
+        graph = RecordingGraph()
+        docs = [extracted(f"c{i}", [f"Bolt {i}", "J2 Gearbox"], related=[(f"Bolt {i}", "J2 Gearbox")]) for i in range(250)]
+        stats = write_graph_documents(graph, docs, batch_size=100)
+        # chunks 250 -> 3, nodes 251 -> 3, mentions 500 -> 5, relationships 250 -> 3
+        self.assertEqual(stats["statements"], 14)
+        self.assertEqual(len(graph.queries), 14)
+        self.assertTrue(all(len(params["rows"]) <= 100 for _, params in graph.queries))
+
+class TestGraphSchema(unittest.TestCase):
+
+    def setUp(self):
+        graph_schema._bootstrapped = False
+
+    def tearDown(self):
+        graph_schema._bootstrapped = False
+
+    def test_duplicate_data_falls_back_to_an_index(self):
+        class DuplicateTasksGraph(RecordingGraph):
+            def query(self, query, params=None):
+                if "task_title" in query and "CONSTRAINT" in query:
+                    raise RuntimeError("Node(12) already exists with label `Task` and property `title`")
+                return super().query(query, params)
+
+        graph = DuplicateTasksGraph()
+        graph_schema.bootstrap_schema(graph)
+        statements = [q for q, _ in graph.queries]
+        self.assertIn("CREATE INDEX task_title_index IF NOT EXISTS FOR (n:`Task`) ON (n.`title`)", statements)
+        self.assertIn("CREATE INDEX document_chunk_doc_id IF NOT EXISTS FOR (n:`DocumentChunk`) ON (n.`doc_id`)", statements)
+
+        graph_schema.bootstrap_schema(graph)  # Only once per process
+        self.assertEqual(len(graph.queries), len(statements))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import fitz  # PyMuPDF
+from image_cache import ImageDescriptionCache, image_hash
+from image_dedup import PhashIndex, perceptual_hash, hamming_distance
+
+def render_diagram(width, height, callout_x=None):
+    """PNG bytes of a simple two-tone 'diagram', optionally with a small callout box."""
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, width, height), 0)
+    pix.clear_with(255)
+    pix.set_rect(fitz.IRect(0, 0, width // 2, height // 3), (20, 20, 20))
+    pix.set_rect(fitz.IRect(width // 3, height // 2, width, height), (90, 90, 90))
+    if callout_x is not None:
+        pix.set_rect(fitz.IRect(callout_x, 5, callout_x + width // 40, 5 + height // 40), (0, 0, 0))
+    return pix.tobytes("png")
+
+class TestImageDescriptionCache(unittest.TestCase):
+
+    def setUp(self):
+        """Fresh cache file for every test"""
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "vision_cache.db")
+        self.cache = ImageDescriptionCache(path=self.path, max_bytes=1000)
+
+    def tearDown(self):
+        self.cache._conn.close()
+        self.tmp_dir.cleanup()
+
+    def test_hit_and_miss_counters(self):
+        key = image_hash(b"exploded-diagram")
+        self.assertIsNone(self.cache.get(key, "gpt-4o"))
+        self.cache.put(key, "gpt-4o", "Exploded view of the J2 gearbox.")
+
+        self.assertEqual(self.cache.get(key, "gpt-4o"), "Exploded view of the J2 gearbox.")
+        stats = self.cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 1)
+        self.assertEqual(stats["entries"], 1)
+
+    def test_model_change_is_a_miss(self):
+        key = image_hash(b"wiring-chart")
+        self.cache.put(key, "gpt-4o", "Wiring chart.")
+        self.assertIsNone(self.cache.get(key, "gpt-4o-mini"))
+
+    def test_models_keep_separate_descriptions(self):
+        key = image_hash(b"wiring-chart")
+        self.cache.put(key, "gpt-4o", "Wiring chart.")
+        self.cache.put(key, "gpt-4o-mini", "A chart.")
+        self.assertEqual(self.cache.get(key, "gpt-4o"), "Wiring chart.")
+        self.assertEqual(self.cache.get(key, "gpt-4o-mini"), "A chart.")
+
+    def test_migrates_store_keyed_by_hash_only(self):
+        self.cache._conn.close()
+        legacy_path = os.path.join(self.tmp_dir.name, "legacy.db")
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("CREATE TABLE image_descriptions (image_hash TEXT PRIMARY KEY, model TEXT, description TEXT, size INTEGER, last_used REAL)")
+        conn.execute("INSERT INTO image_descriptions VALUES ('abc', 'gpt-4o', 'Pump diagram.', 13, 1.0)")
+        conn.commit()
+        conn.close()
+
+        self.cache = ImageDescriptionCache(path=legacy_path, max_bytes=1000)
+        self.assertEqual(self.cache.get("abc", "gpt-4o"), "Pump diagram.")
+        self.cache.put("abc", "gpt-4o-mini", "Pump.")
+        self.assertEqual(self.cache.get("abc", "gpt-4o"), "Pump diagram.")
+
+    def test_persists_across_instances(self):
+        key = image_hash(b"safety-pictogram")
+        self.cache.put(key, "gpt-4o", "Pinch point warning.")
+        reopened = ImageDescriptionCache(path=self.path, max_bytes=1000)
+        try:
+            self.assertEqual(reopened.get(key, "gpt-4o"), "Pinch point warning.")
+        finally:
+            reopened._conn.close()
+
+    def test_size_based_eviction_drops_least_recently_used(self):
+        old_key, new_key, last_key = image_hash(b"a"), image_hash(b"b"), image_hash(b"c")
+        self.cache.put(old_key, "gpt-4o", "x" * 400)
+        self.cache.put(new_key, "gpt-4o", "y" * 400)
+        self.cache.get(old_key, "gpt-4o")  # old_key is now the most recently used
+        self.cache.put(last_key, "gpt-4o", "z" * 400)
+
+        self.assertIsNone(self.cache.get(new_key, "gpt-4o"))
+        self.assertIsNotNone(self.cache.get(old_key, "gpt-4o"))
+        self.assertLessEqual(self.cache.stats()["bytes"], 1000)
+        self.assertEqual(self.cache.stats()["evictions"], 1)
+
+class TestNearDuplicateImages(unittest.TestCase):
+
+    def test_resized_diagram_with_new_callout_hashes_close(self):
+        original = perceptual_hash(render_diagram(800, 600))
+        variant = perceptual_hash(render_diagram(400, 300, callout_x=300))
+        self.assertIsNotNone(original)
+        self.assertLessEqual(hamming_distance(original, variant), 6)
+
+    def test_undecodable_image_has_no_hash(self):
+        self.assertIsNone(perceptual_hash(b"not an image"))
+
+    def test_index_finds_within_distance_only(self):
+        index = PhashIndex(max_distance=6)
+        index.add(0xF0F0F0F0F0F0F0F0, "diagram-a")
+        self.assertEqual(index.find(0xF0F0F0F0F0F0F0F3), "diagram-a")   # 2 bits off
+        self.assertIsNone(index.find(0x0F0F0F0F0F0F0F0F))               # inverted
+
+    def test_corpus_near_hit_reuses_description(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = ImageDescriptionCache(path=os.path.join(tmp_dir, "c.db"), corpus_dedup=True)
+            try:
+                cache.put(image_hash(b"rev-a"), "gpt-4o", "Wiring chart, rev A.", phash=0xABCDEF0123456789)
+                self.assertIsNone(cache.get(image_hash(b"rev-b"), "gpt-4o"))
+                self.assertEqual(cache.get_similar(0xABCDEF0123456788, "gpt-4o"), "Wiring chart, rev A.")
+                stats = cache.stats()
+                self.assertEqual((stats["near_hits"], stats["misses"]), (1, 0))
+            finally:
+                cache._conn.close()
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+import fitz  # PyMuPDF
+from image_triage import ImageTriage, pixel_stats, score_image
+
+def render(noisy=False, flat=False):
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 256, 256), 0)
+    pix.clear_with(255)
+    if flat:
+        return pix.tobytes("png")
+    if noisy:
+        # Photo-like: many distinct gray levels
+        for i in range(256):
+            pix.set_rect(fitz.IRect(i, 0, i + 1, 256), (i, (i * 7) % 256, (i * 13) % 256))
+    else:
+        # Line art: a few dark strokes on white
+        pix.set_rect(fitz.IRect(20, 20, 236, 30), (0, 0, 0))
+        pix.set_rect(fitz.IRect(120, 20, 130, 236), (0, 0, 0))
+    return pix.tobytes("png")
+
+def image(data, bbox=(0.1, 0.3, 0.9, 0.7), phash=None):
+    return {"xref": 1, "data": data, "phash": phash, "bbox": bbox, "pixels": pixel_stats(data)}
+
+class TestImageTriage(unittest.TestCase):
+
+    def test_pixel_stats_separate_blank_line_art_and_photos(self):
+        blank, line_art, photo = pixel_stats(render(flat=True)), pixel_stats(render()), pixel_stats(render(noisy=True))
+        self.assertLess(blank["stddev"], 1)
+        self.assertGreater(line_art["stddev"], 20)
+        self.assertLess(line_art["entropy"], photo["entropy"])
+
+    def test_diagram_in_body_is_kept(self):
+        score, reasons = score_image(image(render()), page_number=5, text_chars=1500, repeat_pages=1)
+        self.assertEqual((score, reasons), (1.0, []))
+
+    def test_full_page_scan_with_text_layer_is_skipped(self):
+        score, reasons = score_image(image(render(), bbox=(0, 0, 1, 1)), page_number=5, text_chars=1500, repeat_pages=1)
+        self.assertIn("text_layer_scan", reasons)
+        self.assertLess(score, 0.5)
+
+    def test_scan_without_text_layer_is_kept(self):
+        score, _ = score_image(image(render(), bbox=(0, 0, 1, 1)), page_number=5, text_chars=0, repeat_pages=1)
+        self.assertEqual(score, 1.0)
+
+    def test_repeated_header_banner_is_skipped_from_the_third_page(self):
+        triage = ImageTriage(min_score=0.5)
+        banner = image(render(), bbox=(0.05, 0.01, 0.95, 0.08), phash=0xF0F0)
+        kept = [len(triage.filter_page({"page_number": n, "text": "text", "images": [banner]})) for n in (1, 2, 3, 4)]
+        self.assertEqual(kept, [1, 1, 0, 0])
+        self.assertEqual(triage.reasons, {"margin_banner": 2, "repeated": 2})
+
+    def test_blank_image_is_skipped(self):
+        triage = ImageTriage(min_score=0.5)
+        page = {"page_number": 3, "text": "", "images": [image(render(flat=True))]}
+        self.assertEqual(triage.filter_page(page), [])
+
+    def test_disabled_triage_keeps_everything(self):
+        triage = ImageTriage(enabled=False)
+        page = {"page_number": 3, "text": "", "images": [image(render(flat=True))]}
+        self.assertEqual(len(triage.filter_page(page)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
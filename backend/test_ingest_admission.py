@@ -0,0 +1,78 @@
+import asyncio
+import unittest
+
+from ingest_admission import AdmissionController, AdmissionRejected
+
+class TestAdmissionController(unittest.TestCase):
+
+    def test_slots_bound_concurrent_ingests(self):
+        async def scenario():
+            admission = AdmissionController(slots=2, tenant_slots=2, max_waiting=10, tenant_max_waiting=10)
+            tickets = [admission.enqueue("a") for _ in range(3)]
+            await asyncio.sleep(0)
+            admitted = [t.future.done() for t in tickets]
+            depth = admission.stats()["queue_depth"]
+            admission.release(tickets[0])
+            await asyncio.wait_for(admission.wait(tickets[2]), timeout=1)
+            return admitted, depth, admission.active
+
+        self.assertEqual(asyncio.run(scenario()), ([True, True, False], 1, 2))
+
+    def test_waiting_tenants_are_served_round_robin(self):
+        async def scenario():
+            admission = AdmissionController(slots=1, tenant_slots=1, max_waiting=10, tenant_max_waiting=10)
+            current = admission.enqueue("bulk")
+            admitted = []
+            for tenant in ("bulk", "bulk", "bulk", "chat-team", "ops"):
+                ticket = admission.enqueue(tenant)
+                ticket.future.add_done_callback(lambda _, t=ticket: admitted.append(t))
+            while True:
+                admission.release(current)
+                await asyncio.sleep(0)
+                if not admitted or admitted[-1] is current:
+                    return [t.tenant for t in admitted]
+                current = admitted[-1]
+
+        self.assertEqual(asyncio.run(scenario()), ["bulk", "chat-team", "ops", "bulk", "bulk"])
+
+    def test_tenant_slot_limit(self):
+        async def scenario():
+            admission = AdmissionController(slots=3, tenant_slots=1, max_waiting=10, tenant_max_waiting=10)
+            a1, a2, b1 = admission.enqueue("a"), admission.enqueue("a"), admission.enqueue("b")
+            return a1.future.done(), a2.future.done(), b1.future.done()
+
+        self.assertEqual(asyncio.run(scenario()), (True, False, True))
+
+    def test_full_queues_reject_uploads(self):
+        async def scenario():
+            admission = AdmissionController(slots=1, tenant_slots=1, max_waiting=3, tenant_max_waiting=1)
+            admission.enqueue("a")           # admitted
+            admission.enqueue("a")           # waiting
+            with self.assertRaises(AdmissionRejected):
+                admission.enqueue("a")       # tenant queue full
+            admission.enqueue("b")
+            admission.enqueue("c")
+            with self.assertRaises(AdmissionRejected):
+                admission.enqueue("d")       # global queue full
+            admission.enqueue("d", enforce_limits=False)   # bulk batches bound their own backlog
+            return admission.stats()
+
+        stats = asyncio.run(scenario())
+        self.assertEqual((stats["rejected"], stats["queue_depth"]), (2, 4))
+
+    def test_cancelled_waiter_gives_up_its_place(self):
+        async def scenario():
+            admission = AdmissionController(slots=1, tenant_slots=1, max_waiting=10, tenant_max_waiting=10)
+            running = admission.enqueue("a")
+            queued = admission.enqueue("b")
+            waiter = asyncio.ensure_future(admission.wait(queued))
+            await asyncio.sleep(0)
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            admission.release(running)
+            return admission.active, admission.stats()["queue_depth"]
+
+        self.assertEqual(asyncio.run(scenario()), (0, 0))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+
+from ingest_manifest import IngestManifest, manual_key, chunk_id, EXTRACT, VECTOR
+
+class TestIngestManifest(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.manifest = IngestManifest(path=os.path.join(self.tmp_dir.name, "manifest.db"))
+        self.key = manual_key("Fanuc_R2000iB", "Service_Manual", "r2000ib.pdf")
+
+    def tearDown(self):
+        self.manifest._conn.close()
+        self.tmp_dir.cleanup()
+
+    def test_chunk_ids_are_stable_and_kind_specific(self):
+        self.assertEqual(chunk_id("doc", "Torque J2 to 45 Nm", EXTRACT), chunk_id("doc", "Torque J2 to 45 Nm", EXTRACT))
+        self.assertNotEqual(chunk_id("doc", "Torque J2 to 45 Nm", EXTRACT), chunk_id("doc", "Torque J2 to 45 Nm", VECTOR))
+
+    def test_page_hashes_round_trip(self):
+        self.manifest.record_pages(self.key, {1: "a", 2: "b"})
+        self.assertEqual(self.manifest.get_page_hashes(self.key), {1: "a", 2: "b"})
+        self.assertEqual(self.manifest.get_page_hashes(manual_key("Other", "Service_Manual", "r2000ib.pdf")), {})
+
+    def test_replacing_a_window_returns_stale_chunks(self):
+        self.manifest.replace_window_chunks(self.key, VECTOR, 1, 10, ["c1", "c2"])
+        stale = self.manifest.replace_window_chunks(self.key, VECTOR, 1, 10, ["c2", "c3"])
+        self.assertEqual(stale, {"c1"})
+        self.assertEqual(self.manifest.get_chunk_ids(self.key), {"c2", "c3"})
+
+    def test_chunk_shared_with_another_window_is_not_retired(self):
+        self.manifest.replace_window_chunks(self.key, VECTOR, 1, 10, ["boilerplate", "a"])
+        self.manifest.replace_window_chunks(self.key, VECTOR, 11, 20, ["boilerplate", "b"])
+        stale = self.manifest.replace_window_chunks(self.key, VECTOR, 1, 10, ["a2"])
+        self.assertEqual(stale, {"a"})
+
+    def test_truncate_retires_chunks_of_removed_pages(self):
+        self.manifest.record_pages(self.key, {1: "a", 11: "b"})
+        self.manifest.replace_window_chunks(self.key, EXTRACT, 1, 10, ["e1"])
+        self.manifest.replace_window_chunks(self.key, EXTRACT, 11, 20, ["e2"])
+        stale = self.manifest.truncate(self.key, 10)
+        self.assertEqual(stale, {EXTRACT: {"e2"}, VECTOR: set()})
+        self.assertEqual(self.manifest.get_page_hashes(self.key), {1: "a"})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,92 @@
+import asyncio
+import unittest
+
+from ingest_memory import MemoryBudget
+
+class TestMemoryBudget(unittest.TestCase):
+
+    def test_acquire_waits_until_bytes_are_released(self):
+        async def scenario():
+            budget = MemoryBudget(100)
+            await budget.acquire(80)
+            waiter = asyncio.ensure_future(budget.acquire(50))
+            await asyncio.sleep(0.01)
+            blocked = not waiter.done()
+            budget.release(80)
+            granted = await asyncio.wait_for(waiter, timeout=1)
+            return blocked, granted, budget.used, budget.stats()["waits"]
+
+        blocked, granted, used, waits = asyncio.run(scenario())
+        self.assertTrue(blocked)
+        self.assertEqual(granted, 50)
+        self.assertEqual(used, 50)
+        self.assertEqual(waits, 1)
+
+    def test_oversized_item_is_clamped_and_runs_alone(self):
+        async def scenario():
+            budget = MemoryBudget(100)
+            granted = await asyncio.wait_for(budget.acquire(500), timeout=1)
+            return granted, budget.used
+
+        self.assertEqual(asyncio.run(scenario()), (100, 100))
+
+    def test_request_budget_is_bounded_by_global_budget(self):
+        async def scenario():
+            shared = MemoryBudget(100)
+            first, second = shared.child(80), shared.child(80)
+            await first.acquire(70)
+            waiter = asyncio.ensure_future(second.acquire(50))
+            await asyncio.sleep(0.01)
+            blocked = not waiter.done()
+            first.release(70)
+            await asyncio.wait_for(waiter, timeout=1)
+            return blocked, shared.used, first.used, second.used
+
+        self.assertEqual(asyncio.run(scenario()), (True, 50, 0, 50))
+
+    def test_close_returns_reservations_to_parent(self):
+        async def scenario():
+            shared = MemoryBudget(100)
+            request = shared.child(100)
+            await request.acquire(60)
+            request.close()
+            request.release(60)   # Late release after a cancelled ingest is ignored
+            return shared.used
+
+        self.assertEqual(asyncio.run(scenario()), 0)
+
+    def test_close_while_waiting_on_parent_returns_only_granted_bytes(self):
+        async def scenario():
+            shared = MemoryBudget(100)
+            other, request = shared.child(100), shared.child(100)
+            await other.acquire(80)
+            await request.acquire(10)
+            waiter = asyncio.ensure_future(request.acquire(50))   # Counted by request, waiting on shared
+            await asyncio.sleep(0.01)
+            request.close()
+            closed = shared.used
+            waiter.cancel()
+            await asyncio.gather(waiter, return_exceptions=True)
+            other.release(80)
+            return closed, shared.used
+
+        self.assertEqual(asyncio.run(scenario()), (80, 0))
+
+    def test_adjust_resizes_a_reservation_without_waiting(self):
+        async def scenario():
+            shared = MemoryBudget(100)
+            request = shared.child(100)
+            reserved = await request.acquire(40)
+            reserved = request.adjust(reserved, 130)   # Already in memory: counted, not waited for
+            grown = (request.used, shared.used)
+            waiter = asyncio.ensure_future(request.acquire(10))
+            await asyncio.sleep(0.01)
+            blocked = not waiter.done()
+            request.adjust(reserved, 20)
+            await asyncio.wait_for(waiter, timeout=1)
+            return grown, blocked, request.used, shared.used
+
+        self.assertEqual(asyncio.run(scenario()), ((130, 130), True, 30, 30))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,34 @@
+import unittest
+from unittest.mock import AsyncMock, patch
+
+from langchain_core.documents import Document
+import agent
+
+class TestIngestWorkflow(unittest.IsolatedAsyncioTestCase):
+
+    @patch("agent.schema_cache")
+    @patch("agent.chat_vocabulary")
+    @patch("agent.link_duplicate_chunks")
+    @patch("agent.chunk_dedup")
+    @patch("agent.semantic_splitter")
+    @patch("agent.CHUNK_DEDUP_ENABLED", True)
+    @patch("agent._extract_chunk", new_callable=AsyncMock, return_value=None)
+    @patch("agent.TokenTextSplitter")
+    async def test_stats_survive_the_compiled_graph(self, token_splitter, _extract, splitter, dedup, link_duplicates, _vocab, _schema):
+        metadata = {"doc_id": "Press_Manual_1", "machinery": "Press", "manual_type": "Manual"}
+        token_splitter.return_value.split_documents.side_effect = lambda docs: docs
+        splitter.split_documents.return_value = [Document(page_content="Wear safety glasses.", metadata=metadata)]
+        dedup.find_duplicates.side_effect = lambda chunks: ({cid: ("canonical_chunk", 0.97) for cid, _ in chunks}, {})
+
+        # Run through graph_workflow, not ingest_node: state keys GraphState doesn't declare are dropped
+        result = await agent.graph_workflow.ainvoke({
+            "documents": [Document(page_content="Wear safety glasses.", metadata=dict(metadata))],
+            "known_chunk_ids": []
+        })
+
+        self.assertEqual(result["chunks_deduplicated"], 1)
+        self.assertEqual(result["vectors_written"], 0)
+        link_duplicates.assert_called_once()
+
+if __name__ == "__main__":
+    unittest.main()
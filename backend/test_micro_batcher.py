@@ -0,0 +1,44 @@
+import asyncio
+import unittest
+
+from micro_batcher import MicroBatcher
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_concurrent_requests_share_one_batch(self):
+        calls = []
+
+        def double(items):
+            calls.append(list(items))
+            return [i * 2 for i in items]
+
+        async def scenario():
+            batcher = MicroBatcher(double, max_batch=100, max_wait=0.05)
+            results = await asyncio.gather(batcher.submit([1, 2]), batcher.submit([3]), batcher.submit([4, 5, 6]))
+            return batcher, results
+
+        batcher, results = asyncio.run(scenario())
+        self.assertEqual(results, [[2, 4], [6], [8, 10, 12]])
+        self.assertEqual(calls, [[1, 2, 3, 4, 5, 6]])
+        self.assertEqual(batcher.stats()["avg_batch_size"], 6.0)
+
+    def test_full_batch_is_sent_without_waiting(self):
+        async def scenario():
+            batcher = MicroBatcher(lambda items: items, max_batch=3, max_wait=60)
+            return await asyncio.wait_for(batcher.submit(["a", "b", "c"]), timeout=5)
+
+        self.assertEqual(asyncio.run(scenario()), ["a", "b", "c"])
+
+    def test_failure_reaches_every_caller_in_the_batch(self):
+        def broken(items):
+            raise RuntimeError("Neo4j unavailable")
+
+        async def scenario():
+            batcher = MicroBatcher(broken, max_batch=10, max_wait=0.01)
+            return await asyncio.gather(batcher.submit([1]), batcher.submit([2]), return_exceptions=True)
+
+        results = asyncio.run(scenario())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import os
+import hashlib
+import asyncio
+import tempfile
+import unittest
+
+import fitz  # PyMuPDF
+from executors import shutdown_pools
+from ingest_memory import MemoryBudget
+from pdf_extract import extract_page_range, iter_page_shards
+
+def write_manual(path, pages):
+    """A PDF whose page i says 'page i'; page 2 also carries a large diagram in its top half."""
+    doc = fitz.open()
+    for i in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"page {i + 1}")
+        if i == 1:
+            pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 600, 400), 0)
+            pix.clear_with(90)
+            page.insert_image(fitz.Rect(0, 0, page.rect.width, page.rect.height / 2), stream=pix.tobytes("png"))
+    doc.save(path)
+
+class TestPdfExtract(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "manual.pdf")
+        write_manual(self.path, 23)
+
+    def tearDown(self):
+        shutdown_pools()
+        self.tmp_dir.cleanup()
+
+    def test_image_metadata(self):
+        page = extract_page_range(self.path, 1, 2)[0]
+        image = page["images"][0]
+        self.assertEqual((image["width"], image["height"]), (600, 400))
+        self.assertEqual(image["mime"], "image/png")
+        x0, y0, x1, y1 = image["bbox"]
+        self.assertTrue(0 <= y0 < y1 <= 0.5)
+        with fitz.open(self.path) as doc:
+            raw = doc.extract_image(image["xref"])["image"]
+        self.assertEqual(image["raw_hash"], hashlib.sha256(raw).hexdigest())   # Not the prepared bytes
+
+    def test_shards_are_yielded_in_page_order(self):
+        async def collect():
+            return [pages async for pages in iter_page_shards(self.path, 23, shard_pages=5, parallelism=3)]
+
+        shards = asyncio.run(collect())
+        self.assertEqual([len(s) for s in shards], [5, 5, 5, 5, 3])
+        numbers = [p["page_number"] for shard in shards for p in shard]
+        self.assertEqual(numbers, list(range(1, 24)))
+        self.assertTrue(all(f"page {p['page_number']}" in p["text"] for shard in shards for p in shard))
+
+    def test_shards_reserve_budget_before_extraction(self):
+        async def collect():
+            budget = MemoryBudget(1000)
+            reservations = []
+            async for pages in iter_page_shards(self.path, 23, shard_pages=5, parallelism=3, budget=budget, shard_bytes=1000):
+                images = [image for page in pages for image in page["images"]]
+                reservations.append((budget.used, [(image["reserved"], len(image["data"])) for image in images]))
+                for image in images:
+                    budget.release(image["reserved"])
+            return budget, reservations
+
+        budget, reservations = asyncio.run(collect())
+        # An estimate the size of the whole budget lets one shard be extracted at a time
+        self.assertEqual(budget.waits, 4)
+        self.assertEqual(budget.used, 0)
+        (used, images), rest = reservations[0], reservations[1:]
+        self.assertEqual(len(images), 1)
+        self.assertEqual(images[0][0], images[0][1])
+        self.assertEqual(used, images[0][0])   # Resized from the estimate to the image's bytes
+        self.assertTrue(all(images == [] for _, images in rest))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import time
+import asyncio
+import unittest
+
+from schema_cache import SchemaCache
+
+class FakeGraph:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.calls = 0
+        self.schema = ""
+        self.structured_schema = {}
+
+    def refresh_schema(self):
+        self.calls += 1
+        time.sleep(self.delay)
+        self.schema = f"schema {self.calls}"
+        self.structured_schema = {"node_props": {}, "calls": self.calls}
+
+class TestSchemaCache(unittest.TestCase):
+
+    def test_cached_until_invalidated(self):
+        cache, graph = SchemaCache(ttl=60), FakeGraph()
+        first = cache.get(graph)
+        self.assertEqual(cache.get(graph), first)
+        self.assertEqual(graph.calls, 1)
+
+        cache.invalidate()
+        second = cache.get(graph)
+        self.assertEqual(graph.calls, 2)
+        self.assertEqual(second.version, first.version + 1)
+        self.assertEqual(second.schema, "schema 2")
+
+    def test_expires_after_ttl(self):
+        cache, graph = SchemaCache(ttl=0.05), FakeGraph()
+        cache.get(graph)
+        time.sleep(0.06)
+        cache.get(graph)
+        self.assertEqual(graph.calls, 2)
+
+    def test_write_during_refresh_leaves_cache_stale(self):
+        cache = SchemaCache(ttl=60)
+
+        class WritingGraph(FakeGraph):
+            def refresh_schema(self):
+                super().refresh_schema()
+                if self.calls == 1:
+                    cache.invalidate()
+
+        graph = WritingGraph()
+        cache.get(graph)
+        cache.get(graph)
+        self.assertEqual(graph.calls, 2)
+
+    def test_only_new_labels_or_types_invalidate(self):
+        cache, graph = SchemaCache(ttl=60), FakeGraph()
+        self.assertFalse(cache.invalidate_if_new({"Part"}, set()))  # Nothing cached yet
+        cache.get(graph)
+        cache._snapshot = cache._snapshot._replace(structured_schema={
+            "node_props": {"Document": [], "Part": []},
+            "rel_props": {},
+            "relationships": [{"start": "Document", "type": "MENTIONS", "end": "Part"}]
+        })
+        self.assertFalse(cache.invalidate_if_new({"Document", "Part"}, {"MENTIONS"}))
+        self.assertEqual(cache.get(graph).version, 1)
+
+        self.assertTrue(cache.invalidate_if_new({"Part"}, {"PART_OF"}))
+        self.assertEqual(cache.get(graph).version, 2)
+
+    def test_concurrent_async_refreshes_are_coalesced(self):
+        cache, graph = SchemaCache(ttl=60), FakeGraph(delay=0.05)
+
+        async def run():
+            return await asyncio.gather(*(cache.aget(graph) for _ in range(10)))
+
+        snapshots = asyncio.run(run())
+        self.assertEqual(graph.calls, 1)
+        self.assertEqual({s.version for s in snapshots}, {1})
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from semantic_chunker import VectorizedSemanticChunker, split_sentences
+
+def word_count(text):
+    return len(text.split())
+
+class TopicEmbeddings(Embeddings):
+    """Embeds text by topic keyword, so breakpoints fall where the topic changes."""
+    TOPICS = ["lubrication", "encoder", "brake"]
+
+    def __init__(self):
+        self.batches = []
+
+    def embed_documents(self, texts):
+        self.batches.append(len(texts))
+        return [[float(text.lower().count(topic)) + 0.01 for topic in self.TOPICS] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+class TestVectorizedSemanticChunker(unittest.TestCase):
+
+    def test_splits_where_the_topic_changes(self):
+        text = (
+            "Check lubrication level. Refill lubrication weekly. Use ISO VG 68 lubrication oil. "
+            "Lubrication ports are on J2. "
+            "Replace the encoder battery. The encoder loses position without it. "
+            "Back up encoder data first. Encoder alarms clear after reboot."
+        )
+        chunker = VectorizedSemanticChunker(TopicEmbeddings(), breakpoint_percentile=80, buffer_size=0, length_function=word_count)
+        chunks = chunker.split_texts([text])[0]
+        self.assertEqual(len(chunks), 2)
+        self.assertTrue(chunks[0].endswith("Lubrication ports are on J2."))
+        self.assertTrue(chunks[1].startswith("Replace the encoder battery."))
+
+    def test_all_documents_share_one_embedding_batch(self):
+        embeddings = TopicEmbeddings()
+        chunker = VectorizedSemanticChunker(embeddings, length_function=word_count)
+        docs = [Document(page_content="Brake check. Brake wear. Encoder check.", metadata={"doc_id": str(i)}) for i in range(5)]
+        chunks = chunker.split_documents(docs)
+        self.assertEqual(embeddings.batches, [15])
+        self.assertEqual({c.metadata["doc_id"] for c in chunks}, {"0", "1", "2", "3", "4"})
+
+    def test_chunks_never_exceed_max_tokens(self):
+        text = " ".join(f"Torque bolt {i} of the brake housing to spec." for i in range(40))
+        text += " " + " ".join(["M8"] * 50)  # one runaway 'sentence'
+        chunker = VectorizedSemanticChunker(TopicEmbeddings(), max_tokens=20, length_function=word_count)
+        chunks = chunker.split_texts([text])[0]
+        self.assertTrue(all(word_count(c) <= 20 for c in chunks))
+        self.assertEqual(" ".join(chunks).split(), text.split())
+
+    def test_units_without_spaces_are_hard_split(self):
+        url = "https://example.com/" + "a1B2c3D4" * 20
+        text = f"Download the firmware from {url} before updating."
+        chunker = VectorizedSemanticChunker(TopicEmbeddings(), max_tokens=40, length_function=len)
+        chunks = chunker.split_texts([text])[0]
+        self.assertTrue(all(len(c) <= 40 for c in chunks))
+        self.assertIn(url, "".join(chunks))
+
+    def test_single_sentence_and_empty_documents(self):
+        embeddings = TopicEmbeddings()
+        chunker = VectorizedSemanticChunker(embeddings, length_function=word_count)
+        self.assertEqual(chunker.split_texts(["Lock out power.", "   "]), [["Lock out power."], []])
+        self.assertEqual(embeddings.batches, [])
+        self.assertEqual(split_sentences("One. Two?  Three!"), ["One.", "Two?", "Three!"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+import fitz  # PyMuPDF
+from vision_prep import prepare_image, pack_requests, split_batch_response
+
+def render(width, height, colorspace=fitz.csRGB, output="png"):
+    pix = fitz.Pixmap(colorspace, fitz.IRect(0, 0, width, height), 0)
+    pix.clear_with(200)
+    return pix.tobytes(output)
+
+class TestPrepareImage(unittest.TestCase):
+
+    def test_large_image_is_downscaled_to_max_edge(self):
+        prepared = prepare_image(render(3000, 1500), "png", max_edge=1000)
+        self.assertEqual((prepared["width"], prepared["height"]), (1000, 500))
+        self.assertEqual(prepared["mime"], "image/jpeg")
+        self.assertEqual(fitz.Pixmap(prepared["data"]).width, 1000)
+
+    def test_small_png_passes_through(self):
+        data = render(400, 300)
+        prepared = prepare_image(data, "png", max_edge=1000)
+        self.assertIs(prepared["data"], data)
+        self.assertEqual(prepared["mime"], "image/png")
+
+    def test_other_formats_are_reencoded(self):
+        prepared = prepare_image(render(400, 300, fitz.csGRAY), "jpx", max_edge=1000)
+        self.assertEqual(prepared["mime"], "image/png")
+        self.assertEqual((prepared["width"], prepared["height"]), (400, 300))
+
+    def test_undecodable_image_returns_none(self):
+        self.assertIsNone(prepare_image(b"not an image", "png"))
+
+class TestVisionBatching(unittest.TestCase):
+
+    def test_small_images_share_requests_and_large_go_alone(self):
+        sizes = [(300, 300), (2000, 1000), (500, 400), (320, 320), (700, 300)]
+        self.assertEqual(pack_requests(sizes, batch_size=3), [[0, 2, 3], [4], [1]])
+
+    def test_split_batch_response(self):
+        text = "Here you go.\n[IMAGE 1]\nA gearbox.\n\n**[IMAGE 2]**\nA wiring chart."
+        self.assertEqual(split_batch_response(text, 2), ["A gearbox.", "A wiring chart."])
+
+    def test_split_fails_when_an_image_is_missing(self):
+        self.assertIsNone(split_batch_response("[IMAGE 1]\nA gearbox.", 2))
+
+if __name__ == "__main__":
+    unittest.main()
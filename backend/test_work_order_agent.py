@@ -35,7 +35,7 @@ class TestWorkOrderAssignmentAgent(unittest.IsolatedAsyncioTestCase):
             {"id": "T2", "name": "Bob", "role": "Junior Tech"}
         ]
 
-    @patch("work_order_agent.ManufacturingKGQueryEngine")
+    @patch("work_order_agent.ManufacturingKGQueryEngine.shared")
     @patch("work_order_agent.ChatOpenAI")
     async def test_assign_work_order_success(self, MockLLM, MockKG):
         """
@@ -77,7 +77,7 @@ class TestWorkOrderAssignmentAgent(unittest.IsolatedAsyncioTestCase):
         # Ensure no errors
         self.assertEqual(result["errors"], [])
 
-    @patch("work_order_agent.ManufacturingKGQueryEngine")
+    @patch("work_order_agent.ManufacturingKGQueryEngine.shared")
     async def test_work_order_not_found(self, MockKG):
         """
         Test Scenario: KG returns empty context (Invalid ID)
@@ -95,7 +95,7 @@ class TestWorkOrderAssignmentAgent(unittest.IsolatedAsyncioTestCase):
         # Should not have proceeded to recommendation
         self.assertEqual(result["recommended_technician"], {})
 
-    @patch("work_order_agent.ManufacturingKGQueryEngine")
+    @patch("work_order_agent.ManufacturingKGQueryEngine.shared")
     async def test_compliance_failure_no_technicians(self, MockKG):
         """
         Test Scenario: Context exists, but NO qualified technicians found.
@@ -119,7 +119,7 @@ class TestWorkOrderAssignmentAgent(unittest.IsolatedAsyncioTestCase):
         # 3. Error list should explain why
         self.assertTrue(any("No qualified technicians" in e for e in result["errors"]))
 
-    @patch("work_order_agent.ManufacturingKGQueryEngine")
+    @patch("work_order_agent.ManufacturingKGQueryEngine.shared")
     @patch("work_order_agent.ChatOpenAI")
     async def test_llm_failure_fallback(self, MockLLM, MockKG):
         """
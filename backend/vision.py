@@ -0,0 +1,128 @@
+"""
+Vision Module
+GPT-4o descriptions for technical diagrams extracted from manuals.
+Images arrive normalized and downscaled (see vision_prep); small diagrams from
+the same page share one request.
+"""
+import base64
+import asyncio
+from typing import Any, Dict, List
+from langchain_core.messages import HumanMessage
+import logging
+logger = logging.getLogger("uvicorn")
+
+from agent import llm
+from executors import run_io
+from image_cache import image_cache, image_hash
+from vision_prep import pack_requests, batch_prompt, split_batch_response
+
+def _image_part(image: Dict[str, Any]) -> Dict[str, Any]:
+    base64_image = base64.b64encode(image["data"]).decode('utf-8')
+    return {"type": "image_url", "image_url": {"url": f"data:{image.get('mime', 'image/jpeg')};base64,{base64_image}"}}
+
+def _format_description(text: str) -> str:
+    return f"\n[IMAGE DESCRIPTION]: {text}\n"
+
+async def analyze_image_with_gpt4o(image_bytes, mime="image/jpeg"):
+    # Create the payload for GPT-4o
+    message = HumanMessage(
+        content=[
+            {"type": "text", "text": "Describe this technical diagram or machine part in extreme detail for a search index."},
+            _image_part({"data": image_bytes, "mime": mime})
+        ]
+    )
+
+    # Invoke the model (using the LLM imported from agent.py)
+    response = await llm.ainvoke([message])
+    return _format_description(response.content)
+
+async def analyze_images_with_gpt4o(images: List[Dict[str, Any]]) -> List[str]:
+    """One request for several small images; raises ValueError if the answer can't be split per image."""
+    message = HumanMessage(
+        content=[{"type": "text", "text": batch_prompt(len(images))}] + [_image_part(image) for image in images]
+    )
+    response = await llm.ainvoke([message])
+    descriptions = split_batch_response(response.content, len(images))
+    if descriptions is None:
+        raise ValueError(f"could not split the answer into {len(images)} descriptions")
+    return [_format_description(d) for d in descriptions]
+
+# Limit concurrent image analysis to 5 at a time to avoid Rate Limits
+image_semaphore = asyncio.Semaphore(5)
+
+# Descriptions currently being generated, so identical images in flight share one call
+_inflight = {}
+
+async def _describe_group(images: List[Dict[str, Any]]) -> List[str]:
+    """Describes images in one request (or one each, if the batched answer was unusable)."""
+    async with image_semaphore:
+        try:
+            if len(images) == 1:
+                return [await analyze_image_with_gpt4o(images[0]["data"], images[0].get("mime", "image/jpeg"))]
+            return await analyze_images_with_gpt4o(images)
+        except Exception as e:
+            logger.info(f"Image analysis failed ({len(images)} images): {e}")
+            if len(images) == 1:
+                # Return empty string on failure so process continues
+                return [""]
+    # Retry the batch as single-image requests, outside the semaphore we held
+    singles = await asyncio.gather(*(_describe_group([image]) for image in images))
+    return [s[0] for s in singles]
+
+def _cached_descriptions(images: List[Dict[str, Any]], model: str):
+    """
+    [(key, cached description or None)] for images; hashing and SQLite, so run in a thread.
+    Keyed by the image as stored in the PDF (raw_hash), so retuning vision_prep's
+    downscaling or encoding doesn't invalidate the cache; images without one
+    (e.g. direct uploads, sent unprepared) are keyed by their bytes.
+    """
+    found = []
+    for image in images:
+        key = image.get("raw_hash") or image_hash(image["data"])
+        cached = image_cache.get(key, model)
+        if cached is None:
+            cached = image_cache.get_similar(image.get("phash"), model)
+        found.append((key, cached))
+    return found
+
+async def safe_analyze_images(images: List[Dict[str, Any]]) -> List[str]:
+    """
+    Descriptions for images (dicts with data, phash and optionally raw_hash, mime,
+    width, height), in order. Cached and in-flight images are reused; the rest are
+    packed into as few vision requests as vision_prep allows.
+    """
+    results = [""] * len(images)
+    waiting = {}   # index -> future of a description someone else is generating
+    misses = []    # (index, key, future)
+    # Diagrams repeat across manual revisions; only unseen images go to the model
+    found = await run_io(_cached_descriptions, images, llm.model_name)
+    for i, (key, cached) in enumerate(found):
+        if cached is not None:
+            results[i] = cached
+        elif key in _inflight:
+            waiting[i] = _inflight[key]
+        else:
+            future = asyncio.get_running_loop().create_future()
+            _inflight[key] = future
+            misses.append((i, key, future))
+
+    try:
+        sizes = [(images[i].get("width", 0), images[i].get("height", 0)) for i, _, _ in misses]
+        groups = [[misses[m] for m in group] for group in pack_requests(sizes)]
+        described = await asyncio.gather(*(_describe_group([images[i] for i, _, _ in group]) for group in groups))
+        for group, descriptions in zip(groups, described):
+            for (i, key, _), description in zip(group, descriptions):
+                results[i] = description
+                if description:
+                    await run_io(image_cache.put, key, llm.model_name, description, phash=images[i].get("phash"))
+    finally:
+        for i, key, future in misses:
+            future.set_result(results[i])
+            del _inflight[key]
+
+    for i, future in waiting.items():
+        results[i] = await asyncio.shield(future)
+    return results
+
+async def safe_analyze_image(image_bytes, phash=None, mime="image/jpeg"):
+    return (await safe_analyze_images([{"data": image_bytes, "phash": phash, "mime": mime}]))[0]
@@ -0,0 +1,90 @@
+"""
+Vision Preprocessing
+Prepares extracted images for GPT-4o: normalizes the format (JPEG/PNG with the
+matching MIME type), downscales anything larger than VISION_MAX_EDGE, and packs
+small diagrams into multi-image requests whose answer is split back per image.
+
+Everything here is pure PyMuPDF, so it runs in the extraction worker processes.
+"""
+import os
+import re
+from typing import List, Optional, Sequence, Tuple, TypedDict
+import fitz  # PyMuPDF
+
+# --- CONFIGURATION ---
+# Longest edge sent to the model; the API downsamples larger images itself, so
+# anything above this only costs upload time
+VISION_MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", "1568"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+# Images whose longest edge is at most this are packed into shared requests...
+VISION_BATCH_MAX_EDGE = int(os.getenv("VISION_BATCH_MAX_EDGE", "768"))
+# ...up to this many per request
+VISION_BATCH_SIZE = int(os.getenv("VISION_BATCH_SIZE", "4"))
+
+_PASSTHROUGH = {"jpeg": "image/jpeg", "jpg": "image/jpeg", "png": "image/png"}
+
+class PreparedImage(TypedDict):
+    data: bytes
+    mime: str
+    width: int
+    height: int
+
+def prepare_image(image_bytes: bytes, ext: Optional[str] = None, max_edge: int = VISION_MAX_EDGE) -> Optional[PreparedImage]:
+    """
+    Returns the image as JPEG or PNG no larger than max_edge, or None if it can't be decoded.
+    JPEGs and PNGs that are already small enough are passed through untouched.
+    """
+    try:
+        pix = fitz.Pixmap(image_bytes)
+        width, height = pix.width, pix.height
+        if (ext or "").lower() in _PASSTHROUGH and max(width, height) <= max_edge:
+            return PreparedImage(data=image_bytes, mime=_PASSTHROUGH[ext.lower()], width=width, height=height)
+
+        if pix.alpha:
+            pix = fitz.Pixmap(pix, 0)
+        if pix.colorspace is None or pix.colorspace.n not in (1, 3):
+            # CMYK, indexed, JBIG2 masks... -> RGB
+            pix = fitz.Pixmap(fitz.csRGB, pix)
+        if max(width, height) > max_edge:
+            scale = max_edge / max(width, height)
+            width, height = max(1, round(width * scale)), max(1, round(height * scale))
+            pix = fitz.Pixmap(pix, width, height, None)
+
+        # Grayscale scans are mostly line art, which PNG keeps crisp; photos go to JPEG
+        if pix.n == 1:
+            return PreparedImage(data=pix.tobytes("png"), mime="image/png", width=width, height=height)
+        return PreparedImage(data=pix.tobytes("jpg", jpg_quality=VISION_JPEG_QUALITY), mime="image/jpeg", width=width, height=height)
+    except Exception:
+        return None
+
+def is_batchable(width: int, height: int) -> bool:
+    return max(width, height) <= VISION_BATCH_MAX_EDGE
+
+def pack_requests(sizes: Sequence[Tuple[int, int]], batch_size: int = VISION_BATCH_SIZE) -> List[List[int]]:
+    """
+    Groups image indexes into vision requests: small images share a request
+    (up to batch_size each), large ones get their own.
+    """
+    small = [i for i, (w, h) in enumerate(sizes) if is_batchable(w, h)]
+    large = [[i] for i, (w, h) in enumerate(sizes) if not is_batchable(w, h)]
+    return [small[i:i + batch_size] for i in range(0, len(small), batch_size)] + large
+
+def batch_prompt(count: int) -> str:
+    return (
+        f"Describe each of the {count} technical diagrams or machine parts below in extreme detail for a search index. "
+        f"Describe them separately and in order, starting each description with its own line "
+        f"'[IMAGE n]' where n is the image's position (1 to {count})."
+    )
+
+_IMAGE_MARKER = re.compile(r"^\s*\**\[IMAGE (\d+)\]\**:?\s*$", re.MULTILINE)
+
+def split_batch_response(text: str, count: int) -> Optional[List[str]]:
+    """Splits a multi-image answer into one description per image, or None if any are missing."""
+    parts = _IMAGE_MARKER.split(text)
+    # ['preamble', '1', 'desc 1', '2', 'desc 2', ...]
+    descriptions = {}
+    for number, body in zip(parts[1::2], parts[2::2]):
+        descriptions[int(number)] = body.strip()
+    if sorted(descriptions) != list(range(1, count + 1)) or not all(descriptions.values()):
+        return None
+    return [descriptions[n] for n in range(1, count + 1)]
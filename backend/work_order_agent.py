@@ -36,7 +36,7 @@ class WorkOrderAgentState(TypedDict):
 
 def retrieve_work_order_context(state: WorkOrderAgentState) -> WorkOrderAgentState:
     # (Same as before, simplified for brevity)
-    kg = ManufacturingKGQueryEngine()
+    kg = ManufacturingKGQueryEngine.shared()
     context = kg.get_workorder_context(state['work_order_id'])
     state['work_order_context'] = context
     
@@ -95,7 +95,7 @@ def generate_purchase_order(state: WorkOrderAgentState) -> WorkOrderAgentState:
 
 def find_qualified_technicians(state: WorkOrderAgentState) -> WorkOrderAgentState:
     # Only runs if parts are available
-    kg = ManufacturingKGQueryEngine()
+    kg = ManufacturingKGQueryEngine.shared()
     technicians = kg.find_qualified_technicians_for_workorder(state['work_order_id'])
     state['qualified_technicians'] = technicians
     return state
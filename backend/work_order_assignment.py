@@ -16,6 +16,8 @@ try:
 except ImportError:
     # Dummy mock for demonstration if file is missing
     class ManufacturingKGQueryEngine:
+        @classmethod
+        def shared(cls): return cls()
         def get_workorder_context(self, wo_id): return {"id": wo_id, "title": "Fix Pump", "type": "Hydraulic"}
         def find_qualified_technicians_for_workorder(self, wo_id): return [] # Return empty list to trigger loop
 
@@ -123,7 +125,7 @@ def retrieve_data_node(state: WorkOrderAgentState) -> WorkOrderAgentState:
     [Tool Execution] Fetches data from KG/VectorDB based on parameters.
     """
     logger.info(f"--- Node: Retrieve Data ---")
-    kg = ManufacturingKGQueryEngine()
+    kg = ManufacturingKGQueryEngine.shared()
     params = state.get('search_parameters', {})
     updates = {}
     
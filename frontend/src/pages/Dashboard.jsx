@@ -116,6 +116,19 @@ const DashboardPage = () => {
     } catch (error) { console.error(error); alert("Failed to add machine."); } finally { setIsUploading(false); }
   };
 
+  const pollIngestJob = async (jobId) => {
+    try {
+      const res = await fetch(`http://localhost:8000/api/ingest/jobs/${jobId}`);
+      if (!res.ok) return;
+      const job = await res.json();
+      if (['completed', 'failed', 'cancelled'].includes(job.status)) {
+        await fetchDashboardData(); // Refresh stats & graph once the job is done
+        return;
+      }
+      setTimeout(() => pollIngestJob(jobId), 3000);
+    } catch (error) { console.error(error); }
+  };
+
   const handleUpload = async (e) => {
     e.preventDefault();
     if (!selectedFile || !machinery) return;
@@ -128,10 +141,11 @@ const DashboardPage = () => {
     try {
       const response = await fetch('http://localhost:8000/api/ingest', { method: 'POST', body: formData });
       if (!response.ok) throw new Error('Upload failed');
-      
+      const { job_id } = await response.json();
+
       setUploadStatus('success');
-      await fetchDashboardData(); // Refresh stats & graph immediately
-      
+      pollIngestJob(job_id); // Ingestion runs in the background; refresh when it finishes
+
       setTimeout(() => { setShowUploadModal(false); setUploadStatus(null); setSelectedFile(null); }, 1500);
     } catch (error) { console.error(error); setUploadStatus('error'); } finally { setIsUploading(false); }
   };